@@ -0,0 +1 @@
+"""Repeatable performance benchmarks"""
@@ -0,0 +1,289 @@
+"""Scaling benchmark for KnowledgeBase.search and the non-LLM path of
+AIAgent.should_handoff (AIAgent._route).
+
+For every corpus size a synthetic FAQ in the sample_faq.txt format is
+written to a temporary directory, then measured:
+
+- load time from the .txt files (including writing the snapshot) and
+  from the binary snapshot alone
+- memory: index array bytes and process RSS growth
+- search latency (p50/p95/p99) and throughput, search_batch throughput
+- _route latency and the share of questions answered / handed off / sent
+  to the LLM
+- recall@1 and recall@3 on labelled queries (each a reworded question with
+  a known answer pair)
+
+    cd ai_middleware
+    python -m benchmarks.kb_bench --sizes 100,1000,10000,100000 --output bench.json
+    python -m benchmarks.kb_bench --sizes 100,1000,10000 --compare bench.json --threshold 0.25
+
+With --compare the run exits with status 1 if any latency or load time grew
+by more than --threshold (a fraction) or recall dropped by more than
+--recall-tolerance against the baseline file.
+"""
+from typing import Dict, List, Optional, Tuple
+import argparse
+import gc
+import json
+import os
+import platform
+import random
+import subprocess
+import sys
+import tempfile
+import time
+
+import numpy as np
+
+from loadtest.profiles import summarize
+from src.ai_agent import AIAgent
+from src.knowledge_base import KnowledgeBase
+
+PAIRS_PER_FILE = 5000
+
+LEADS = ["How do I", "Can I", "Where can I", "Is it possible to", "What happens when I", "Why can't I"]
+VERBS = ["configure", "cancel", "renew", "transfer", "upgrade", "return", "replace", "activate",
+         "export", "schedule", "share", "verify", "update", "close", "install", "pay"]
+NOUNS = ["order", "invoice", "subscription", "warranty", "account", "password", "delivery", "license",
+         "refund", "voucher", "profile", "device", "payment", "address", "plan", "report", "badge",
+         "booking", "contract", "shipment"]
+FILLER = ["the", "a", "your", "we", "you", "it", "within", "days", "after", "before", "click", "open",
+          "settings", "page", "email", "link", "select", "option", "then", "confirm", "usually", "takes"]
+SYLLABLES = ["ka", "lo", "mi", "zu", "ter", "vax", "pel", "dri", "son", "qua", "bex", "nor", "fi", "gat",
+             "ul", "rem", "tis", "yo", "wen", "cal"]
+
+class SyntheticFAQ:
+    """Deterministic Q/A corpus with a labelled query for chosen pairs.
+
+    Questions combine a verb and noun from small vocabularies with two
+    product names drawn from a vocabulary that grows with the corpus, so
+    term statistics look like a real, growing FAQ: a few very common words
+    and a long tail of rare ones.
+    """
+
+    def __init__(self, n_pairs: int, seed: int = 7):
+        self.n_pairs = n_pairs
+        self.rng = random.Random(seed)
+        n_products = max(50, n_pairs // 4)
+        names = set()
+        while len(names) < n_products:
+            names.add("".join(self.rng.choice(SYLLABLES) for _ in range(self.rng.randint(2, 5))))
+        self.products = sorted(names)
+        self.questions: List[Tuple[str, str, str, str, str]] = []  # lead, verb, noun, product, product
+        self.pairs: List[str] = []
+        for _ in range(n_pairs):
+            lead, verb, noun = self.rng.choice(LEADS), self.rng.choice(VERBS), self.rng.choice(NOUNS)
+            first, second = self.rng.sample(self.products, 2)
+            self.questions.append((lead, verb, noun, first, second))
+            answer = " ".join(self.rng.choice(FILLER + VERBS + NOUNS) for _ in range(self.rng.randint(10, 20)))
+            self.pairs.append(f"Q: {lead} {verb} the {first} {noun} for {second}?\n"
+                              f"A: {answer.capitalize()} {first}.")
+
+    def write(self, directory: str):
+        for start in range(0, self.n_pairs, PAIRS_PER_FILE):
+            path = os.path.join(directory, f"faq_{start // PAIRS_PER_FILE:05d}.txt")
+            with open(path, 'w', encoding='utf-8') as f:
+                f.write("\n\n".join(self.pairs[start:start + PAIRS_PER_FILE]) + "\n")
+
+    def labelled_queries(self, count: int) -> List[Tuple[str, int]]:
+        """(query, pair index): the question's key words reordered and some
+        left out, as a visitor would type it. Without the second product
+        name several pairs can match equally well, so recall drops as the
+        corpus grows."""
+        queries = []
+        for i in self.rng.sample(range(self.n_pairs), min(count, self.n_pairs)):
+            _, verb, noun, first, second = self.questions[i]
+            words = [verb, noun, first, second]
+            if self.rng.random() < 0.3:
+                words.remove(self.rng.choice([verb, noun]))
+            if self.rng.random() < 0.3:
+                words.remove(second)
+            self.rng.shuffle(words)
+            queries.append(("please " + " ".join(words), i))
+        return queries
+
+def rss_bytes() -> Optional[int]:
+    try:
+        with open('/proc/self/statm') as f:
+            return int(f.read().split()[1]) * os.sysconf('SC_PAGE_SIZE')
+    except (OSError, ValueError):
+        return None
+
+def index_bytes(kb: KnowledgeBase) -> int:
+    index = kb.index
+    arrays = [index.indptr, index.indices, index.tf, index.doc_len, index.weights, index.idf, index.sources]
+    pairs = index.pairs
+    if hasattr(pairs, 'blob'):
+        arrays += [pairs.blob, pairs.offsets]
+    return int(sum(a.nbytes for a in arrays))
+
+def timed(fn, items) -> Tuple[List[float], list]:
+    samples, results = [], []
+    for item in items:
+        started = time.perf_counter()
+        results.append(fn(item))
+        samples.append(time.perf_counter() - started)
+    return samples, results
+
+def latency_ms(samples: List[float]) -> dict:
+    summary = summarize(samples)
+    return {
+        "p50_ms": summary["p50"] * 1000,
+        "p95_ms": summary["p95"] * 1000,
+        "p99_ms": summary["p99"] * 1000,
+        "qps": len(samples) / sum(samples) if samples else 0.0
+    }
+
+def bench_size(n_pairs: int, n_queries: int, seed: int) -> dict:
+    faq = SyntheticFAQ(n_pairs, seed)
+    queries = faq.labelled_queries(n_queries)
+    texts = [q for q, _ in queries]
+    result: Dict[str, object] = {"pairs": n_pairs, "queries": len(queries)}
+
+    with tempfile.TemporaryDirectory() as directory:
+        faq.write(directory)
+        snapshot = os.path.join(directory, '.index.kbx')
+        gc.collect()
+        rss_before = rss_bytes()
+
+        started = time.perf_counter()
+        kb = KnowledgeBase(snapshot_path=snapshot)
+        kb.load_from_directory(directory)
+        result["load_s"] = time.perf_counter() - started
+        rss_after = rss_bytes()
+        result["index_bytes"] = index_bytes(kb)
+        result["rss_growth_bytes"] = rss_after - rss_before if rss_before is not None else None
+
+        # A second worker starting from the snapshot kb just wrote
+        started = time.perf_counter()
+        mapped = KnowledgeBase(snapshot_path=snapshot)
+        mapped.load_from_directory(directory)
+        result["snapshot_load_s"] = time.perf_counter() - started
+        del mapped
+
+        samples, hits = timed(lambda q: kb.search(q, top_k=3), texts)
+        result["search"] = latency_ms(samples)
+
+        started = time.perf_counter()
+        kb.search_batch(texts, top_k=3)
+        elapsed = time.perf_counter() - started
+        result["search_batch"] = {"qps": len(texts) / elapsed if elapsed else 0.0}
+
+        top1 = top3 = 0
+        for (_, expected), found in zip(queries, hits):
+            answers = [pair for pair, _ in found]
+            top1 += bool(answers) and answers[0] == faq.pairs[expected]
+            top3 += faq.pairs[expected] in answers
+        result["recall_at_1"] = top1 / len(queries) if queries else 0.0
+        result["recall_at_3"] = top3 / len(queries) if queries else 0.0
+
+        agent = AIAgent(api_key="benchmark")
+        agent.kb = kb
+        samples, routed = timed(agent._route, texts)
+        decisions = {"kb": 0, "faq": 0, "greeting": 0, "handoff": 0, "llm": 0}
+        for _, _, route in routed:
+            decisions[route] += 1
+        result["route"] = {**latency_ms(samples),
+                           **{f"{k}_share": v / len(texts) for k, v in decisions.items()}}
+    return result
+
+# (path into a size's result, direction): +1 if larger is worse
+COMPARED = [
+    (("load_s",), 1), (("snapshot_load_s",), 1),
+    (("search", "p50_ms"), 1), (("search", "p95_ms"), 1), (("search", "p99_ms"), 1),
+    (("route", "p50_ms"), 1), (("route", "p95_ms"), 1),
+    (("search_batch", "qps"), -1)
+]
+
+def _get(result: dict, path: Tuple[str, ...]):
+    for key in path:
+        result = result.get(key) if isinstance(result, dict) else None
+    return result
+
+def compare(current: dict, baseline: dict, threshold: float, recall_tolerance: float) -> List[str]:
+    """Human-readable regressions of current against baseline"""
+    previous = {r["pairs"]: r for r in baseline.get("results", [])}
+    regressions = []
+    for result in current["results"]:
+        old = previous.get(result["pairs"])
+        if old is None:
+            continue
+        for path, direction in COMPARED:
+            new_value, old_value = _get(result, path), _get(old, path)
+            if not new_value or not old_value:
+                continue
+            change = (new_value - old_value) / old_value * direction
+            if change > threshold:
+                regressions.append(f"{result['pairs']} pairs: {'.'.join(path)} {old_value:.4g} -> "
+                                   f"{new_value:.4g} ({change:+.0%} worse)")
+        for key in ("recall_at_1", "recall_at_3"):
+            if result[key] < old[key] - recall_tolerance:
+                regressions.append(f"{result['pairs']} pairs: {key} {old[key]:.3f} -> {result[key]:.3f}")
+    return regressions
+
+def git_commit() -> Optional[str]:
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True,
+                              cwd=os.path.dirname(__file__), check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+def print_table(results: List[dict]):
+    print(f"{'pairs':>9}{'load s':>9}{'snap s':>9}{'index MB':>10}{'p50 ms':>9}{'p95 ms':>9}{'p99 ms':>9}"
+          f"{'qps':>9}{'batch qps':>11}{'R@1':>7}{'R@3':>7}{'route p95':>11}")
+    for r in results:
+        print(f"{r['pairs']:>9}{r['load_s']:>9.2f}{r['snapshot_load_s']:>9.3f}{r['index_bytes'] / 2**20:>10.1f}"
+              f"{r['search']['p50_ms']:>9.3f}{r['search']['p95_ms']:>9.3f}{r['search']['p99_ms']:>9.3f}"
+              f"{r['search']['qps']:>9.0f}{r['search_batch']['qps']:>11.0f}{r['recall_at_1']:>7.3f}"
+              f"{r['recall_at_3']:>7.3f}{r['route']['p95_ms']:>11.3f}")
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="Knowledge base scaling benchmark")
+    parser.add_argument('--sizes', default="100,1000,10000,100000",
+                        help='comma-separated corpus sizes in Q&A pairs (up to 1000000)')
+    parser.add_argument('--queries', type=int, default=1000, help='labelled queries per size (default 1000)')
+    parser.add_argument('--seed', type=int, default=7)
+    parser.add_argument('--output', help='write JSON results to this file')
+    parser.add_argument('--compare', help='baseline JSON file from an earlier run')
+    parser.add_argument('--threshold', type=float, default=0.2,
+                        help='allowed relative slowdown against the baseline (default 0.2 = 20%%)')
+    parser.add_argument('--recall-tolerance', type=float, default=0.01,
+                        help='allowed absolute recall drop against the baseline (default 0.01)')
+    args = parser.parse_args(argv)
+
+    results = []
+    for size in [int(s) for s in args.sizes.split(',') if s.strip()]:
+        print(f"Benchmarking {size} pairs...", file=sys.stderr)
+        results.append(bench_size(size, args.queries, args.seed))
+        gc.collect()
+
+    report = {
+        "meta": {
+            "commit": git_commit(),
+            "timestamp": time.strftime('%Y-%m-%dT%H:%M:%S'),
+            "python": platform.python_version(),
+            "numpy": np.__version__,
+            "machine": platform.machine(),
+            "seed": args.seed,
+            "queries": args.queries
+        },
+        "results": results
+    }
+    print_table(results)
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump(report, f, indent=2)
+
+    if args.compare:
+        with open(args.compare, encoding='utf-8') as f:
+            regressions = compare(report, json.load(f), args.threshold, args.recall_tolerance)
+        if regressions:
+            print("\nRegressions against " + args.compare + ":")
+            for line in regressions:
+                print("  " + line)
+            return 1
+        print(f"\nNo regressions against {args.compare}")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1 @@
+"""Offline load testing: mock Odoo and LLM servers and a visitor load driver"""
@@ -0,0 +1,328 @@
+"""Simulate concurrent widget visitors against the middleware.
+
+By default everything runs offline in one process: the mock Odoo and mock
+LLM servers are started on local ports, src.main is configured to use them
+and is driven in-process through its ASGI app. With --url an already running
+middleware is driven instead (start the mocks with `python -m
+loadtest.mock_odoo` / `loadtest.mock_llm` and pass --odoo-stats to count
+its RPCs).
+
+Each visitor asks a few questions (knowledge base hits or LLM questions),
+some ask for a human, follow their handoff ticket and exchange messages with
+the simulated operator while polling for replies, like the widget does.
+
+    cd ai_middleware
+    python -m loadtest.driver --visitors 200 --ramp 10 --odoo-latency lognormal:0.08:0.5
+
+Reports p50/p95/p99 latency per operation and Odoo RPCs per visitor message.
+"""
+from collections import defaultdict
+from typing import Dict, List, Optional
+import argparse
+import asyncio
+import glob
+import json
+import os
+import random
+import sys
+import tempfile
+import threading
+import time
+
+import httpx
+
+from . import mock_llm, mock_odoo
+from .profiles import Latency, summarize
+
+HANDOFF_REQUEST = "I would like to talk to a human agent please"
+
+class BackgroundServer:
+    """Serves an ASGI app on a free local port from its own thread and loop,
+    so mock work does not run on the event loop being measured"""
+
+    def __init__(self, app):
+        import uvicorn
+        self.server = uvicorn.Server(uvicorn.Config(app, host="127.0.0.1", port=0,
+                                                    log_level="warning", lifespan="off"))
+        self.thread = threading.Thread(target=self.server.run, daemon=True)
+
+    def start(self) -> str:
+        self.thread.start()
+        while not self.server.started:
+            if not self.thread.is_alive():
+                raise RuntimeError("Mock server failed to start")
+            time.sleep(0.01)
+        port = self.server.servers[0].sockets[0].getsockname()[1]
+        return f"http://127.0.0.1:{port}"
+
+    def stop(self):
+        self.server.should_exit = True
+        self.thread.join(timeout=5)
+
+class Questions:
+    """Questions from the knowledge files, and LLM questions sharing only one
+    word with them (too weak a match to answer without the LLM)"""
+
+    def __init__(self, knowledge_dir: str):
+        self.kb = []
+        for path in sorted(glob.glob(os.path.join(knowledge_dir, '*.txt'))):
+            with open(path, encoding='utf-8') as f:
+                self.kb += [line[2:].strip() for line in f if line.startswith('Q:')]
+        if not self.kb:
+            self.kb = ["What are your business hours?"]
+        self.words = sorted({w.strip('?.,').lower() for q in self.kb for w in q.split() if len(w.strip('?.,')) > 5})
+
+    def kb_question(self) -> str:
+        return random.choice(self.kb)
+
+    def llm_question(self, unique: bool) -> str:
+        word = random.choice(self.words) if self.words else "pricing"
+        suffix = f" (ref {random.randrange(10 ** 6)})" if unique else ""
+        return f"Could you explain the {word} details for a first time customer{suffix}?"
+
+class LoadRun:
+    def __init__(self, client: httpx.AsyncClient, args, questions: Questions):
+        self.client = client
+        self.args = args
+        self.questions = questions
+        self.latencies: Dict[str, List[float]] = defaultdict(list)
+        self.statuses: Dict[str, Dict[int, int]] = defaultdict(lambda: defaultdict(int))
+        self.failures: Dict[str, int] = defaultdict(int)
+        self.chat_messages = 0  # visitor messages sent through /chat
+        self.session_messages = 0  # of which forwarded into Odoo sessions
+        self.handoffs: Dict[str, int] = defaultdict(int)
+        self.agent_replies = 0
+
+    async def call(self, op: str, method: str, path: str, **kwargs) -> Optional[httpx.Response]:
+        started = time.perf_counter()
+        try:
+            response = await self.client.request(method, path, **kwargs)
+        except httpx.HTTPError:
+            self.failures[op] += 1
+            return None
+        self.latencies[op].append(time.perf_counter() - started)
+        self.statuses[op][response.status_code] += 1
+        return response if response.status_code == 200 else None
+
+    async def think(self):
+        await asyncio.sleep(self.args.think.sample())
+
+    async def chat(self, op: str, visitor_id: str, message: str, session_id: Optional[int] = None):
+        self.chat_messages += 1
+        payload = {"message": message, "visitor_name": visitor_id, "visitor_id": visitor_id}
+        if session_id is not None:
+            payload["session_id"] = str(session_id)
+            self.session_messages += 1
+        response = await self.call(op, "POST", "/chat", json=payload)
+        return response.json() if response is not None else None
+
+    async def visitor(self, number: int):
+        visitor_id = f"loadtest-{number}"
+        for _ in range(self.args.questions):
+            if random.random() < self.args.llm_share:
+                await self.chat("chat_llm", visitor_id, self.questions.llm_question(self.args.unique_questions))
+            else:
+                await self.chat("chat_kb", visitor_id, self.questions.kb_question())
+            await self.think()
+
+        if random.random() >= self.args.handoff_share:
+            return
+        reply = await self.chat("chat_handoff", visitor_id, HANDOFF_REQUEST)
+        ticket = reply and reply.get('handoff_ticket')
+        if not ticket:
+            self.handoffs["not_queued"] += 1
+            return
+        response = await self.call("handoff_wait", "GET", f"/handoff/{ticket}", params={"wait": 25})
+        handoff = response.json() if response is not None else {}
+        self.handoffs[handoff.get('status', 'error')] += 1
+        session_id = handoff.get('odoo_session_id')
+        if not session_id:
+            return
+
+        after_id = 0
+        for i in range(self.args.session_messages):
+            await self.chat("chat_session", visitor_id, f"Message {i + 1} from {visitor_id}", session_id)
+            for _ in range(self.args.polls):
+                await asyncio.sleep(self.args.poll_interval)
+                response = await self.call("messages_poll", "GET", f"/messages/{session_id}",
+                                           params={"after_id": after_id})
+                if response is None:
+                    continue
+                for message in response.json().get('messages', []):
+                    if message['body'] in ('SESSION_ENDED', 'AGENT_DISCONNECTED'):
+                        self.handoffs["ended_by_agent"] += 1
+                        return
+                    after_id = max(after_id, message['id'])
+                    self.agent_replies += 1
+            await self.think()
+
+    async def run(self) -> float:
+        started = time.perf_counter()
+
+        async def start(number: int):
+            await asyncio.sleep(self.args.ramp * number / max(1, self.args.visitors))
+            await self.visitor(number)
+
+        await asyncio.gather(*[start(n) for n in range(self.args.visitors)])
+        return time.perf_counter() - started
+
+def report(run: LoadRun, elapsed: float, odoo_stats: Optional[dict], llm_stats: Optional[dict]) -> dict:
+    operations = {}
+    for op in sorted(set(run.latencies) | set(run.failures)):
+        operations[op] = {
+            **{k: (v * 1000 if k != "count" else v) for k, v in summarize(run.latencies[op]).items()},
+            "statuses": dict(run.statuses[op]),
+            "transport_errors": run.failures[op]
+        }
+    result = {
+        "elapsed_s": elapsed,
+        "visitors": run.args.visitors,
+        "chat_messages": run.chat_messages,
+        "session_messages": run.session_messages,
+        "requests_per_s": sum(len(v) for v in run.latencies.values()) / elapsed if elapsed else 0.0,
+        "operations_ms": operations,
+        "handoffs": dict(run.handoffs),
+        "agent_replies_seen": run.agent_replies
+    }
+    if odoo_stats is not None:
+        rpcs = odoo_stats.get('rpcs', {})
+        total = sum(rpcs.values())
+        result["odoo"] = {
+            "rpcs": rpcs,
+            "total_rpcs": total,
+            "rpcs_per_chat_message": total / run.chat_messages if run.chat_messages else 0.0,
+            "rpcs_per_session_message": total / run.session_messages if run.session_messages else 0.0,
+            "faults": odoo_stats.get('faults', {})
+        }
+    if llm_stats is not None:
+        result["llm"] = llm_stats
+    return result
+
+def print_report(result: dict):
+    print(f"\n{result['visitors']} visitors, {result['chat_messages']} chat messages "
+          f"({result['session_messages']} into Odoo sessions) in {result['elapsed_s']:.1f} s, "
+          f"{result['requests_per_s']:.1f} req/s")
+    print(f"\n{'operation':<16}{'count':>7}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}{'max ms':>10}  statuses")
+    for op, s in result['operations_ms'].items():
+        statuses = ", ".join(f"{code}: {n}" for code, n in sorted(s['statuses'].items()))
+        if s['transport_errors']:
+            statuses += f", transport errors: {s['transport_errors']}"
+        print(f"{op:<16}{s['count']:>7}{s['p50']:>10.1f}{s['p95']:>10.1f}{s['p99']:>10.1f}{s['max']:>10.1f}  {statuses}")
+    print(f"\nhandoffs: {result['handoffs']}, agent replies seen: {result['agent_replies_seen']}")
+    odoo = result.get('odoo')
+    if odoo:
+        print(f"\nOdoo RPCs: {odoo['total_rpcs']} total, {odoo['rpcs_per_chat_message']:.2f} per chat message, "
+              f"{odoo['rpcs_per_session_message']:.2f} per session message")
+        for method, n in sorted(odoo['rpcs'].items(), key=lambda item: -item[1]):
+            print(f"  {method:<20}{n:>8}")
+        if odoo['faults']:
+            print(f"  injected faults: {odoo['faults']}")
+    if result.get('llm'):
+        print(f"\nLLM: {result['llm']}")
+
+def configure_middleware(odoo_url: str, llm_url: str, spool_path: str, overrides: List[str]):
+    """Environment for src.main; must be set before it is imported"""
+    os.environ.update({
+        "ODOO_URL": odoo_url,
+        "ODOO_DB": "mock",
+        "ODOO_USERNAME": "loadtest",
+        "ODOO_PASSWORD": "loadtest",
+        "OPENAI_API_KEY": "loadtest",
+        "LLM_BASE_URL": f"{llm_url}/v1",
+        "OUTBOUND_SPOOL_PATH": spool_path,
+        "KB_SNAPSHOT_PATH": "",
+        "LIVECHAT_CHANNEL_IDS": "1",
+        # Every simulated visitor shares this process's client address
+        "RATE_LIMIT_IP_RATE": "0",
+        "LOG_LEVEL": os.environ.get("LOG_LEVEL", "WARNING")
+    })
+    for override in overrides:
+        key, _, value = override.partition('=')
+        os.environ[key] = value
+
+async def wait_for_spool(main, timeout: float = 30.0):
+    """Let queued visitor messages reach (mock) Odoo before counting RPCs"""
+    if not main.outbound_spool:
+        return
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline and main.outbound_spool.stats()["entries"].get("pending", 0):
+        await asyncio.sleep(0.1)
+
+async def run_in_process(args, questions: Questions) -> dict:
+    odoo = mock_odoo.from_arguments(args)
+    llm = mock_llm.from_arguments(args)
+    servers = [BackgroundServer(odoo.app), BackgroundServer(llm.app)]
+    odoo_url, llm_url = [server.start() for server in servers]
+    spool_dir = tempfile.TemporaryDirectory()
+    configure_middleware(odoo_url, llm_url, os.path.join(spool_dir.name, 'outbound.db'), args.env)
+
+    from src import main
+    await main.startup()
+    try:
+        transport = httpx.ASGITransport(app=main.app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://middleware", timeout=60) as client:
+            run = LoadRun(client, args, questions)
+            elapsed = await run.run()
+        await wait_for_spool(main)
+        return report(run, elapsed, odoo.stats(), llm.stats())
+    finally:
+        await main.shutdown()
+        for server in servers:
+            server.stop()
+        spool_dir.cleanup()
+
+async def run_remote(args, questions: Questions) -> dict:
+    async with httpx.AsyncClient(base_url=args.url, timeout=60) as client:
+        if args.odoo_stats:
+            await client.post(f"{args.odoo_stats}/mock/reset")
+        run = LoadRun(client, args, questions)
+        elapsed = await run.run()
+        odoo_stats = None
+        if args.odoo_stats:
+            await asyncio.sleep(args.settle)
+            odoo_stats = (await client.get(f"{args.odoo_stats}/mock/stats")).json()
+    return report(run, elapsed, odoo_stats, None)
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Offline load test for the AI middleware")
+    parser.add_argument('--visitors', type=int, default=50, help='simulated widget visitors (default 50)')
+    parser.add_argument('--ramp', type=float, default=5.0, help='seconds over which visitors arrive (default 5)')
+    parser.add_argument('--questions', type=int, default=2, help='questions each visitor asks first (default 2)')
+    parser.add_argument('--llm-share', type=float, default=0.3,
+                        help='share of questions needing the LLM rather than a direct KB answer (default 0.3)')
+    parser.add_argument('--unique-questions', action='store_true',
+                        help='make every LLM question unique so the answer cache never hits')
+    parser.add_argument('--handoff-share', type=float, default=0.5,
+                        help='share of visitors asking for a human (default 0.5)')
+    parser.add_argument('--session-messages', type=int, default=3,
+                        help='messages each connected visitor sends to the operator (default 3)')
+    parser.add_argument('--polls', type=int, default=2, help='/messages polls after each message (default 2)')
+    parser.add_argument('--poll-interval', type=float, default=1.0, help='seconds between polls (default 1)')
+    parser.add_argument('--think', type=Latency.parse, default=Latency.parse('uniform:0.5:2'),
+                        help='visitor pause between messages (default uniform:0.5:2)')
+    parser.add_argument('--url', help='drive a running middleware instead of an in-process one')
+    parser.add_argument('--odoo-stats', help='with --url: base URL of the mock Odoo, to count its RPCs')
+    parser.add_argument('--settle', type=float, default=5.0,
+                        help='with --url: seconds to wait for queued deliveries before reading RPC counts')
+    parser.add_argument('--env', action='append', default=[], metavar='KEY=VALUE',
+                        help='extra middleware setting for the in-process run, e.g. --env ODOO_STATUS_TTL=1')
+    parser.add_argument('--knowledge', default=os.path.join(os.path.dirname(__file__), '..', 'knowledge'),
+                        help='knowledge directory the questions are drawn from')
+    parser.add_argument('--json', action='store_true', help='print the report as JSON')
+    mock_odoo.add_arguments(parser)
+    mock_llm.add_arguments(parser)
+    return parser.parse_args(argv)
+
+def main(argv=None):
+    args = parse_args(argv)
+    questions = Questions(args.knowledge)
+    runner = run_remote if args.url else run_in_process
+    result = asyncio.run(runner(args, questions))
+    if args.json:
+        json.dump(result, sys.stdout, indent=2)
+        print()
+    else:
+        print_report(result)
+
+if __name__ == "__main__":
+    main()
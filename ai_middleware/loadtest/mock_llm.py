@@ -0,0 +1,137 @@
+"""OpenAI-compatible /v1/chat/completions stand-in.
+
+Answers with a canned sentence built from the request, after a
+time-to-first-token delay; streamed answers add a per-token delay. Faults
+return the API's error shapes (500 server error, 429 rate limit).
+
+Run standalone:  python -m loadtest.mock_llm --port 8070 --llm-latency uniform:0.3:1.2
+and point the middleware at it with LLM_BASE_URL=http://127.0.0.1:8070/v1
+"""
+from collections import Counter
+import argparse
+import asyncio
+import json
+import time
+import uuid
+
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse, StreamingResponse
+
+from .profiles import Faults, Latency
+
+class MockLLM:
+    def __init__(self, latency: Latency = Latency(), token_delay: Latency = Latency(),
+                 faults: Faults = Faults(), rate_limit_rate: float = 0.0, answer_tokens: int = 40):
+        self.latency = latency  # until the first token / the full non-streamed answer
+        self.token_delay = token_delay
+        self.faults = faults
+        self.rate_limit_rate = rate_limit_rate
+        self.answer_tokens = answer_tokens
+        self.requests: Counter = Counter()
+        self.tokens = Counter()
+        self.app = self._build_app()
+
+    def stats(self) -> dict:
+        return {"requests": dict(self.requests), "tokens": dict(self.tokens)}
+
+    def reset_stats(self):
+        self.requests.clear()
+        self.tokens.clear()
+
+    def _answer(self, messages: list) -> list:
+        question = next((m.get('content', '') for m in reversed(messages) if m.get('role') == 'user'), '')
+        words = f"Thanks for asking about {question.strip()[:60]}. Here is what our documentation says:".split()
+        filler = ["Our", "team", "is", "happy", "to", "help", "with", "that."]
+        while len(words) < self.answer_tokens:
+            words += filler
+        return [w + " " for w in words[:self.answer_tokens]]
+
+    def _build_app(self) -> FastAPI:
+        app = FastAPI(title="Mock LLM")
+
+        @app.post("/v1/chat/completions")
+        async def completions(request: Request):
+            body = await request.json()
+            stream = bool(body.get('stream'))
+            self.requests["stream" if stream else "complete"] += 1
+            await asyncio.sleep(self.latency.sample())
+
+            if self.faults.roll(self.rate_limit_rate):
+                self.requests["rate_limited"] += 1
+                return JSONResponse({"error": {"message": "Rate limit reached", "type": "requests",
+                                               "code": "rate_limit_exceeded"}},
+                                    status_code=429, headers={"retry-after": "1"})
+            if self.faults.roll(self.faults.error_rate) or self.faults.roll(self.faults.http_error_rate):
+                self.requests["failed"] += 1
+                return JSONResponse({"error": {"message": "The server had an error", "type": "server_error"}},
+                                    status_code=500)
+
+            tokens = self._answer(body.get('messages', []))[:body.get('max_tokens') or None]
+            prompt_tokens = sum(len(str(m.get('content', '')).split()) for m in body.get('messages', []))
+            self.tokens["prompt"] += prompt_tokens
+            self.tokens["completion"] += len(tokens)
+            completion_id = f"chatcmpl-{uuid.uuid4().hex[:24]}"
+            model = body.get('model', 'mock')
+            created = int(time.time())
+
+            if not stream:
+                return {
+                    "id": completion_id,
+                    "object": "chat.completion",
+                    "created": created,
+                    "model": model,
+                    "choices": [{"index": 0, "finish_reason": "stop",
+                                 "message": {"role": "assistant", "content": "".join(tokens).strip()}}],
+                    "usage": {"prompt_tokens": prompt_tokens, "completion_tokens": len(tokens),
+                              "total_tokens": prompt_tokens + len(tokens)}
+                }
+
+            async def events():
+                def chunk(delta: dict, finish_reason=None) -> str:
+                    return "data: " + json.dumps({
+                        "id": completion_id,
+                        "object": "chat.completion.chunk",
+                        "created": created,
+                        "model": model,
+                        "choices": [{"index": 0, "delta": delta, "finish_reason": finish_reason}]
+                    }) + "\n\n"
+
+                yield chunk({"role": "assistant", "content": ""})
+                for i, token in enumerate(tokens):
+                    if i:
+                        await asyncio.sleep(self.token_delay.sample())
+                    yield chunk({"content": token})
+                yield chunk({}, "stop")
+                yield "data: [DONE]\n\n"
+
+            return StreamingResponse(events(), media_type="text/event-stream")
+
+        @app.get("/mock/stats")
+        async def get_stats():
+            return self.stats()
+
+        return app
+
+def add_arguments(parser: argparse.ArgumentParser):
+    parser.add_argument('--llm-latency', type=Latency.parse, default=Latency.parse('lognormal:0.6:0.4'),
+                        help='time to the first token (default lognormal:0.6:0.4)')
+    parser.add_argument('--llm-token-delay', type=Latency.parse, default=Latency.parse('fixed:0.02'),
+                        help='delay between streamed tokens (default fixed:0.02)')
+    parser.add_argument('--llm-error-rate', type=float, default=0.0, help='share of completions failing with 500')
+    parser.add_argument('--llm-rate-limit-rate', type=float, default=0.0, help='share of completions refused with 429')
+
+def from_arguments(args) -> MockLLM:
+    return MockLLM(
+        latency=args.llm_latency,
+        token_delay=args.llm_token_delay,
+        faults=Faults(error_rate=args.llm_error_rate),
+        rate_limit_rate=args.llm_rate_limit_rate
+    )
+
+if __name__ == "__main__":
+    import uvicorn
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[0])
+    parser.add_argument('--port', type=int, default=8070)
+    add_arguments(parser)
+    args = parser.parse_args()
+    uvicorn.run(from_arguments(args).app, host="127.0.0.1", port=args.port, log_level="warning")
@@ -0,0 +1,375 @@
+"""In-memory stand-in for the parts of Odoo the middleware calls.
+
+Implements /web/session/authenticate, /im_livechat/get_session and the
+call_kw methods used by OdooClient (discuss.channel read / message_post /
+_notify_thread, mail.message search_read, im_livechat.channel
+search_read). Every response is delayed by a Latency profile and may be
+turned into a fault. Simulated operators reply to visitor messages and leave
+sessions on a schedule (AgentScript).
+
+Run standalone:  python -m loadtest.mock_odoo --port 8069 --odoo-latency lognormal:0.05:0.5
+GET /mock/stats returns RPC counts, POST /mock/reset clears them.
+"""
+from collections import Counter
+from datetime import datetime, timezone
+from typing import Dict, List, Optional, Sequence, Tuple
+import argparse
+import asyncio
+import itertools
+import random
+import time
+import uuid
+
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse, PlainTextResponse
+
+from .profiles import Faults, Latency
+
+VISITOR_EMAIL = 'visitor@livechat.com'
+
+class AgentScript:
+    """How the simulated operators behave.
+
+    operators: partner ids of the operators of every live chat channel.
+    reply_delay: time from a visitor message to the operator's answer.
+    reply_rate: share of visitor messages that get an answer.
+    leave_after: time from session start until the operator ends it, or
+    None to keep sessions open. leave_mode "close" closes the session,
+    "leave" only removes the operator (the widget's "agent disconnected").
+    offline_windows: (start, end) seconds after startup during which no
+    operator is available.
+    """
+
+    def __init__(self, operators: Sequence[int] = (3,), reply_delay: Latency = Latency("uniform", 0.5, 2.0),
+                 reply_rate: float = 1.0, leave_after: Optional[Latency] = None, leave_mode: str = "close",
+                 offline_windows: Sequence[Tuple[float, float]] = ()):
+        if leave_mode not in ("close", "leave"):
+            raise ValueError(f"Unknown leave mode: {leave_mode}")
+        self.operators = list(operators)
+        self.reply_delay = reply_delay
+        self.reply_rate = reply_rate
+        self.leave_after = leave_after
+        self.leave_mode = leave_mode
+        self.offline_windows = list(offline_windows)
+
+    def online(self, elapsed: float) -> bool:
+        return not any(start <= elapsed < end for start, end in self.offline_windows)
+
+def _now() -> str:
+    return datetime.now(timezone.utc).strftime('%Y-%m-%d %H:%M:%S')
+
+def _match(term, record: dict) -> bool:
+    field, op, value = term
+    current = record.get(field, False)
+    if op == '=':
+        return current == value
+    if op == '!=':
+        return current != value
+    if op == '>':
+        return current is not False and current > value
+    if op == 'in':
+        return current in value
+    if op in ('ilike', 'not ilike'):
+        found = bool(current) and str(value).lower() in str(current).lower()
+        return found if op == 'ilike' else not found
+    raise ValueError(f"Unsupported domain operator: {op}")
+
+def matches(domain: list, record: dict) -> bool:
+    """Evaluate an Odoo prefix-notation domain (implicit AND between terms)"""
+    def parse(i: int):
+        token = domain[i]
+        if token == '|':
+            left, i = parse(i + 1)
+            right, i = parse(i)
+            return left or right, i
+        if token == '&':
+            left, i = parse(i + 1)
+            right, i = parse(i)
+            return left and right, i
+        if token == '!':
+            value, i = parse(i + 1)
+            return not value, i
+        return _match(token, record), i + 1
+
+    i = 0
+    result = True
+    while i < len(domain):
+        value, i = parse(i)
+        result = result and value
+    return result
+
+class MockOdoo:
+    def __init__(self, latency: Latency = Latency(), faults: Faults = Faults(),
+                 agents: AgentScript = AgentScript(), livechat_channels: Sequence[int] = (1,)):
+        self.latency = latency
+        self.faults = faults
+        self.agents = agents
+        self.livechat_channels = list(livechat_channels)
+        self.started = time.monotonic()
+        self._ids = itertools.count(1000)
+        self._tokens = set()  # valid session cookies
+        self.sessions: Dict[int, dict] = {}  # discuss.channel records
+        self.messages: List[dict] = []  # mail.message records, ascending id
+        self.rpcs: Counter = Counter()
+        self.faults_injected: Counter = Counter()
+        self._tasks = set()
+        self.app = self._build_app()
+
+    def reset_stats(self):
+        self.rpcs.clear()
+        self.faults_injected.clear()
+
+    def stats(self) -> dict:
+        return {
+            "rpcs": dict(self.rpcs),
+            "total_rpcs": sum(self.rpcs.values()),
+            "faults": dict(self.faults_injected),
+            "sessions": len(self.sessions),
+            "open_sessions": sum(1 for s in self.sessions.values() if s['livechat_status'] == 'in_progress'),
+            "messages": len(self.messages)
+        }
+
+    def _build_app(self) -> FastAPI:
+        app = FastAPI(title="Mock Odoo")
+
+        @app.post("/web/session/authenticate")
+        async def authenticate(request: Request):
+            body = await request.json()
+            fault = await self._delay_and_fault("authenticate", body, expirable=False)
+            if fault:
+                return fault
+            token = uuid.uuid4().hex
+            self._tokens.add(token)
+            response = JSONResponse({"jsonrpc": "2.0", "id": body.get('id'), "result": {"uid": 2, "db": "mock"}})
+            response.set_cookie("session_id", token)
+            return response
+
+        @app.post("/im_livechat/get_session")
+        async def get_session(request: Request):
+            body = await request.json()
+            fault = await self._delay_and_fault("get_session", body, expirable=False)
+            if fault:
+                return fault
+            params = body.get('params', {})
+            return self._result(body, self._open_session(params.get('channel_id'), params.get('anonymous_name')))
+
+        @app.post("/im_livechat/visitor_leave_session")
+        async def visitor_leave_session(request: Request):
+            body = await request.json()
+            fault = await self._delay_and_fault("visitor_leave_session", body, expirable=False)
+            if fault:
+                return fault
+            session = self.sessions.get(body.get('params', {}).get('channel_id'))
+            if session and session['livechat_status'] != 'closed':
+                session['livechat_status'] = 'closed'
+                session['livechat_end_dt'] = _now()
+            return self._result(body, None)
+
+        @app.post("/web/dataset/call_kw")
+        async def call_kw(request: Request):
+            body = await request.json()
+            params = body.get('params', {})
+            method = params.get('method', '?')
+            fault = await self._delay_and_fault(method, body, expirable=True,
+                                                token=request.cookies.get('session_id'))
+            if fault:
+                return fault
+            try:
+                result = self._call(params.get('model'), method, params.get('args', []), params.get('kwargs', {}))
+            except (KeyError, IndexError, ValueError) as e:
+                return self._error(body, f"Mock cannot serve {params.get('model')}.{method}: {e}")
+            return self._result(body, result)
+
+        @app.get("/mock/stats")
+        async def get_stats():
+            return self.stats()
+
+        @app.post("/mock/reset")
+        async def reset():
+            self.reset_stats()
+            return {"ok": True}
+
+        return app
+
+    async def _delay_and_fault(self, method: str, body: dict, expirable: bool, token: Optional[str] = None):
+        """Sleep for the latency profile; return a fault response or None"""
+        self.rpcs[method] += 1
+        delay = self.latency.sample()
+        if delay > 0:
+            await asyncio.sleep(delay)
+        if self.faults.roll(self.faults.http_error_rate):
+            self.faults_injected["http_error"] += 1
+            return PlainTextResponse("<html><body>502 Bad Gateway</body></html>", status_code=502)
+        if expirable:
+            if self.faults.roll(self.faults.expire_rate):
+                self._tokens.clear()
+            if token not in self._tokens:
+                self.faults_injected["session_expired"] += 1
+                return JSONResponse({"jsonrpc": "2.0", "id": body.get('id'), "error": {
+                    "code": 100, "message": "Odoo Session Expired",
+                    "data": {"name": "odoo.http.SessionExpiredException", "message": "Session expired"}
+                }})
+        if self.faults.roll(self.faults.error_rate):
+            self.faults_injected["rpc_error"] += 1
+            return self._error(body, "Injected server error")
+        return None
+
+    @staticmethod
+    def _result(body: dict, result) -> JSONResponse:
+        return JSONResponse({"jsonrpc": "2.0", "id": body.get('id'), "result": result})
+
+    @staticmethod
+    def _error(body: dict, message: str) -> JSONResponse:
+        return JSONResponse({"jsonrpc": "2.0", "id": body.get('id'), "error": {
+            "code": 200, "message": "Odoo Server Error", "data": {"name": "mock.InjectedError", "message": message}
+        }})
+
+    def _operators_online(self) -> List[int]:
+        return self.agents.operators if self.agents.online(time.monotonic() - self.started) else []
+
+    def _open_session(self, channel_id, visitor_name):
+        operators = self._operators_online()
+        if channel_id not in self.livechat_channels or not operators:
+            return False
+        session_id = next(self._ids)
+        operator = operators[session_id % len(operators)]
+        self.sessions[session_id] = {
+            "id": session_id,
+            "name": f"{visitor_name}, Operator {operator}",
+            "livechat_status": "in_progress",
+            "livechat_end_dt": False,
+            "livechat_operator_id": [operator, f"Operator {operator}"],
+            "channel_member_ids": [session_id * 10, session_id * 10 + 1],
+            "is_member": True
+        }
+        if self.agents.leave_after is not None:
+            self._later(self.agents.leave_after.sample(), self._operator_leaves, session_id)
+        return {"channel_id": session_id, "id": session_id, "name": self.sessions[session_id]['name']}
+
+    def _call(self, model: str, method: str, args: list, kwargs: dict):
+        if model == "discuss.channel":
+            if method == "read":
+                fields = args[1] if len(args) > 1 else None
+                return [self._fields(self.sessions[i], fields) for i in args[0] if i in self.sessions]
+            if method == "message_post":
+                return self._post(args[0], kwargs)
+            return True
+        if model == "mail.message" and method == "search_read":
+            domain = args[0]
+            fields = args[1] if len(args) > 1 else kwargs.get('fields')
+            rows = [m for m in self.messages if matches(domain, m)]
+            if kwargs.get('order', '').endswith('desc'):
+                rows.reverse()
+            if kwargs.get('limit'):
+                rows = rows[:kwargs['limit']]
+            return [self._fields(m, fields) for m in rows]
+        if model == "im_livechat.channel" and method == "search_read":
+            operators = self._operators_online()
+            return [{"id": c, "name": f"Channel {c}", "available_operator_ids": list(operators)}
+                    for c in self.livechat_channels]
+        return True
+
+    @staticmethod
+    def _fields(record: dict, fields: Optional[list]) -> dict:
+        if not fields:
+            return dict(record)
+        return {"id": record['id'], **{f: record.get(f, False) for f in fields}}
+
+    def _post(self, session_id: int, kwargs: dict) -> int:
+        session = self.sessions[session_id]
+        message_id = next(self._ids)
+        self.messages.append({
+            "id": message_id,
+            "model": "discuss.channel",
+            "res_id": session_id,
+            "body": kwargs.get('body', ''),
+            "author_id": kwargs.get('author_id', False),
+            "email_from": kwargs.get('email_from', False),
+            "message_id": kwargs.get('message_id', False),
+            "date": _now()
+        })
+        from_visitor = VISITOR_EMAIL in (kwargs.get('email_from') or '')
+        if (from_visitor and session['livechat_operator_id'] and session['livechat_status'] == 'in_progress'
+                and random.random() < self.agents.reply_rate):
+            self._later(self.agents.reply_delay.sample(), self._operator_replies, session_id)
+        return message_id
+
+    def _later(self, delay: float, callback, *args):
+        async def run():
+            await asyncio.sleep(delay)
+            callback(*args)
+        task = asyncio.ensure_future(run())
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+
+    def _operator_replies(self, session_id: int):
+        session = self.sessions[session_id]
+        operator = session['livechat_operator_id']
+        if not operator or session['livechat_status'] != 'in_progress':
+            return
+        message_id = next(self._ids)
+        self.messages.append({
+            "id": message_id,
+            "model": "discuss.channel",
+            "res_id": session_id,
+            "body": f"<p>Reply {message_id} from {operator[1]}</p>",
+            "author_id": operator,
+            "email_from": f"{operator[1]} <operator{operator[0]}@example.com>",
+            "message_id": False,
+            "date": _now()
+        })
+
+    def _operator_leaves(self, session_id: int):
+        session = self.sessions[session_id]
+        if self.agents.leave_mode == "close":
+            session['livechat_status'] = 'closed'
+            session['livechat_end_dt'] = _now()
+        else:
+            session['livechat_operator_id'] = False
+
+def parse_windows(spec: str) -> List[Tuple[float, float]]:
+    """"30-40,90-100" -> [(30, 40), (90, 100)]"""
+    windows = []
+    for part in filter(None, spec.split(',')):
+        start, end = part.split('-')
+        windows.append((float(start), float(end)))
+    return windows
+
+def add_arguments(parser: argparse.ArgumentParser):
+    parser.add_argument('--odoo-latency', type=Latency.parse, default=Latency.parse('lognormal:0.05:0.4'),
+                        help='Odoo response time distribution (default lognormal:0.05:0.4)')
+    parser.add_argument('--odoo-error-rate', type=float, default=0.0, help='share of RPCs answered with an Odoo error')
+    parser.add_argument('--odoo-http-error-rate', type=float, default=0.0, help='share of RPCs answered with HTTP 502')
+    parser.add_argument('--odoo-expire-rate', type=float, default=0.0,
+                        help='share of RPCs that drop the login session (Session Expired)')
+    parser.add_argument('--operators', type=int, default=2, help='operators per live chat channel')
+    parser.add_argument('--reply-delay', type=Latency.parse, default=Latency.parse('uniform:0.5:2'),
+                        help='operator reply delay after a visitor message')
+    parser.add_argument('--reply-rate', type=float, default=1.0, help='share of visitor messages operators answer')
+    parser.add_argument('--leave-after', type=Latency.parse, default=None,
+                        help='operator ends the session this long after it started')
+    parser.add_argument('--leave-mode', choices=['close', 'leave'], default='close')
+    parser.add_argument('--offline', type=parse_windows, default=[],
+                        help='windows without operators, e.g. 30-40,90-100 (seconds after start)')
+
+def from_arguments(args) -> MockOdoo:
+    return MockOdoo(
+        latency=args.odoo_latency,
+        faults=Faults(args.odoo_error_rate, args.odoo_http_error_rate, args.odoo_expire_rate),
+        agents=AgentScript(
+            operators=range(3, 3 + args.operators),
+            reply_delay=args.reply_delay,
+            reply_rate=args.reply_rate,
+            leave_after=args.leave_after,
+            leave_mode=args.leave_mode,
+            offline_windows=args.offline
+        )
+    )
+
+if __name__ == "__main__":
+    import uvicorn
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[0])
+    parser.add_argument('--port', type=int, default=8069)
+    add_arguments(parser)
+    args = parser.parse_args()
+    uvicorn.run(from_arguments(args).app, host="127.0.0.1", port=args.port, log_level="warning")
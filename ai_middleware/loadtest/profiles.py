@@ -0,0 +1,65 @@
+"""Latency and fault profiles shared by the mock servers and the driver"""
+from typing import List, Sequence
+import math
+import random
+
+class Latency:
+    """A delay distribution in seconds, written on the command line as:
+
+    fixed:0.05           always 50 ms
+    uniform:0.02:0.2     between 20 and 200 ms
+    lognormal:0.05:0.6   median 50 ms, sigma 0.6 (long right tail)
+    """
+
+    def __init__(self, kind: str = "fixed", a: float = 0.0, b: float = 0.0):
+        if kind not in ("fixed", "uniform", "lognormal"):
+            raise ValueError(f"Unknown latency distribution: {kind}")
+        self.kind = kind
+        self.a = a
+        self.b = b
+
+    @classmethod
+    def parse(cls, spec: str) -> 'Latency':
+        kind, *params = spec.split(':')
+        values = [float(p) for p in params] + [0.0, 0.0]
+        return cls(kind, values[0], values[1])
+
+    def sample(self) -> float:
+        if self.kind == "uniform":
+            return random.uniform(self.a, self.b)
+        if self.kind == "lognormal":
+            return self.a * math.exp(random.gauss(0.0, self.b)) if self.a > 0 else 0.0
+        return self.a
+
+    def __str__(self) -> str:
+        if self.kind == "fixed":
+            return f"fixed:{self.a:g}"
+        return f"{self.kind}:{self.a:g}:{self.b:g}"
+
+class Faults:
+    """Independent per-request fault probabilities"""
+
+    def __init__(self, error_rate: float = 0.0, http_error_rate: float = 0.0, expire_rate: float = 0.0):
+        self.error_rate = error_rate  # JSON-RPC / API error in a 200 response
+        self.http_error_rate = http_error_rate  # 502 with an HTML body, as from a proxy
+        self.expire_rate = expire_rate  # Odoo only: the login session is dropped
+
+    def roll(self, rate: float) -> bool:
+        return rate > 0 and random.random() < rate
+
+def percentile(ordered: Sequence[float], pct: float) -> float:
+    """Nearest-rank percentile of already sorted samples"""
+    if not ordered:
+        return 0.0
+    rank = max(1, math.ceil(pct / 100.0 * len(ordered)))
+    return ordered[min(rank, len(ordered)) - 1]
+
+def summarize(samples: List[float]) -> dict:
+    ordered = sorted(samples)
+    return {
+        "count": len(ordered),
+        "p50": percentile(ordered, 50),
+        "p95": percentile(ordered, 95),
+        "p99": percentile(ordered, 99),
+        "max": ordered[-1] if ordered else 0.0
+    }
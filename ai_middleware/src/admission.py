@@ -0,0 +1,154 @@
+from collections import OrderedDict
+from contextlib import asynccontextmanager
+from typing import Dict, Optional
+import asyncio
+import time
+
+class Overloaded(Exception):
+    """Request refused to protect Odoo / the LLM; carries the HTTP status and
+    how many seconds the client should wait before retrying"""
+
+    def __init__(self, detail: str, retry_after: float = 1.0, status_code: int = 503):
+        super().__init__(detail)
+        self.detail = detail
+        self.retry_after = retry_after
+        self.status_code = status_code
+
+class RateLimited(Overloaded):
+    def __init__(self, detail: str, retry_after: float):
+        super().__init__(detail, retry_after, status_code=429)
+
+class TokenBucket:
+    """Allows `rate` requests per second on average with bursts up to `burst`"""
+
+    __slots__ = ("rate", "burst", "tokens", "updated")
+
+    def __init__(self, rate: float, burst: float):
+        self.rate = rate
+        self.burst = burst
+        self.tokens = burst
+        self.updated = time.monotonic()
+
+    def take(self) -> float:
+        """Take one token; returns 0 if allowed, else seconds until one is available"""
+        now = time.monotonic()
+        self.tokens = min(self.burst, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+        if self.tokens >= 1:
+            self.tokens -= 1
+            return 0.0
+        return (1 - self.tokens) / self.rate
+
+class RateLimiter:
+    """One token bucket per key (IP, visitor, session), least recently used
+    keys dropped beyond max_keys. rate <= 0 disables the limiter."""
+
+    def __init__(self, name: str, rate: float, burst: float, max_keys: int = 10000):
+        self.name = name
+        self.rate = rate
+        self.burst = max(burst, 1)
+        self.max_keys = max_keys
+        self._buckets: "OrderedDict[str, TokenBucket]" = OrderedDict()
+        self.limited = 0
+
+    def check(self, key) -> None:
+        """Raise RateLimited if key is over its rate"""
+        if self.rate <= 0 or key is None:
+            return
+        key = str(key)
+        bucket = self._buckets.get(key)
+        if bucket is None:
+            bucket = self._buckets[key] = TokenBucket(self.rate, self.burst)
+            if len(self._buckets) > self.max_keys:
+                self._buckets.popitem(last=False)
+        else:
+            self._buckets.move_to_end(key)
+        wait = bucket.take()
+        if wait:
+            self.limited += 1
+            raise RateLimited(f"Too many requests ({self.name})", wait)
+
+    def stats(self) -> dict:
+        return {"rate": self.rate, "burst": self.burst, "keys": len(self._buckets), "limited": self.limited}
+
+class ConcurrencyGate:
+    """Caps calls in flight to a backend, with a bounded wait queue.
+
+    A call waits for a slot only if fewer than max_waiting calls are already
+    waiting, and at most timeout seconds; otherwise it fails at once with
+    Overloaded instead of piling up behind a slow backend.
+    """
+
+    def __init__(self, name: str, limit: int, max_waiting: int = 100, timeout: float = 5.0):
+        self.name = name
+        self.limit = limit
+        self.max_waiting = max_waiting
+        self.timeout = timeout
+        self._semaphore = asyncio.Semaphore(limit)
+        self.in_flight = 0
+        self.waiting = 0
+        self.admitted = 0
+        self.rejected = 0
+        self.timed_out = 0
+
+    @asynccontextmanager
+    async def slot(self):
+        if self._semaphore.locked():
+            if self.waiting >= self.max_waiting:
+                self.rejected += 1
+                raise Overloaded(f"{self.name} is overloaded", self.timeout)
+            self.waiting += 1
+            try:
+                await asyncio.wait_for(self._semaphore.acquire(), self.timeout)
+            except asyncio.TimeoutError:
+                self.timed_out += 1
+                raise Overloaded(f"{self.name} is overloaded", self.timeout)
+            finally:
+                self.waiting -= 1
+        else:
+            await self._semaphore.acquire()
+
+        self.admitted += 1
+        self.in_flight += 1
+        try:
+            yield
+        finally:
+            self.in_flight -= 1
+            self._semaphore.release()
+
+    def stats(self) -> dict:
+        return {
+            "limit": self.limit,
+            "in_flight": self.in_flight,
+            "waiting": self.waiting,
+            "max_waiting": self.max_waiting,
+            "admitted": self.admitted,
+            "rejected": self.rejected,
+            "timed_out": self.timed_out
+        }
+
+class AdmissionControl:
+    """Per-IP, per-visitor and per-session rate limits for the HTTP endpoints"""
+
+    def __init__(self, ip: RateLimiter, visitor: RateLimiter, session: RateLimiter,
+                 trust_forwarded: bool = False):
+        self.ip = ip
+        self.visitor = visitor
+        self.session = session
+        self.trust_forwarded = trust_forwarded
+
+    def client_ip(self, request) -> Optional[str]:
+        if self.trust_forwarded:
+            forwarded = request.headers.get('x-forwarded-for')
+            if forwarded:
+                return forwarded.split(',')[0].strip()
+        return request.client.host if request.client else None
+
+    def admit(self, request, visitor: Optional[str] = None, session_id=None):
+        """Raise RateLimited if the caller is over any of its limits"""
+        self.ip.check(self.client_ip(request))
+        self.visitor.check(visitor)
+        self.session.check(session_id)
+
+    def stats(self) -> Dict[str, dict]:
+        return {"ip": self.ip.stats(), "visitor": self.visitor.stats(), "session": self.session.stats()}
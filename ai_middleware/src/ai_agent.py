@@ -1,55 +1,274 @@
 import os
-from typing import Dict, Tuple, Optional
+import asyncio
+import hashlib
+import logging
+import time
+from typing import AsyncIterator, Dict, List, Tuple, Optional
 from .knowledge_base import KnowledgeBase
+from .answer_cache import AnswerCache, make_key
+from .admission import ConcurrencyGate
+from .intent_router import IntentRouter
+from .metrics import CHAT_DECISIONS, LLM_ERRORS, LLM_SECONDS, LLM_TOKENS
+from .tracing import span
+
+logger = logging.getLogger(__name__)
 
 class AIAgent:
-    def __init__(self, api_key: str, confidence_threshold: float = 0.7):
+    def __init__(self, api_key: str, confidence_threshold: float = 0.7,
+                 kb_snapshot_path: Optional[str] = None,
+                 llm_model: str = "gpt-3.5-turbo", llm_max_tokens: int = 200,
+                 llm_temperature: float = 0.3, llm_timeout: float = 20.0,
+                 llm_max_retries: int = 1, llm_max_concurrency: int = 10,
+                 llm_base_url: Optional[str] = None, llm_max_waiting: int = 50,
+                 llm_queue_timeout: float = 5.0,
+                 cache_size: int = 1000, cache_ttl: float = 3600.0,
+                 cache_max_bytes: int = 8 * 1024 * 1024,
+                 intent_router: Optional[IntentRouter] = None,
+                 greeting_reply: str = "Hello! How can I help you today?",
+                 store=None):
         self.api_key = api_key
         self.confidence_threshold = confidence_threshold
-        self.kb = KnowledgeBase()
+        self.kb = KnowledgeBase(snapshot_path=kb_snapshot_path)
+        self.llm_model = llm_model
+        self.llm_max_tokens = llm_max_tokens
+        self.llm_temperature = llm_temperature
+        self.llm_timeout = llm_timeout
+        self.llm_max_retries = llm_max_retries
+        self.llm_max_concurrency = llm_max_concurrency
+        self.llm_base_url = llm_base_url
+        # Created on first use, inside the running event loop
+        self._llm_client = None
+        # Completions in flight are capped; beyond llm_max_waiting queued calls
+        # (or llm_queue_timeout) they are refused and the KB answer is used
+        self.llm_gate = ConcurrencyGate("LLM", llm_max_concurrency, llm_max_waiting, llm_queue_timeout)
+        # LLM answers keyed by normalized question + retrieved KB context
+        self.answer_cache = AnswerCache(max_entries=cache_size, ttl=cache_ttl, max_bytes=cache_max_bytes)
+        # Optional shared state_store.StateStore: answers one worker paid
+        # the LLM for are reused by the others
+        self.store = store
+        self.shared_cache_hits = 0
+        # Lexicon match run before KB search; see IntentRouter
+        self.intent_router = intent_router or IntentRouter()
+        self.greeting_reply = greeting_reply
         
     def load_knowledge_base(self, directory: str):
         """Load knowledge base from directory"""
         self.kb.load_from_directory(directory)
     
-    def should_handoff(self, message: str, context: str = "") -> Tuple[bool, str, float]:
-        """Determine if message should be handed off to human agent"""
-        # Check for explicit human agent requests first
-        human_keywords = ['support', 'agent', 'human', 'help', 'talk to someone', 'representative']
-        if any(keyword in message.lower() for keyword in human_keywords):
-            return True, "I'll connect you with a human agent.", 0.0
+    def refresh_knowledge_base(self) -> bool:
+        """Pick up edited, added or removed knowledge files"""
+        return self.kb.refresh()
+    
+    def _get_llm_client(self):
+        """Long-lived async OpenAI client; its connection pool is reused across messages"""
+        if self._llm_client is None:
+            from openai import AsyncOpenAI
+            self._llm_client = AsyncOpenAI(
+                api_key=self.api_key,
+                base_url=self.llm_base_url,
+                timeout=self.llm_timeout,
+                max_retries=self.llm_max_retries
+            )
+        return self._llm_client
+    
+    async def close(self):
+        """Close the LLM client's connections"""
+        if self._llm_client is not None:
+            await self._llm_client.close()
+            self._llm_client = None
+    
+    def _llm_messages(self, message: str, kb_context: str) -> List[Dict[str, str]]:
+        return [
+            {"role": "system", "content": f"Answer the customer question using this context: {kb_context}"},
+            {"role": "user", "content": message}
+        ]
+    
+    async def _complete(self, message: str, kb_context: str) -> str:
+        """Answer a question from KB context, bounded by the concurrency limit"""
+        client = self._get_llm_client()
+        async with self.llm_gate.slot():
+            started = time.perf_counter()
+            try:
+                with span("llm"):
+                    response = await client.chat.completions.create(
+                        model=self.llm_model,
+                        messages=self._llm_messages(message, kb_context),
+                        max_tokens=self.llm_max_tokens,
+                        temperature=self.llm_temperature
+                    )
+            except Exception:
+                LLM_ERRORS.inc()
+                raise
+            LLM_SECONDS.labels("complete").observe(time.perf_counter() - started)
+        if response.usage:
+            LLM_TOKENS.labels("prompt").inc(response.usage.prompt_tokens)
+            LLM_TOKENS.labels("completion").inc(response.usage.completion_tokens)
+        return response.choices[0].message.content.strip()
+    
+    async def _complete_stream(self, message: str, kb_context: str) -> AsyncIterator[str]:
+        """Yield completion text deltas as the LLM produces them"""
+        client = self._get_llm_client()
+        async with self.llm_gate.slot():
+            started = time.perf_counter()
+            chunks = 0
+            try:
+                stream = await client.chat.completions.create(
+                    model=self.llm_model,
+                    messages=self._llm_messages(message, kb_context),
+                    max_tokens=self.llm_max_tokens,
+                    temperature=self.llm_temperature,
+                    stream=True
+                )
+                async for chunk in stream:
+                    if chunk.choices and chunk.choices[0].delta.content:
+                        chunks += 1
+                        yield chunk.choices[0].delta.content
+            except Exception:
+                LLM_ERRORS.inc()
+                raise
+            finally:
+                # Streams carry no usage block; each content chunk is ~one token
+                LLM_TOKENS.labels("completion").inc(chunks)
+            LLM_SECONDS.labels("stream").observe(time.perf_counter() - started)
+    
+    def _route(self, message: str, count: bool = True):
+        """Decide without the LLM where possible.
+
+        Returns (decision, relevant_docs, route): decision is a final
+        (handoff_needed, response, confidence) tuple, or None when the LLM
+        should answer from relevant_docs; route names the path taken.
+        count=False keeps the message out of the intent router's stats.
+        """
+        # Explicit human requests and bare greetings skip KB search entirely
+        intent = self.intent_router.route(message, count=count)
+        if intent == "handoff":
+            return (True, "I'll connect you with a human agent.", 0.0), [], "handoff"
+        if intent == "greeting":
+            return (False, self.greeting_reply, 1.0), [], "greeting"
         
         # Get relevant context from knowledge base
         relevant_docs = self.kb.search(message, top_k=3)
         
+        # FAQ-only intents take the best KB match, however weak, over the LLM
+        if intent == "faq" and relevant_docs:
+            return (False, relevant_docs[0][0], relevant_docs[0][1]), relevant_docs, "faq"
+        
         # If we have good knowledge base matches, return the answer
         if relevant_docs and relevant_docs[0][1] >= 0.5:
-            return False, relevant_docs[0][0], relevant_docs[0][1]
+            return (False, relevant_docs[0][0], relevant_docs[0][1]), relevant_docs, "kb"
         
         # If we have some context, use AI to process it
         if relevant_docs:
-            kb_context = "\n".join([doc for doc, score in relevant_docs if score > 0.2])
+            return None, relevant_docs, "llm"
+        
+        # No good matches - handoff to human
+        return (True, "I need to connect you with a human agent for better assistance.", 0.0), [], "handoff"
+    
+    def _cached_answer(self, key: str) -> Optional[Tuple[bool, str, float]]:
+        cached = self.answer_cache.get(key)
+        if cached is None and self.store is not None and self.answer_cache.max_entries > 0:
+            shared = self.store.get(self._store_key(key))
+            if shared is not None:
+                cached = tuple(shared)
+                self.answer_cache.put(key, cached)
+                self.shared_cache_hits += 1
+        return cached
+    
+    def _cache_answer(self, key: str, result: Tuple[bool, str, float]):
+        self.answer_cache.put(key, result)
+        if self.store is not None and self.answer_cache.max_entries > 0:
+            self.store.set(self._store_key(key), list(result), self.answer_cache.ttl)
+    
+    @staticmethod
+    def _store_key(key: str) -> str:
+        return "answer:" + hashlib.blake2b(key.encode('utf-8'), digest_size=16).hexdigest()
+    
+    @staticmethod
+    def _kb_context(relevant_docs: List[Tuple[str, float]]) -> str:
+        return "\n".join([doc for doc, score in relevant_docs if score > 0.2])
+    
+    async def should_handoff(self, message: str, context: str = "") -> Tuple[bool, str, float]:
+        """Determine if message should be handed off to human agent"""
+        decision, route = await self._decide(message)
+        CHAT_DECISIONS.labels(route).inc()
+        return decision
+    
+    async def _decide(self, message: str, count: bool = True) -> Tuple[Tuple[bool, str, float], str]:
+        """(decision, route) for a message; the caller records the route"""
+        decision, relevant_docs, route = self._route(message, count=count)
+        if decision:
+            return decision, route
+        
+        key = make_key(message, relevant_docs)
+        cached = self._cached_answer(key)
+        if cached:
+            return cached, "cache"
+        
+        try:
+            ai_answer = await self._complete(message, self._kb_context(relevant_docs))
+            self._cache_answer(key, (False, ai_answer, 0.8))
+            return (False, ai_answer, 0.8), "llm"
             
-            try:
-                from openai import OpenAI
-                client = OpenAI(api_key=self.api_key)
-                response = client.chat.completions.create(
-                    model="gpt-3.5-turbo",
-                    messages=[
-                        {"role": "system", "content": f"Answer the customer question using this context: {kb_context}"},
-                        {"role": "user", "content": message}
-                    ],
-                    max_tokens=200,
-                    temperature=0.3
-                )
-                
-                ai_answer = response.choices[0].message.content.strip()
-                return False, ai_answer, 0.8
-                
-            except Exception as e:
-                print(f"AI processing error: {e}")
+        except Exception as e:
+            logger.warning("AI processing error: %s", e)
+            # Fall back to knowledge base answer
+            return (False, relevant_docs[0][0], relevant_docs[0][1]), "kb_fallback"
+    
+    async def stream_handoff(self, message: str, context: str = "") -> AsyncIterator[Tuple[str, object]]:
+        """Streaming variant of should_handoff.
+
+        Yields ("delta", text) events as the answer is produced (a KB answer
+        arrives as a single delta), then one ("done", (handoff_needed,
+        response, confidence)) event.
+        """
+        decision, relevant_docs, route = self._route(message)
+        if decision:
+            CHAT_DECISIONS.labels(route).inc()
+            if not decision[0]:
+                yield "delta", decision[1]
+            yield "done", decision
+            return
+        
+        key = make_key(message, relevant_docs)
+        cached = self._cached_answer(key)
+        if cached:
+            CHAT_DECISIONS.labels("cache").inc()
+            yield "delta", cached[1]
+            yield "done", cached
+            return
+        
+        parts = []
+        complete = False
+        try:
+            async for delta in self._complete_stream(message, self._kb_context(relevant_docs)):
+                parts.append(delta)
+                yield "delta", delta
+            complete = True
+        except Exception as e:
+            logger.warning("AI processing error: %s", e)
+            if not parts:
                 # Fall back to knowledge base answer
-                return False, relevant_docs[0][0], relevant_docs[0][1]
+                CHAT_DECISIONS.labels("kb_fallback").inc()
+                yield "delta", relevant_docs[0][0]
+                yield "done", (False, relevant_docs[0][0], relevant_docs[0][1])
+                return
         
-        # No good matches - handoff to human
-        return True, "I need to connect you with a human agent for better assistance.", 0.0
\ No newline at end of file
+        result = (False, "".join(parts).strip(), 0.8)
+        CHAT_DECISIONS.labels("llm").inc()
+        if complete:
+            self._cache_answer(key, result)
+        yield "done", result
+    
+    async def warm_cache(self, questions: List[str]) -> int:
+        """Answer frequent questions ahead of traffic; returns how many were cached.
+
+        Warm-up answers are not visitor traffic, so they stay out of the
+        chat decision and intent route counters.
+        """
+        before = len(self.answer_cache)
+        questions = [q for q in questions if q.strip()]
+        # Batches of llm_max_concurrency stay within the LLM gate's capacity
+        # instead of being refused by it
+        for i in range(0, len(questions), self.llm_max_concurrency):
+            await asyncio.gather(*[self._decide(q, count=False) for q in questions[i:i + self.llm_max_concurrency]])
+        return len(self.answer_cache) - before
\ No newline at end of file
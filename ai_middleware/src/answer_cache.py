@@ -0,0 +1,94 @@
+from collections import OrderedDict
+from typing import Any, Dict, List, Optional, Tuple
+import hashlib
+import re
+import time
+
+_PUNCT_RE = re.compile(r'[^\w\s]')
+_SPACE_RE = re.compile(r'\s+')
+
+def normalize_message(message: str) -> str:
+    """Case, punctuation and whitespace-insensitive form of a question"""
+    return _SPACE_RE.sub(' ', _PUNCT_RE.sub(' ', message.lower())).strip()
+
+def make_key(message: str, relevant_docs: List[Tuple[str, float]]) -> str:
+    """Cache key: normalized message plus a hash of the retrieved KB context.
+
+    When the knowledge base changes, the retrieved pairs (or their scores)
+    change too, so old answers simply stop being looked up.
+    """
+    context = hashlib.blake2b(digest_size=12)
+    for doc, score in relevant_docs:
+        context.update(doc.encode('utf-8'))
+        context.update(f"\0{score:.6f}\0".encode('ascii'))
+    return f"{normalize_message(message)}\0{context.hexdigest()}"
+
+class AnswerCache:
+    """LRU cache with per-entry TTL and an approximate memory budget"""
+
+    # Rough per-entry overhead (dict slot, tuple, floats) added to string sizes
+    ENTRY_OVERHEAD = 200
+
+    def __init__(self, max_entries: int = 1000, ttl: float = 3600.0, max_bytes: int = 8 * 1024 * 1024):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.max_bytes = max_bytes
+        self._entries: "OrderedDict[str, Tuple[float, int, Any]]" = OrderedDict()  # key -> (expires, size, value)
+        self.bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def get(self, key: str) -> Optional[Any]:
+        entry = self._entries.get(key)
+        if entry is None:
+            self.misses += 1
+            return None
+        expires, size, value = entry
+        if expires <= time.monotonic():
+            self._remove(key)
+            self.expirations += 1
+            self.misses += 1
+            return None
+        self._entries.move_to_end(key)
+        self.hits += 1
+        return value
+
+    def put(self, key: str, value: Tuple[bool, str, float]):
+        if self.max_entries <= 0:
+            return
+        size = len(key) + len(value[1]) + self.ENTRY_OVERHEAD
+        if size > self.max_bytes:
+            return
+        if key in self._entries:
+            self._remove(key)
+        self._entries[key] = (time.monotonic() + self.ttl, size, value)
+        self.bytes += size
+        while len(self._entries) > self.max_entries or self.bytes > self.max_bytes:
+            oldest = next(iter(self._entries))
+            self._remove(oldest)
+            self.evictions += 1
+
+    def _remove(self, key: str):
+        _, size, _ = self._entries.pop(key)
+        self.bytes -= size
+
+    def clear(self):
+        self._entries.clear()
+        self.bytes = 0
+
+    def stats(self) -> Dict[str, Any]:
+        lookups = self.hits + self.misses
+        return {
+            "entries": len(self._entries),
+            "bytes": self.bytes,
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "expirations": self.expirations,
+            "hit_rate": self.hits / lookups if lookups else 0.0
+        }
\ No newline at end of file
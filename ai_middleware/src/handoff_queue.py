@@ -0,0 +1,225 @@
+from collections import deque
+from typing import Callable, Deque, Dict, List, Optional
+import asyncio
+import time
+import uuid
+
+from .metrics import HANDOFF_CREATE_SECONDS, HANDOFF_QUEUE_WAIT_SECONDS
+
+class HandoffQueueFull(Exception):
+    """Raised by HandoffQueue.submit when max_depth tickets are already waiting"""
+
+class HandoffTicket:
+    """One visitor waiting for an Odoo live chat session"""
+
+    # queued -> creating -> connected | no_agents | failed
+    FINAL = ("connected", "no_agents", "failed")
+
+    def __init__(self, visitor_name: str, message: str, ticket_id: Optional[str] = None):
+        self.id = ticket_id or uuid.uuid4().hex
+        self.visitor_name = visitor_name
+        self.message = message
+        self.status = "queued"
+        self.odoo_session_id: Optional[int] = None
+        self.error: Optional[str] = None
+        self.enqueued_at = time.monotonic()
+        self.started_at: Optional[float] = None
+        self.finished_at: Optional[float] = None
+        self.done = asyncio.Event()
+        self.remote = False  # a copy of a ticket owned by another worker
+
+    @classmethod
+    def from_shared(cls, data: dict) -> 'HandoffTicket':
+        """Ticket rebuilt from the state another worker published"""
+        ticket = cls("", data['message'], data['ticket'])
+        ticket.remote = True
+        ticket.update_shared(data)
+        return ticket
+
+    def update_shared(self, data: dict):
+        now = time.monotonic()
+        self.status = data['status']
+        self.odoo_session_id = data['odoo_session_id']
+        self.error = data['error']
+        self.enqueued_at = now - data['elapsed']
+        self.started_at = self.enqueued_at + data['queue_wait'] if self.status != "queued" else None
+        self.finished_at = now if self.finished else None
+
+    def shared(self) -> dict:
+        return {**self.to_dict(), "message": self.message}
+
+    @property
+    def finished(self) -> bool:
+        return self.status in self.FINAL
+
+    def to_dict(self) -> dict:
+        now = time.monotonic()
+        return {
+            "ticket": self.id,
+            "status": self.status,
+            "odoo_session_id": self.odoo_session_id,
+            "error": self.error,
+            "queue_wait": (self.started_at or now) - self.enqueued_at,
+            "elapsed": (self.finished_at or now) - self.enqueued_at
+        }
+
+class HandoffQueue:
+    """Creates Odoo live chat sessions off the request path.
+
+    /chat submits a ticket and answers right away; `workers` background
+    tasks take tickets from a bounded queue and run the Odoo calls. Callers
+    follow a ticket with get() / wait().
+
+    With a state store, ticket state is also published as "handoff:<id>",
+    so any worker can answer for a ticket another worker queued.
+    """
+
+    # How often wait() re-reads a ticket owned by another worker
+    REMOTE_POLL_INTERVAL = 0.25
+
+    def __init__(self, odoo_client, workers: int = 4, max_depth: int = 100,
+                 ticket_ttl: float = 600.0, on_connected: Optional[Callable[[int], object]] = None,
+                 store=None):
+        self.odoo_client = odoo_client
+        self.store = store
+        self.workers = workers
+        self.ticket_ttl = ticket_ttl
+        self.on_connected = on_connected
+        self._queue: asyncio.Queue = asyncio.Queue(maxsize=max_depth)
+        self._tickets: Dict[str, HandoffTicket] = {}
+        self._tasks: List[asyncio.Task] = []
+        # Recent queue waits / session creation times in seconds
+        self._waits: Deque[float] = deque(maxlen=1000)
+        self._durations: Deque[float] = deque(maxlen=1000)
+        self.counts = {"submitted": 0, "rejected": 0, "connected": 0, "no_agents": 0, "failed": 0}
+
+    def start(self):
+        if not self._tasks:
+            self._tasks = [asyncio.create_task(self._worker()) for _ in range(self.workers)]
+
+    async def close(self):
+        for task in self._tasks:
+            task.cancel()
+        self._tasks = []
+
+    def submit(self, visitor_name: str, message: str) -> HandoffTicket:
+        self._expire()
+        ticket = HandoffTicket(visitor_name, message)
+        try:
+            self._queue.put_nowait(ticket)
+        except asyncio.QueueFull:
+            self.counts["rejected"] += 1
+            raise HandoffQueueFull()
+        self._tickets[ticket.id] = ticket
+        self.counts["submitted"] += 1
+        self._publish(ticket)
+        return ticket
+
+    def get(self, ticket_id: str) -> Optional[HandoffTicket]:
+        ticket = self._tickets.get(ticket_id)
+        if ticket is None and self.store is not None:
+            data = self.store.get(f"handoff:{ticket_id}")
+            if data is not None:
+                ticket = HandoffTicket.from_shared(data)
+        return ticket
+
+    def _publish(self, ticket: HandoffTicket):
+        if self.store is not None:
+            self.store.set(f"handoff:{ticket.id}", ticket.shared(), self.ticket_ttl)
+
+    async def wait(self, ticket: HandoffTicket, timeout: float) -> HandoffTicket:
+        """Wait up to timeout seconds for a ticket to finish"""
+        if ticket.remote:
+            deadline = time.monotonic() + timeout
+            while not ticket.finished and time.monotonic() < deadline:
+                await asyncio.sleep(min(self.REMOTE_POLL_INTERVAL, deadline - time.monotonic()))
+                data = self.store.get(f"handoff:{ticket.id}")
+                if data is None:
+                    break
+                ticket.update_shared(data)
+            return ticket
+        if not ticket.finished and timeout > 0:
+            try:
+                await asyncio.wait_for(ticket.done.wait(), timeout)
+            except asyncio.TimeoutError:
+                pass
+        return ticket
+
+    async def _worker(self):
+        while True:
+            ticket = await self._queue.get()
+            try:
+                await self._process(ticket)
+            except asyncio.CancelledError:
+                # Shutting down mid-handoff: the ticket did not finish
+                ticket.status = "failed"
+                ticket.error = "Handoff cancelled"
+                raise
+            except Exception as e:
+                ticket.status = "failed"
+                ticket.error = str(e)
+            finally:
+                ticket.finished_at = time.monotonic()
+                if ticket.started_at is not None:
+                    self._durations.append(ticket.finished_at - ticket.started_at)
+                    HANDOFF_CREATE_SECONDS.labels(ticket.status).observe(ticket.finished_at - ticket.started_at)
+                if ticket.finished:
+                    self.counts[ticket.status] += 1
+                self._publish(ticket)
+                ticket.done.set()
+                self._queue.task_done()
+
+    async def _process(self, ticket: HandoffTicket):
+        ticket.started_at = time.monotonic()
+        ticket.status = "creating"
+        self._waits.append(ticket.started_at - ticket.enqueued_at)
+        HANDOFF_QUEUE_WAIT_SECONDS.observe(ticket.started_at - ticket.enqueued_at)
+        self._publish(ticket)
+
+        if await self.odoo_client.agents_online() is False:
+            ticket.status = "no_agents"
+            return
+
+        session_id = await self.odoo_client.create_live_chat_session(
+            visitor_name=ticket.visitor_name,
+            message=ticket.message
+        )
+        if not session_id:
+            ticket.status = "failed"
+            ticket.error = "Could not create a live chat session"
+            return
+
+        ticket.odoo_session_id = session_id
+        ticket.status = "connected"
+        if self.on_connected:
+            self.on_connected(session_id)
+
+    def _expire(self):
+        """Forget finished tickets older than ticket_ttl"""
+        cutoff = time.monotonic() - self.ticket_ttl
+        for ticket_id, ticket in list(self._tickets.items()):
+            if ticket.finished and ticket.finished_at < cutoff:
+                del self._tickets[ticket_id]
+
+    @staticmethod
+    def _summary(samples: Deque[float]) -> dict:
+        if not samples:
+            return {"count": 0, "avg": 0.0, "p95": 0.0, "max": 0.0}
+        ordered = sorted(samples)
+        return {
+            "count": len(ordered),
+            "avg": sum(ordered) / len(ordered),
+            "p95": ordered[min(len(ordered) - 1, int(len(ordered) * 0.95))],
+            "max": ordered[-1]
+        }
+
+    def stats(self) -> dict:
+        return {
+            "depth": self._queue.qsize(),
+            "max_depth": self._queue.maxsize,
+            "workers": self.workers,
+            "tickets": len(self._tickets),
+            **self.counts,
+            "queue_wait": self._summary(self._waits),
+            "create_time": self._summary(self._durations)
+        }
@@ -0,0 +1,83 @@
+from typing import Dict, Iterable, List, Optional
+import json
+import re
+
+# Phrases per intent; matched as whole words, case-insensitively, with any
+# whitespace between the words of a phrase
+DEFAULT_LEXICONS: Dict[str, List[str]] = {
+    # Explicit requests for a person
+    "handoff": ["support", "agent", "agents", "human", "humans", "help", "talk to someone",
+                "speak to someone", "representative", "real person"],
+    # Messages that are nothing but a greeting or thanks
+    "greeting": ["hi", "hello", "hey", "good morning", "good afternoon", "good evening",
+                 "thanks", "thank you"],
+    # Questions answered from the knowledge base only, never by the LLM
+    "faq": ["business hours", "opening hours", "return policy", "track my order", "reset my password"]
+}
+
+class IntentRouter:
+    """Classifies a visitor message by lexicon before any KB search or LLM call.
+
+    All lexicons are compiled into one regex with a named group per intent,
+    so a message is scanned once however many phrases there are. Matching
+    is on word boundaries: "help" matches "help me" but not "helpful".
+
+    route() returns "handoff", "greeting" (the message is only a greeting),
+    "faq" or None, in that order of precedence.
+    """
+
+    ROUTES = ("handoff", "greeting", "faq")
+
+    def __init__(self, lexicons: Optional[Dict[str, Iterable[str]]] = None):
+        self.lexicons = {route: list(DEFAULT_LEXICONS.get(route, [])) for route in self.ROUTES}
+        for route, phrases in (lexicons or {}).items():
+            if route not in self.ROUTES:
+                raise ValueError(f"Unknown intent route: {route}")
+            self.lexicons[route] = list(phrases)
+        self._pattern = self._compile(self.lexicons)
+        self.counts = {route: 0 for route in self.ROUTES + ("none",)}
+
+    @classmethod
+    def from_file(cls, path: str) -> 'IntentRouter':
+        """Lexicons from a JSON file {"handoff": [...], ...}; routes left out keep their defaults"""
+        with open(path, 'r', encoding='utf-8') as f:
+            return cls(json.load(f))
+
+    @staticmethod
+    def _compile(lexicons: Dict[str, List[str]]) -> Optional["re.Pattern"]:
+        groups = []
+        for route, phrases in lexicons.items():
+            words = [p.split() for p in phrases if p.strip()]
+            if not words:
+                continue
+            # Longest first, so "thank you" wins over a shorter overlapping phrase
+            alternatives = sorted((r'\s+'.join(map(re.escape, w)) for w in words), key=len, reverse=True)
+            groups.append(f"(?P<{route}>{'|'.join(alternatives)})")
+        if not groups:
+            return None
+        return re.compile(r'\b(?:' + '|'.join(groups) + r')\b', re.IGNORECASE)
+
+    def route(self, message: str, count: bool = True) -> Optional[str]:
+        """Intent of message; count=False leaves stats() untouched"""
+        matched = set()
+        greeting_chars = 0
+        if self._pattern is not None:
+            for match in self._pattern.finditer(message):
+                matched.add(match.lastgroup)
+                if match.lastgroup == "greeting":
+                    greeting_chars += sum(c.isalnum() for c in match.group())
+
+        if "handoff" in matched:
+            route = "handoff"
+        elif "greeting" in matched and greeting_chars == sum(c.isalnum() for c in message):
+            route = "greeting"
+        elif "faq" in matched:
+            route = "faq"
+        else:
+            route = None
+        if count:
+            self.counts[route or "none"] += 1
+        return route
+
+    def stats(self) -> Dict[str, int]:
+        return dict(self.counts)
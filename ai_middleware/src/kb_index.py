@@ -0,0 +1,308 @@
+from typing import Dict, List, Optional, Sequence, Set, Tuple
+import json
+import mmap
+import os
+import re
+import struct
+
+import numpy as np
+
+TOKEN_RE = re.compile(r'[a-z0-9]+')
+
+def tokenize(text: str) -> List[str]:
+    """Lowercase word tokens, ignoring very short words"""
+    return [t for t in TOKEN_RE.findall(text.lower()) if len(t) > 2]
+
+SNAPSHOT_MAGIC = b'KBIX'
+SNAPSHOT_FORMAT = 1
+_ALIGN = 64
+
+class PairStore(Sequence):
+    """Read-only list of Q&A pairs backed by a UTF-8 blob and offsets.
+
+    Over a memory-mapped snapshot the text stays in the shared page cache;
+    a pair is only decoded when a search returns it.
+    """
+
+    def __init__(self, blob: np.ndarray, offsets: np.ndarray):
+        self.blob = blob
+        self.offsets = offsets
+
+    def __len__(self) -> int:
+        return len(self.offsets) - 1
+
+    def __getitem__(self, i):
+        if isinstance(i, slice):
+            return [self[j] for j in range(*i.indices(len(self)))]
+        if i < 0:
+            i += len(self)
+        if not 0 <= i < len(self):
+            raise IndexError(i)
+        return self.blob[self.offsets[i]:self.offsets[i + 1]].tobytes().decode('utf-8')
+
+    @classmethod
+    def from_strings(cls, pairs: Sequence[str]) -> 'PairStore':
+        encoded = [p.encode('utf-8') for p in pairs]
+        offsets = np.zeros(len(encoded) + 1, dtype=np.int64)
+        np.cumsum([len(e) for e in encoded], out=offsets[1:])
+        return cls(np.frombuffer(b''.join(encoded), dtype=np.uint8), offsets)
+
+class TermIndex:
+    """Immutable BM25-weighted term x pair matrix.
+
+    The matrix is stored column-compressed by term: the postings of term t
+    are indices[indptr[t]:indptr[t+1]] (pair ids) with the matching raw term
+    frequencies in tf and precomputed BM25 weights in weights. Scoring a
+    query is then a sum of weight slices, and scoring a batch of queries is
+    one sparse x dense product per chunk.
+    """
+
+    K1 = 1.2
+    B = 0.75
+    # Upper bound on the dense score block built by search_batch (cells)
+    BATCH_CELLS = 4_000_000
+
+    def __init__(self, pairs: Sequence[str], vocab: Dict[str, int],
+                 indptr: np.ndarray, indices: np.ndarray, tf: np.ndarray,
+                 doc_len: np.ndarray, sources: Optional[np.ndarray] = None,
+                 idf: Optional[np.ndarray] = None, weights: Optional[np.ndarray] = None):
+        self.pairs = pairs
+        self.vocab = vocab
+        # Source id (file) of every pair, so a file's pairs can be replaced
+        self.sources = sources if sources is not None else np.zeros(len(pairs), dtype=np.int32)
+        self.indptr = indptr
+        self.indices = indices
+        self.tf = tf
+        self.doc_len = doc_len
+        self.n_docs = len(pairs)
+
+        n = self.n_docs
+        # IDF a token would get if it appeared nowhere; unknown query words
+        # still count against the normalization, like unmatched words did
+        # in the old substring scorer.
+        self.unseen_idf = float(np.log1p((n + 0.5) / 0.5))
+        if idf is not None and weights is not None:
+            # Loaded from a snapshot; keep the mapped arrays as they are
+            self.idf = idf
+            self.weights = weights
+            return
+
+        df = np.diff(indptr).astype(np.float64)
+        self.idf = np.log1p((n - df + 0.5) / (df + 0.5))
+        avgdl = float(doc_len.mean()) if n and doc_len.mean() > 0 else 1.0
+        term_of = np.repeat(np.arange(len(df)), np.diff(indptr))
+        tf64 = tf.astype(np.float64)
+        norm = self.K1 * (1 - self.B + self.B * doc_len[indices] / avgdl)
+        self.weights = self.idf[term_of] * tf64 * (self.K1 + 1) / (tf64 + norm)
+
+    @classmethod
+    def build(cls, pairs: List[str], sources: Optional[List[int]] = None) -> 'TermIndex':
+        """Tokenize pairs and assemble the term matrix"""
+        return cls.empty().replace_sources(set(), pairs, sources or [0] * len(pairs))
+
+    @classmethod
+    def empty(cls) -> 'TermIndex':
+        """Index with no pairs"""
+        return cls([], {}, np.zeros(1, dtype=np.int64), np.zeros(0, dtype=np.int32),
+                   np.zeros(0, dtype=np.float32), np.zeros(0, dtype=np.float64))
+
+    def replace_sources(self, removed: Set[int], new_pairs: List[str],
+                        new_sources: List[int]) -> 'TermIndex':
+        """Return a new index without the pairs of `removed` sources plus `new_pairs`.
+
+        Only the new pairs are tokenized; surviving postings are carried over
+        from this index's arrays. IDF and length normalization depend on the
+        whole corpus, so the weights are recomputed (vectorized) for all
+        pairs. This index is left untouched for readers still using it.
+        """
+        keep = ~np.isin(self.sources, np.fromiter(removed, dtype=np.int32, count=len(removed)))
+        remap = np.cumsum(keep) - 1
+        kept_ids = np.flatnonzero(keep)
+        n_kept = len(kept_ids)
+
+        term_of = np.repeat(np.arange(len(self.vocab), dtype=np.int64), np.diff(self.indptr))
+        alive = keep[self.indices]
+        old_terms = term_of[alive]
+        old_docs = remap[self.indices[alive]].astype(np.int32)
+        old_tf = self.tf[alive]
+
+        vocab = dict(self.vocab)
+        term_ids: List[int] = []
+        doc_ids: List[int] = []
+        freqs: List[int] = []
+        new_len = np.zeros(len(new_pairs), dtype=np.float64)
+        for offset, qa in enumerate(new_pairs):
+            tokens = tokenize(qa)
+            new_len[offset] = len(tokens)
+            counts: Dict[str, int] = {}
+            for token in tokens:
+                counts[token] = counts.get(token, 0) + 1
+            for token, count in counts.items():
+                term_ids.append(vocab.setdefault(token, len(vocab)))
+                doc_ids.append(n_kept + offset)
+                freqs.append(count)
+
+        pairs = [self.pairs[int(i)] for i in kept_ids] + list(new_pairs)
+        sources = np.concatenate([self.sources[keep], np.array(new_sources, dtype=np.int32)])
+        return self.from_triples(
+            pairs, vocab,
+            np.concatenate([old_terms, np.array(term_ids, dtype=np.int64)]),
+            np.concatenate([old_docs, np.array(doc_ids, dtype=np.int32)]),
+            np.concatenate([old_tf, np.array(freqs, dtype=np.float32)]),
+            np.concatenate([self.doc_len[keep], new_len]),
+            sources)
+
+    @classmethod
+    def from_triples(cls, pairs: Sequence[str], vocab: Dict[str, int],
+                     term_ids: np.ndarray, doc_ids: np.ndarray,
+                     freqs: np.ndarray, doc_len: np.ndarray,
+                     sources: Optional[np.ndarray] = None) -> 'TermIndex':
+        """Assemble the CSC arrays from (term, pair, tf) triples"""
+        order = np.argsort(term_ids, kind='stable')
+        counts = np.bincount(term_ids, minlength=len(vocab))
+        indptr = np.zeros(len(vocab) + 1, dtype=np.int64)
+        np.cumsum(counts, out=indptr[1:])
+        return cls(pairs, vocab, indptr, doc_ids[order], freqs[order], doc_len, sources)
+
+    def save(self, path: str, meta: dict):
+        """Write a binary snapshot that load() can memory-map.
+
+        Layout: magic, format, header length, JSON header (array dtypes,
+        shapes and offsets plus the caller's meta), then the raw arrays at
+        64-byte aligned offsets. Written to a temp file and renamed so
+        readers never see a partial snapshot.
+        """
+        pairs = self.pairs if isinstance(self.pairs, PairStore) else PairStore.from_strings(self.pairs)
+        terms = sorted(self.vocab, key=self.vocab.get)
+        arrays = {
+            'indptr': self.indptr, 'indices': self.indices, 'tf': self.tf,
+            'doc_len': self.doc_len, 'sources': self.sources,
+            'idf': self.idf, 'weights': self.weights,
+            'pair_offsets': pairs.offsets, 'pair_blob': pairs.blob,
+            'terms': np.frombuffer('\n'.join(terms).encode('utf-8'), dtype=np.uint8),
+        }
+        layout = {}
+        offset = 0
+        for name, arr in arrays.items():
+            arr = np.ascontiguousarray(arr)
+            arrays[name] = arr
+            layout[name] = {'dtype': arr.dtype.str, 'shape': list(arr.shape), 'offset': offset}
+            offset += -(-arr.nbytes // _ALIGN) * _ALIGN
+        header = json.dumps({'arrays': layout, 'meta': meta}).encode('utf-8')
+        prefix = struct.pack('<4sIQ', SNAPSHOT_MAGIC, SNAPSHOT_FORMAT, len(header)) + header
+        data_start = -(-len(prefix) // _ALIGN) * _ALIGN
+
+        tmp = f"{path}.{os.getpid()}.tmp"
+        with open(tmp, 'wb') as f:
+            f.write(prefix.ljust(data_start, b'\0'))
+            for name, arr in arrays.items():
+                f.seek(data_start + layout[name]['offset'])
+                f.write(arr.tobytes())
+            f.truncate(data_start + offset)
+        os.replace(tmp, path)
+
+    @classmethod
+    def load(cls, path: str) -> Tuple['TermIndex', dict]:
+        """Memory-map a snapshot written by save(); returns (index, meta).
+
+        The arrays are views over a shared read-only mapping, so every
+        worker process that loads the same file shares one page-cache copy.
+        """
+        with open(path, 'rb') as f:
+            buf = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, fmt, header_len = struct.unpack_from('<4sIQ', buf, 0)
+        if magic != SNAPSHOT_MAGIC or fmt != SNAPSHOT_FORMAT:
+            raise ValueError(f"Not a knowledge base snapshot: {path}")
+        header_start = struct.calcsize('<4sIQ')
+        header = json.loads(bytes(buf[header_start:header_start + header_len]))
+        data_start = -(-(header_start + header_len) // _ALIGN) * _ALIGN
+
+        arrays = {}
+        for name, spec in header['arrays'].items():
+            dtype = np.dtype(spec['dtype'])
+            count = int(np.prod(spec['shape']))
+            arrays[name] = np.frombuffer(buf, dtype=dtype, count=count,
+                                         offset=data_start + spec['offset'])
+
+        terms = arrays['terms'].tobytes().decode('utf-8')
+        vocab = {t: i for i, t in enumerate(terms.split('\n'))} if terms else {}
+        index = cls(PairStore(arrays['pair_blob'], arrays['pair_offsets']), vocab,
+                    arrays['indptr'], arrays['indices'], arrays['tf'], arrays['doc_len'],
+                    arrays['sources'], idf=arrays['idf'], weights=arrays['weights'])
+        return index, header['meta']
+
+    def _query_terms(self, query: str) -> Tuple[np.ndarray, float]:
+        """Known term ids of a query and its normalization (summed IDF)"""
+        words = dict.fromkeys(tokenize(query))
+        ids = [self.vocab[w] for w in words if w in self.vocab]
+        ids = np.array(ids, dtype=np.int64)
+        max_score = float(self.idf[ids].sum()) + self.unseen_idf * (len(words) - len(ids))
+        return ids, max_score
+
+    def _gather(self, term_ids: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+        """Positions into indices/weights covering the postings of term_ids"""
+        starts = self.indptr[term_ids]
+        lengths = self.indptr[term_ids + 1] - starts
+        total = int(lengths.sum())
+        offsets = np.arange(total) - np.repeat(np.cumsum(lengths) - lengths, lengths)
+        return np.repeat(starts, lengths) + offsets, lengths
+
+    @staticmethod
+    def _top(scores: np.ndarray, doc_ids: np.ndarray, top_k: int) -> np.ndarray:
+        """Indices of the top_k positive scores, best first (ties by pair id)"""
+        keep = np.flatnonzero(scores > 0)
+        if len(keep) > top_k:
+            keep = keep[np.argpartition(-scores[keep], top_k - 1)[:top_k]]
+        return keep[np.lexsort((doc_ids[keep], -scores[keep]))]
+
+    def search(self, query: str, top_k: int = 3, stats: Optional[dict] = None) -> List[Tuple[str, float]]:
+        """Score one query by touching only its posting lists.
+
+        If a stats dict is given, stats['candidates'] is set to the number of
+        pairs that were scored.
+        """
+        if stats is not None:
+            stats['candidates'] = 0
+        if not self.n_docs or top_k <= 0:
+            return []
+        ids, max_score = self._query_terms(query)
+        if not len(ids) or max_score <= 0:
+            return []
+
+        positions, _ = self._gather(ids)
+        candidates, inverse = np.unique(self.indices[positions], return_inverse=True)
+        if stats is not None:
+            stats['candidates'] = len(candidates)
+        scores = np.bincount(inverse, weights=self.weights[positions], minlength=len(candidates))
+        best = self._top(scores, candidates, top_k)
+        return [(self.pairs[int(candidates[i])], min(float(scores[i]) / max_score, 1.0))
+                for i in best]
+
+    def search_batch(self, queries: Sequence[str], top_k: int = 3) -> List[List[Tuple[str, float]]]:
+        """Score many queries with one sparse x dense product per chunk"""
+        if not self.n_docs or top_k <= 0:
+            return [[] for _ in queries]
+
+        results: List[List[Tuple[str, float]]] = []
+        chunk = max(1, self.BATCH_CELLS // self.n_docs)
+        all_docs = np.arange(self.n_docs)
+        for start in range(0, len(queries), chunk):
+            block = queries[start:start + chunk]
+            parsed = [self._query_terms(q) for q in block]
+            term_ids = np.concatenate([ids for ids, _ in parsed])
+            rows = np.repeat(np.arange(len(block)), [len(ids) for ids, _ in parsed])
+
+            # Dense (queries x pairs) score block: Q . W^T in one bincount
+            positions, lengths = self._gather(term_ids)
+            cells = np.repeat(rows, lengths) * self.n_docs + self.indices[positions]
+            scores = np.bincount(cells, weights=self.weights[positions],
+                                 minlength=len(block) * self.n_docs).reshape(len(block), self.n_docs)
+
+            for row, (ids, max_score) in enumerate(parsed):
+                if not len(ids) or max_score <= 0:
+                    results.append([])
+                    continue
+                best = self._top(scores[row], all_docs, top_k)
+                results.append([(self.pairs[int(i)], min(float(scores[row, i]) / max_score, 1.0))
+                                for i in best])
+        return results
\ No newline at end of file
@@ -1,54 +1,193 @@
-from typing import List, Tuple
+from typing import Dict, List, Optional, Tuple
+import hashlib
+import logging
 import os
+import threading
+import time
+
+from .kb_index import TermIndex
+from .metrics import KB_SEARCH_SECONDS, KB_SEARCH_CANDIDATES
+from .tracing import span
+
+logger = logging.getLogger(__name__)
+
+def split_qa_pairs(document: str) -> List[str]:
+    """Split a 'Q: ... / A: ...' document into individual Q&A pairs"""
+    lines = [line.strip() for line in document.strip().split('\n')]
+    lines = [line for line in lines if line]
+    pairs = []
+    for i in range(len(lines) - 1):
+        if lines[i].startswith('Q:'):
+            pairs.append(f"{lines[i]}\n{lines[i+1]}")
+    return pairs
 
 class KnowledgeBase:
-    def __init__(self):
-        self.documents = []
-        
+    def __init__(self, snapshot_path: Optional[str] = None):
+        self.index = TermIndex.empty()
+        self.version = 0
+        self.directory: Optional[str] = None
+        # Binary index snapshot shared by all workers (see TermIndex.save)
+        self.snapshot_path = snapshot_path
+        # Source key (file path, or a synthetic key for add_documents) ->
+        # {'id', 'mtime_ns', 'size', 'digest'}
+        self._sources: Dict[str, dict] = {}
+        self._next_source_id = 0
+        self._lock = threading.Lock()
+
+    @property
+    def qa_pairs(self) -> List[str]:
+        return list(self.index.pairs)
+
     def add_documents(self, documents: List[str]):
-        """Add documents to knowledge base"""
-        self.documents.extend(documents)
-    
+        """Add documents to knowledge base and index their Q&A pairs"""
+        with self._lock:
+            changes = {}
+            for doc in documents:
+                key = f"<document:{self._next_source_id + len(changes)}>"
+                changes[key] = {'content': doc, 'mtime_ns': None, 'size': None, 'digest': None}
+            self._apply(changes, [])
+
     def search(self, query: str, top_k: int = 3) -> List[Tuple[str, float]]:
-        """Simple keyword search for relevant documents"""
-        if not self.documents:
-            return []
-            
-        query_lower = query.lower()
-        results = []
-        
-        # Split documents into individual Q&A pairs
-        qa_pairs = []
-        for doc in self.documents:
-            lines = doc.strip().split('\n')
-            for i in range(0, len(lines)-1, 2):
-                if i+1 < len(lines) and lines[i].startswith('Q:'):
-                    qa_pair = f"{lines[i]}\n{lines[i+1]}"
-                    qa_pairs.append(qa_pair)
-        
-        # Search in Q&A pairs
-        for qa in qa_pairs:
-            qa_lower = qa.lower()
-            # Look for keyword matches in questions
-            query_words = [w for w in query_lower.split() if len(w) > 2]
-            if query_words:
-                score = sum(1 for word in query_words if word in qa_lower)
-                if score > 0:
-                    results.append((qa, score / len(query_words)))
-        
-        # Sort by score and return top_k
-        results.sort(key=lambda x: x[1], reverse=True)
-        return results[:top_k]
-    
+        """BM25 search over indexed Q&A pairs.
+
+        Scores are normalized to 0-1 by the sum of the query terms' IDF, so a
+        pair containing every query word about once scores close to 1.0 and
+        the agent's confidence thresholds keep their meaning.
+        """
+        stats = {}
+        started = time.perf_counter()
+        with span("kb"):
+            results = self.index.search(query, top_k, stats)
+        KB_SEARCH_SECONDS.observe(time.perf_counter() - started)
+        KB_SEARCH_CANDIDATES.observe(stats['candidates'])
+        return results
+
+    def search_batch(self, queries: List[str], top_k: int = 3) -> List[List[Tuple[str, float]]]:
+        """Score many queries at once; results match search() per query"""
+        return self.index.search_batch(queries, top_k)
+
     def load_from_directory(self, directory: str):
-        """Load text files from directory"""
-        documents = []
-        for filename in os.listdir(directory):
+        """Load text files from directory.
+
+        With a snapshot, startup maps the saved index and then re-parses only
+        the files that changed since it was written (usually none).
+        """
+        self.directory = directory
+        if self.snapshot_path:
+            self._load_snapshot()
+        self.refresh()
+
+    def _scan(self) -> Dict[str, os.stat_result]:
+        """Current .txt files of the directory and their stat results"""
+        files = {}
+        for filename in sorted(os.listdir(self.directory)):
             if filename.endswith('.txt'):
-                with open(os.path.join(directory, filename), 'r', encoding='utf-8') as f:
-                    content = f.read().strip()
-                    if content:
-                        documents.append(content)
-        
-        if documents:
-            self.add_documents(documents)
\ No newline at end of file
+                path = os.path.join(self.directory, filename)
+                try:
+                    files[path] = os.stat(path)
+                except FileNotFoundError:
+                    continue
+        return files
+
+    def _load_snapshot(self) -> bool:
+        """mmap the saved index and the file states it was built from"""
+        try:
+            index, meta = TermIndex.load(self.snapshot_path)
+        except FileNotFoundError:
+            return False
+        except Exception as e:
+            logger.warning("Ignoring unreadable knowledge base snapshot: %s", e)
+            return False
+
+        with self._lock:
+            self._sources = meta.get('sources', {})
+            self._next_source_id = meta.get('next_source_id', 0)
+            self.index = index
+            self.version += 1
+        logger.info("Knowledge base v%d: mapped snapshot with %d Q&A pairs", self.version, index.n_docs)
+        return True
+
+    def _save_snapshot(self):
+        """Persist the current index; only directory-backed sources are kept"""
+        if not self.snapshot_path or any(src['digest'] is None for src in self._sources.values()):
+            return
+        try:
+            self.index.save(self.snapshot_path, {
+                'sources': self._sources,
+                'next_source_id': self._next_source_id
+            })
+        except OSError as e:
+            logger.warning("Could not write knowledge base snapshot: %s", e)
+
+    def refresh(self) -> bool:
+        """Re-parse changed .txt files in the loaded directory.
+
+        Files are compared by mtime and size first and by content hash only
+        when those differ. Returns True if a new index version was swapped in.
+        """
+        if not self.directory:
+            return False
+
+        with self._lock:
+            changes = {}
+            touched = False
+            files = self._scan()
+            for path, stat in files.items():
+                known = self._sources.get(path)
+                if known and known['mtime_ns'] == stat.st_mtime_ns and known['size'] == stat.st_size:
+                    continue
+
+                with open(path, 'rb') as f:
+                    raw = f.read()
+                digest = hashlib.sha1(raw).hexdigest()
+                if known and known['digest'] == digest:
+                    known['mtime_ns'] = stat.st_mtime_ns
+                    known['size'] = stat.st_size
+                    touched = True
+                    continue
+                changes[path] = {
+                    'content': raw.decode('utf-8').strip(),
+                    'mtime_ns': stat.st_mtime_ns,
+                    'size': stat.st_size,
+                    'digest': digest
+                }
+
+            removed = [key for key, src in self._sources.items()
+                       if src['digest'] is not None and key not in files]
+            if not changes and not removed:
+                if touched:
+                    self._save_snapshot()
+                return False
+            self._apply(changes, removed)
+            self._save_snapshot()
+            logger.info("Knowledge base v%d: %d file(s) updated, %d removed, %d Q&A pairs",
+                        self.version, len(changes), len(removed), self.index.n_docs)
+            return True
+
+    def _apply(self, changes: Dict[str, dict], removed: List[str]):
+        """Build the next index off to the side, then swap it in.
+
+        Searches read self.index once, so they see either the old or the new
+        index, never a partial one. Caller holds self._lock.
+        """
+        sources = dict(self._sources)
+        dropped = set()
+        for key in list(changes) + removed:
+            if key in sources:
+                dropped.add(sources.pop(key)['id'])
+
+        new_pairs: List[str] = []
+        new_ids: List[int] = []
+        for key, src in changes.items():
+            content = src.pop('content')
+            src['id'] = self._next_source_id
+            self._next_source_id += 1
+            sources[key] = src
+            pairs = split_qa_pairs(content) if content else []
+            new_pairs.extend(pairs)
+            new_ids.extend([src['id']] * len(pairs))
+
+        index = self.index.replace_sources(dropped, new_pairs, new_ids)
+        self._sources = sources
+        self.index = index
+        self.version += 1
@@ -1,15 +1,37 @@
-from fastapi import FastAPI, HTTPException
+from fastapi import FastAPI, HTTPException, Request
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import JSONResponse, PlainTextResponse, StreamingResponse
 from pydantic import BaseModel
 from typing import Optional
 import os
+import json
+import math
+import asyncio
+import logging
 from dotenv import load_dotenv
 
 from .odoo_client import OdooClient
 from .ai_agent import AIAgent
+from .intent_router import IntentRouter
+from .session_events import SessionEventHub
+from .session_watcher import SessionWatcher
+from .handoff_queue import HandoffQueue, HandoffQueueFull
+from .outbound_spool import OutboundSpool
+from .admission import AdmissionControl, ConcurrencyGate, Overloaded, RateLimiter
+from .metrics import REGISTRY, ERRORS
+from .state_store import open_store
+from .tracing import ServerTimingMiddleware, configure_logging
 
 load_dotenv()
 
+configure_logging(
+    level=os.getenv('LOG_LEVEL', 'INFO'),
+    json_output=os.getenv('LOG_FORMAT', 'text').lower() == 'json',
+    # Fraction of DEBUG/INFO records kept; warnings and errors always are
+    sample_rate=float(os.getenv('LOG_SAMPLE_RATE', 1))
+)
+logger = logging.getLogger(__name__)
+
 app = FastAPI(title="AI Middleware for Odoo Live Chat")
 
 # Add CORS middleware
@@ -19,29 +41,214 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["Server-Timing", "X-Request-ID"],
 )
 
+# Per-request Odoo / KB / LLM timings in a Server-Timing header
+app.add_middleware(ServerTimingMiddleware)
+
 # Initialize components
+
+# State shared by all workers (Odoo login, session leases and snapshots,
+# handoff tickets, LLM answers): "memory" for one worker, or
+# "sqlite:<path>" for several uvicorn workers on one host
+state_store = open_store(os.getenv('STATE_STORE', 'memory'))
+
+ODOO_POOL_SIZE = int(os.getenv('ODOO_POOL_SIZE', 20))
+
+# Caps Odoo RPCs in flight; callers beyond ODOO_MAX_WAITING queued ones (or
+# waiting longer than ODOO_QUEUE_TIMEOUT) fail fast instead of piling up
+odoo_gate = ConcurrencyGate(
+    "Odoo",
+    int(os.getenv('ODOO_MAX_CONCURRENCY', ODOO_POOL_SIZE)),
+    max_waiting=int(os.getenv('ODOO_MAX_WAITING', 100)),
+    timeout=float(os.getenv('ODOO_QUEUE_TIMEOUT', 5))
+)
+
 odoo_client = OdooClient(
     url=os.getenv('ODOO_URL'),
     db=os.getenv('ODOO_DB'),
     username=os.getenv('ODOO_USERNAME'),
-    password=os.getenv('ODOO_PASSWORD')
+    password=os.getenv('ODOO_PASSWORD'),
+    pool_size=ODOO_POOL_SIZE,
+    timeout=float(os.getenv('ODOO_TIMEOUT', 15)),
+    connect_timeout=float(os.getenv('ODOO_CONNECT_TIMEOUT', 5)),
+    pool_timeout=float(os.getenv('ODOO_POOL_TIMEOUT', 10)),
+    status_ttl=float(os.getenv('ODOO_STATUS_TTL', 0.3)),
+    liveness_max_age=float(os.getenv('ODOO_LIVENESS_MAX_AGE', 5)),
+    session_lifetime=float(os.getenv('ODOO_SESSION_LIFETIME', 0)),
+    livechat_channel_ids=[int(i) for i in os.getenv('LIVECHAT_CHANNEL_IDS', '1,2').split(',') if i.strip()],
+    channel_refresh_interval=float(os.getenv('LIVECHAT_CHANNEL_REFRESH', 30)),
+    gate=odoo_gate,
+    store=state_store
 )
 
+session_events = SessionEventHub()
+
+# One background task polls all active sessions in batched RPCs
+session_watcher = SessionWatcher(
+    odoo_client,
+    session_events,
+    interval=float(os.getenv('SESSION_POLL_INTERVAL', 2)),
+    idle_timeout=float(os.getenv('SESSION_IDLE_TIMEOUT', 120)),
+    store=state_store,
+    ended_ttl=float(os.getenv('SESSION_ENDED_TTL', 30)),
+    max_sessions=int(os.getenv('SESSION_MAX_TRACKED', 10000)),
+    close_abandoned=os.getenv('SESSION_CLOSE_ABANDONED', '').lower() in ('1', 'true', 'yes')
+)
+
+# Odoo sessions for handoffs are created by background workers
+handoff_queue = HandoffQueue(
+    odoo_client,
+    workers=int(os.getenv('HANDOFF_WORKERS', 4)),
+    max_depth=int(os.getenv('HANDOFF_QUEUE_SIZE', 100)),
+    on_connected=session_watcher.track,
+    store=state_store
+)
+
+# Visitor messages and feedback are spooled to local SQLite and delivered to
+# Odoo in the background; set OUTBOUND_SPOOL_PATH to an empty string to post
+# them inline instead
+spool_path = os.getenv('OUTBOUND_SPOOL_PATH', os.path.join(os.path.dirname(__file__), '..', 'outbound.db'))
+outbound_spool = OutboundSpool(
+    odoo_client,
+    spool_path,
+    max_attempts=int(os.getenv('OUTBOUND_MAX_ATTEMPTS', 8)),
+    max_delay=float(os.getenv('OUTBOUND_MAX_DELAY', 60))
+) if spool_path else None
+
+knowledge_dir = os.path.join(os.path.dirname(__file__), '..', 'knowledge')
+
+# Optional JSON file replacing the built-in handoff/greeting/faq lexicons
+intent_lexicons_file = os.getenv('INTENT_LEXICONS_FILE')
+
 ai_agent = AIAgent(
     api_key=os.getenv('OPENAI_API_KEY'),
-    confidence_threshold=float(os.getenv('CONFIDENCE_THRESHOLD', 0.7))
+    confidence_threshold=float(os.getenv('CONFIDENCE_THRESHOLD', 0.7)),
+    # Set KB_SNAPSHOT_PATH to an empty string to disable the shared snapshot
+    kb_snapshot_path=os.getenv('KB_SNAPSHOT_PATH', os.path.join(knowledge_dir, '.index.kbx')) or None,
+    llm_model=os.getenv('LLM_MODEL', 'gpt-3.5-turbo'),
+    llm_max_tokens=int(os.getenv('LLM_MAX_TOKENS', 200)),
+    llm_temperature=float(os.getenv('LLM_TEMPERATURE', 0.3)),
+    llm_timeout=float(os.getenv('LLM_TIMEOUT', 20)),
+    llm_max_retries=int(os.getenv('LLM_MAX_RETRIES', 1)),
+    llm_max_concurrency=int(os.getenv('LLM_MAX_CONCURRENCY', 10)),
+    llm_base_url=os.getenv('LLM_BASE_URL') or None,
+    llm_max_waiting=int(os.getenv('LLM_MAX_WAITING', 50)),
+    llm_queue_timeout=float(os.getenv('LLM_QUEUE_TIMEOUT', 5)),
+    cache_size=int(os.getenv('ANSWER_CACHE_SIZE', 1000)),
+    cache_ttl=float(os.getenv('ANSWER_CACHE_TTL', 3600)),
+    cache_max_bytes=int(os.getenv('ANSWER_CACHE_MAX_BYTES', 8 * 1024 * 1024)),
+    intent_router=IntentRouter.from_file(intent_lexicons_file) if intent_lexicons_file else None,
+    greeting_reply=os.getenv('GREETING_REPLY', "Hello! How can I help you today?"),
+    # A process-local store would only duplicate the answer cache
+    store=state_store if state_store.shared else None
 )
 
 # Load knowledge base on startup
-knowledge_dir = os.path.join(os.path.dirname(__file__), '..', 'knowledge')
 if os.path.exists(knowledge_dir):
     ai_agent.load_knowledge_base(knowledge_dir)
 
+# Token buckets (requests per second, burst) per client IP, visitor and
+# session; a rate of 0 disables that limit
+admission = AdmissionControl(
+    ip=RateLimiter("ip", float(os.getenv('RATE_LIMIT_IP_RATE', 10)), float(os.getenv('RATE_LIMIT_IP_BURST', 40))),
+    visitor=RateLimiter("visitor", float(os.getenv('RATE_LIMIT_VISITOR_RATE', 1)), float(os.getenv('RATE_LIMIT_VISITOR_BURST', 5))),
+    session=RateLimiter("session", float(os.getenv('RATE_LIMIT_SESSION_RATE', 2)), float(os.getenv('RATE_LIMIT_SESSION_BURST', 10))),
+    trust_forwarded=os.getenv('RATE_LIMIT_TRUST_FORWARDED', '').lower() in ('1', 'true', 'yes')
+)
+
+# Scrape-time views of component state for /metrics
+gates = {"odoo": odoo_gate, "llm": ai_agent.llm_gate}
+REGISTRY.gauge("ai_middleware_active_sessions", "Live chat sessions being watched that have not ended",
+               function=lambda: sum(1 for state in session_watcher.sessions if state.active))
+REGISTRY.gauge("ai_middleware_tracked_sessions", "Live chat sessions held in the session registry",
+               function=lambda: len(session_watcher.sessions))
+REGISTRY.gauge("ai_middleware_event_subscribers", "Open session event streams",
+               function=session_events.subscriber_count)
+REGISTRY.gauge("ai_middleware_handoff_queue_depth", "Handoff tickets waiting for a worker",
+               function=lambda: handoff_queue.stats()["depth"])
+REGISTRY.gauge("ai_middleware_outbound_pending", "Spooled messages and feedback not yet delivered",
+               function=lambda: outbound_spool.pending() if outbound_spool else 0)
+REGISTRY.gauge("ai_middleware_backend_in_flight", "Calls in flight per backend", ["backend"],
+               function=lambda: {name: gate.in_flight for name, gate in gates.items()})
+REGISTRY.gauge("ai_middleware_backend_waiting", "Calls queued for a backend slot", ["backend"],
+               function=lambda: {name: gate.waiting for name, gate in gates.items()})
+REGISTRY.counter("ai_middleware_rejected", "Requests refused by rate limits or backend gates", ["reason"],
+                 function=lambda: {
+                     **{f"rate_limit_{name}": limiter["limited"] for name, limiter in admission.stats().items()},
+                     **{f"{name}_overloaded": gate.rejected + gate.timed_out for name, gate in gates.items()}
+                 })
+REGISTRY.counter("ai_middleware_answer_cache_hits", "Answer cache hits",
+                 function=lambda: ai_agent.answer_cache.hits)
+REGISTRY.counter("ai_middleware_intent_routes", "Visitor messages per intent router match", ["route"],
+                 function=ai_agent.intent_router.stats)
+
+@app.exception_handler(Overloaded)
+async def overloaded_handler(request: Request, exc: Overloaded):
+    """429 for rate limits, 503 for saturated backends, both with Retry-After"""
+    return JSONResponse(
+        status_code=exc.status_code,
+        content={"detail": exc.detail},
+        headers={"Retry-After": str(max(1, math.ceil(exc.retry_after)))}
+    )
+
+KB_RELOAD_INTERVAL = float(os.getenv('KB_RELOAD_INTERVAL', 5))
+background_tasks = []
+
+async def watch_knowledge_base():
+    """Poll the knowledge directory and hot-swap the index on changes"""
+    while True:
+        await asyncio.sleep(KB_RELOAD_INTERVAL)
+        try:
+            # Parsing and index building are CPU/file work; keep them off the loop
+            await asyncio.to_thread(ai_agent.refresh_knowledge_base)
+        except Exception as e:
+            ERRORS.labels("kb_reload").inc()
+            logger.warning("Knowledge base reload error: %s", e)
+
+async def warm_answer_cache(path: str):
+    """Pre-answer the frequent questions listed one per line in path"""
+    try:
+        with open(path, 'r', encoding='utf-8') as f:
+            questions = [line.strip() for line in f if line.strip()]
+        cached = await ai_agent.warm_cache(questions)
+        logger.info("Answer cache warmed with %d of %d questions", cached, len(questions))
+    except Exception as e:
+        logger.warning("Answer cache warm-up error: %s", e)
+
+@app.on_event("startup")
+async def startup():
+    """Start background tasks"""
+    session_watcher.start()
+    handoff_queue.start()
+    if outbound_spool:
+        outbound_spool.start()
+    # Load live chat channels before the first handoff needs them
+    background_tasks.append(asyncio.create_task(odoo_client.refresh_channels()))
+    if KB_RELOAD_INTERVAL > 0 and os.path.exists(knowledge_dir):
+        background_tasks.append(asyncio.create_task(watch_knowledge_base()))
+    warm_file = os.getenv('ANSWER_CACHE_WARM_FILE')
+    if warm_file:
+        background_tasks.append(asyncio.create_task(warm_answer_cache(warm_file)))
+
+@app.on_event("shutdown")
+async def shutdown():
+    """Stop background tasks and release pooled connections"""
+    for task in background_tasks:
+        task.cancel()
+    await handoff_queue.close()
+    if outbound_spool:
+        await outbound_spool.close()
+    await session_watcher.close()
+    await odoo_client.close()
+    await ai_agent.close()
+    state_store.close()
+
 class ChatMessage(BaseModel):
     message: str
     visitor_name: Optional[str] = "Anonymous"
+    visitor_id: Optional[str] = None
     session_id: Optional[str] = None
     context: Optional[str] = ""
 
@@ -50,95 +257,255 @@ class ChatResponse(BaseModel):
     handoff_needed: bool
     confidence: float
     odoo_session_id: Optional[int] = None
+    handoff_ticket: Optional[str] = None
+    message_id: Optional[str] = None
 
-@app.post("/chat", response_model=ChatResponse)
-async def handle_chat(chat_message: ChatMessage):
-    """Main endpoint for handling chat messages"""
-    try:
-        # If session_id exists, send message directly to Odoo
-        if chat_message.session_id:
-            success = odoo_client.send_message_to_session(
-                int(chat_message.session_id), 
-                chat_message.message, 
-                chat_message.visitor_name
-            )
-            
-            if success:
+# Seconds a client is told to wait when a message could not reach Odoo
+ODOO_UNAVAILABLE_RETRY_AFTER = 5
+
+async def forward_to_session(chat_message: ChatMessage) -> ChatResponse:
+    """Relay a visitor message into its existing Odoo session"""
+    session_id = int(chat_message.session_id)
+    # Watched sessions keep a fresh status, so sends skip the liveness read
+    session_watcher.track(session_id)
+    
+    success = None
+    if outbound_spool:
+        if odoo_client.cached_liveness(session_id) is False:
+            success = False
+        else:
+            # Accepted locally; the spool delivers it (see /outbound/{id}).
+            # If the spool file is locked by another worker, send directly.
+            message_id = outbound_spool.enqueue_message(session_id, chat_message.message, chat_message.visitor_name)
+            if message_id:
                 return ChatResponse(
                     response="",
                     handoff_needed=False,
                     confidence=1.0,
-                    odoo_session_id=int(chat_message.session_id)
-                )
-            else:
-                return ChatResponse(
-                    response="SESSION_ENDED",
-                    handoff_needed=False,
-                    confidence=0.0
+                    odoo_session_id=session_id,
+                    message_id=message_id
                 )
+    if success is None:
+        success = await odoo_client.send_message_to_session(
+            session_id, 
+            chat_message.message, 
+            chat_message.visitor_name
+        )
+        if success is None:
+            raise HTTPException(status_code=503, detail="Odoo is unavailable, message not delivered",
+                                headers={"Retry-After": str(ODOO_UNAVAILABLE_RETRY_AFTER)})
+    
+    if success:
+        return ChatResponse(
+            response="",
+            handoff_needed=False,
+            confidence=1.0,
+            odoo_session_id=session_id
+        )
+    else:
+        return ChatResponse(
+            response="SESSION_ENDED",
+            handoff_needed=False,
+            confidence=0.0
+        )
+
+async def start_handoff(chat_message: ChatMessage):
+    """Queue creation of an Odoo live chat session; returns (response text, ticket id)"""
+    if await odoo_client.agents_online() is False:
+        return "All of our agents are offline right now. Please try again later.", None
+    
+    try:
+        ticket = handoff_queue.submit(chat_message.visitor_name, chat_message.message)
+    except HandoffQueueFull:
+        return "All of our agents are busy right now. Please try again in a moment.", None
+    return "I'm connecting you with a human agent. Please wait...", ticket.id
+
+def handoff_message(ticket) -> str:
+    """Visitor-facing text for a finished handoff ticket"""
+    if ticket.status == "connected":
+        return f"I've connected you with a human agent (Session #{ticket.odoo_session_id}). The agent will see your request: '{ticket.message}'. Please wait for their response."
+    if ticket.status == "no_agents":
+        return "All of our agents are offline right now. Please try again later."
+    return "I'm having trouble connecting you to an agent. Please try again."
+
+@app.post("/chat", response_model=ChatResponse)
+async def handle_chat(chat_message: ChatMessage, request: Request):
+    """Main endpoint for handling chat messages"""
+    admission.admit(request, chat_message.visitor_id, chat_message.session_id)
+    try:
+        # If session_id exists, send message directly to Odoo
+        if chat_message.session_id:
+            return await forward_to_session(chat_message)
         
         # Process message with AI agent
-        handoff_needed, ai_response, confidence = ai_agent.should_handoff(
+        handoff_needed, ai_response, confidence = await ai_agent.should_handoff(
             chat_message.message, 
             chat_message.context
         )
         
-        odoo_session_id = None
+        ticket_id = None
         
         if handoff_needed:
-            # Create Odoo live chat session
-            odoo_session_id = odoo_client.create_live_chat_session(
-                visitor_name=chat_message.visitor_name,
-                message=chat_message.message
-            )
-            
-            if odoo_session_id:
-                ai_response = f"I've connected you with a human agent (Session #{odoo_session_id}). The agent will see your request: '{chat_message.message}'. Please wait for their response."
-            else:
-                ai_response = "I'm having trouble connecting you to an agent. Please try again."
+            # The Odoo session is created in the background; follow the ticket
+            ai_response, ticket_id = await start_handoff(chat_message)
         
         return ChatResponse(
             response=ai_response,
             handoff_needed=handoff_needed,
             confidence=confidence,
-            odoo_session_id=odoo_session_id
+            handoff_ticket=ticket_id
         )
         
+    except (HTTPException, Overloaded):
+        raise
     except Exception as e:
-        print(f"Chat error: {e}")
+        ERRORS.labels("chat").inc()
+        logger.exception("Chat error: %s", e)
         raise HTTPException(status_code=500, detail=f"Error processing chat: {str(e)}")
 
+def sse_event(event: str, data: dict) -> str:
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n"
+
+@app.post("/chat/stream")
+async def handle_chat_stream(chat_message: ChatMessage, request: Request):
+    """Server-Sent Events variant of /chat.
+
+    Emits `token` events ({"text": ...}) as the answer is produced and a final
+    `done` event carrying the same fields as ChatResponse.
+    """
+    admission.admit(request, chat_message.visitor_id, chat_message.session_id)
+    
+    async def events():
+        try:
+            if chat_message.session_id:
+                result = await forward_to_session(chat_message)
+                yield sse_event("done", result.model_dump())
+                return
+            
+            async for kind, payload in ai_agent.stream_handoff(chat_message.message, chat_message.context):
+                if kind == "delta":
+                    yield sse_event("token", {"text": payload})
+                    continue
+                
+                handoff_needed, ai_response, confidence = payload
+                ticket_id = None
+                if handoff_needed:
+                    ai_response, ticket_id = await start_handoff(chat_message)
+                yield sse_event("done", ChatResponse(
+                    response=ai_response,
+                    handoff_needed=handoff_needed,
+                    confidence=confidence,
+                    handoff_ticket=ticket_id
+                ).model_dump())
+        except Exception as e:
+            ERRORS.labels("chat").inc()
+            logger.exception("Chat stream error: %s", e)
+            yield sse_event("error", {"detail": f"Error processing chat: {str(e)}"})
+    
+    return StreamingResponse(events(), media_type="text/event-stream", headers={
+        "Cache-Control": "no-cache",
+        "X-Accel-Buffering": "no"
+    })
+
+HANDOFF_MAX_WAIT = 30.0
+
+@app.get("/handoff/{ticket_id}")
+async def get_handoff(ticket_id: str, request: Request, wait: float = 0):
+    """State of a queued handoff.
+    
+    With `wait`, the request is held (up to 30 s) until the handoff finishes,
+    so the widget learns the Odoo session id as soon as it exists.
+    """
+    admission.admit(request)
+    ticket = handoff_queue.get(ticket_id)
+    if ticket is None:
+        raise HTTPException(status_code=404, detail="Unknown handoff ticket")
+    await handoff_queue.wait(ticket, min(wait, HANDOFF_MAX_WAIT))
+    result = ticket.to_dict()
+    result["response"] = handoff_message(ticket) if ticket.finished else None
+    return result
+
 @app.get("/messages/{session_id}")
-async def get_messages(session_id: int):
-    """Get new messages from Odoo live chat session"""
+async def get_messages(session_id: int, request: Request, after_id: int = 0):
+    """Get agent messages newer than after_id from Odoo live chat session"""
+    admission.admit(request, session_id=session_id)
     try:
-        messages = odoo_client.get_session_messages(session_id)
-        return {"messages": messages}
+        state = await session_watcher.get_state(session_id)
+        return {"messages": session_watcher.legacy_messages(state, after_id)}
     except Exception as e:
-        print(f"Error getting messages: {e}")
+        ERRORS.labels("messages").inc()
+        logger.exception("Error getting messages: %s", e)
         raise HTTPException(status_code=500, detail=f"Error getting messages: {str(e)}")
 
 @app.get("/session/{session_id}/status")
-async def get_session_status(session_id: int):
+async def get_session_status(session_id: int, request: Request):
     """Check if session is still active"""
+    admission.admit(request, session_id=session_id)
     try:
-        is_active = odoo_client.is_session_active(session_id)
-        return {"active": is_active}
+        state = await session_watcher.get_state(session_id)
+        return {"active": state.active, "reason": state.reason}
     except Exception as e:
-        print(f"Error checking session status: {e}")
+        ERRORS.labels("session_status").inc()
+        logger.exception("Error checking session status: %s", e)
         return {"active": False}
 
+SSE_KEEPALIVE = 15.0
+
+@app.get("/session/{session_id}/events")
+async def session_event_stream(session_id: int, request: Request, after_id: int = 0):
+    """Server-Sent Events stream of agent messages and session end events.
+
+    Events: `message` (id, body, author, date), `session_ended`,
+    `agent_disconnected`. Reconnecting clients resume after `after_id` or
+    the Last-Event-ID header.
+    """
+    admission.admit(request, session_id=session_id)
+    last_event_id = request.headers.get('last-event-id')
+    if last_event_id and last_event_id.isdigit():
+        after_id = max(after_id, int(last_event_id))
+    
+    async def events():
+        session_watcher.track(session_id)
+        queue = session_events.subscribe(session_id, session_watcher.backlog(session_id, after_id))
+        try:
+            yield "retry: 3000\n\n"
+            while True:
+                try:
+                    event = await asyncio.wait_for(queue.get(), timeout=SSE_KEEPALIVE)
+                except asyncio.TimeoutError:
+                    yield ": keep-alive\n\n"
+                    continue
+                if event['type'] == 'message':
+                    yield f"id: {event['data']['id']}\n" + sse_event('message', event['data'])
+                else:
+                    yield sse_event(event['type'], event['data'])
+                    return
+        finally:
+            session_events.unsubscribe(session_id, queue)
+            session_watcher.track(session_id)  # counts as recent use for idle expiry
+    
+    return StreamingResponse(events(), media_type="text/event-stream", headers={
+        "Cache-Control": "no-cache",
+        "X-Accel-Buffering": "no"
+    })
+
 class FeedbackRequest(BaseModel):
     session_id: int
     rating: str
     comment: Optional[str] = ""
 
 @app.post("/feedback")
-async def submit_feedback(feedback: FeedbackRequest):
+async def submit_feedback(feedback: FeedbackRequest, request: Request):
     """Submit feedback for a chat session"""
+    admission.admit(request, session_id=feedback.session_id)
     try:
-        # Store feedback in Odoo
-        success = odoo_client.store_feedback(
+        message_id = outbound_spool.enqueue_feedback(
+            feedback.session_id, feedback.rating, feedback.comment) if outbound_spool else None
+        if message_id:
+            return {"status": "success", "message": "Feedback submitted", "message_id": message_id}
+        
+        # No spool (or its file is locked): store feedback in Odoo directly
+        success = await odoo_client.store_feedback(
             feedback.session_id,
             feedback.rating,
             feedback.comment
@@ -149,14 +516,50 @@ async def submit_feedback(feedback: FeedbackRequest):
         else:
             return {"status": "error", "message": "Failed to submit feedback"}
             
+    except Overloaded:
+        raise
     except Exception as e:
-        print(f"Feedback error: {e}")
+        ERRORS.labels("feedback").inc()
+        logger.exception("Feedback error: %s", e)
         raise HTTPException(status_code=500, detail=f"Error submitting feedback: {str(e)}")
 
+@app.get("/outbound/{message_id}")
+async def get_outbound_status(message_id: str, request: Request):
+    """Delivery state of a spooled visitor message or feedback"""
+    admission.admit(request)
+    status = outbound_spool.status(message_id) if outbound_spool else None
+    if status is None:
+        raise HTTPException(status_code=404, detail="Unknown message id")
+    return status
+
 @app.get("/health")
 async def health_check():
     """Health check endpoint"""
-    return {"status": "healthy", "service": "AI Middleware"}
+    return {
+        "status": "healthy",
+        "service": "AI Middleware",
+        "kb_version": ai_agent.kb.version,
+        "answer_cache": {**ai_agent.answer_cache.stats(), "shared_hits": ai_agent.shared_cache_hits},
+        "intent_routes": ai_agent.intent_router.stats(),
+        "odoo_status_cache": odoo_client.status_cache_stats(),
+        "odoo_notify": odoo_client.notify_stats,
+        "odoo_auth": odoo_client.auth_stats,
+        "livechat_channels": odoo_client.channel_summary(),
+        "handoff_queue": handoff_queue.stats(),
+        "sessions": session_watcher.stats(),
+        "outbound_spool": outbound_spool.stats() if outbound_spool else None,
+        "state_store": state_store.stats(),
+        "admission": {
+            "rate_limits": admission.stats(),
+            "odoo": odoo_gate.stats(),
+            "llm": ai_agent.llm_gate.stats()
+        }
+    }
+
+@app.get("/metrics", response_class=PlainTextResponse)
+async def metrics():
+    """Prometheus text exposition of latency histograms, counters and gauges"""
+    return PlainTextResponse(REGISTRY.render(), media_type="text/plain; version=0.0.4")
 
 if __name__ == "__main__":
     import uvicorn
@@ -0,0 +1,257 @@
+"""Prometheus-style metrics without a client library.
+
+Metrics live in a Registry and render to the text exposition format
+(`Registry.render()`, served on /metrics). Updates are plain dict and list
+operations on the event loop thread, so the hot path takes no locks; read
+values back with `Registry.sample()` in tests or scripts.
+"""
+from abc import ABC, abstractmethod
+from bisect import bisect_left
+from typing import Callable, Dict, Iterable, List, Optional, Sequence, Tuple
+import math
+
+# Seconds; covers a cache hit (sub-ms) up to a slow LLM completion
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+def _format_value(value: float) -> str:
+    if value == math.inf:
+        return "+Inf"
+    if float(value).is_integer():
+        return str(int(value))
+    return repr(float(value))
+
+def _format_labels(names: Sequence[str], values: Sequence[str]) -> str:
+    if not names:
+        return ""
+    pairs = []
+    for name, value in zip(names, values):
+        escaped = str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+        pairs.append(f'{name}="{escaped}"')
+    return "{" + ",".join(pairs) + "}"
+
+class _Metric(ABC):
+    kind = ""
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = (),
+                 function: Optional[Callable[[], object]] = None):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        # Read at scrape time instead of being updated on the hot path.
+        # Unlabelled: returns a number. Labelled: returns {label value(s): number}
+        self.function = function
+        self._children: Dict[Tuple[str, ...], object] = {}
+        if not self.labelnames:
+            self._default = self._children[()] = self._new_child()
+
+    @abstractmethod
+    def _new_child(self):
+        """A fresh child holding the value(s) of one label combination"""
+
+    def labels(self, *values):
+        """Child metric for one combination of label values (created once)"""
+        key = tuple(str(v) for v in values)
+        child = self._children.get(key)
+        if child is None:
+            if len(key) != len(self.labelnames):
+                raise ValueError(f"{self.name} expects labels {self.labelnames}")
+            child = self._children[key] = self._new_child()
+        return child
+
+    @abstractmethod
+    def collect(self) -> Iterable[Tuple[str, Tuple[str, ...], Tuple[str, ...], float]]:
+        """(sample name, label names, label values, value) tuples"""
+
+    def _collect_function(self, sample_name: str):
+        values = self.function()
+        if not self.labelnames:
+            yield sample_name, (), (), float(values)
+            return
+        for key, value in values.items():
+            key = key if isinstance(key, tuple) else (key,)
+            yield sample_name, self.labelnames, tuple(str(k) for k in key), float(value)
+
+class _CounterChild:
+    __slots__ = ("value",)
+
+    def __init__(self):
+        self.value = 0.0
+
+    def inc(self, amount: float = 1.0):
+        self.value += amount
+
+class Counter(_Metric):
+    kind = "counter"
+
+    def _new_child(self):
+        return _CounterChild()
+
+    def inc(self, amount: float = 1.0):
+        self._default.value += amount
+
+    def collect(self):
+        if self.function is not None:
+            yield from self._collect_function(self.name + "_total")
+            return
+        for key, child in self._children.items():
+            yield self.name + "_total", self.labelnames, key, child.value
+
+class _GaugeChild:
+    __slots__ = ("value",)
+
+    def __init__(self):
+        self.value = 0.0
+
+    def set(self, value: float):
+        self.value = value
+
+    def inc(self, amount: float = 1.0):
+        self.value += amount
+
+    def dec(self, amount: float = 1.0):
+        self.value -= amount
+
+class Gauge(_Metric):
+    kind = "gauge"
+
+    def _new_child(self):
+        return _GaugeChild()
+
+    def set(self, value: float):
+        self._default.value = value
+
+    def inc(self, amount: float = 1.0):
+        self._default.value += amount
+
+    def dec(self, amount: float = 1.0):
+        self._default.value -= amount
+
+    def collect(self):
+        if self.function is not None:
+            yield from self._collect_function(self.name)
+            return
+        for key, child in self._children.items():
+            yield self.name, self.labelnames, key, child.value
+
+class _HistogramChild:
+    __slots__ = ("bounds", "counts", "sum", "count")
+
+    def __init__(self, bounds: Tuple[float, ...]):
+        self.bounds = bounds
+        self.counts = [0] * (len(bounds) + 1)  # last slot is +Inf
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value: float):
+        self.counts[bisect_left(self.bounds, value)] += 1
+        self.sum += value
+        self.count += 1
+
+class Histogram(_Metric):
+    kind = "histogram"
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = (),
+                 buckets: Sequence[float] = LATENCY_BUCKETS):
+        self.buckets = tuple(sorted(buckets))
+        super().__init__(name, documentation, labelnames)
+
+    def _new_child(self):
+        return _HistogramChild(self.buckets)
+
+    def observe(self, value: float):
+        self._default.observe(value)
+
+    def collect(self):
+        names = self.labelnames + ("le",)
+        for key, child in self._children.items():
+            cumulative = 0
+            for bound, count in zip(self.buckets + (math.inf,), child.counts):
+                cumulative += count
+                yield self.name + "_bucket", names, key + (_format_value(bound),), cumulative
+            yield self.name + "_sum", self.labelnames, key, child.sum
+            yield self.name + "_count", self.labelnames, key, child.count
+
+class Registry:
+    def __init__(self):
+        self._metrics: Dict[str, _Metric] = {}
+
+    def register(self, metric: _Metric) -> _Metric:
+        if metric.name in self._metrics:
+            raise ValueError(f"Metric {metric.name} already registered")
+        self._metrics[metric.name] = metric
+        return metric
+
+    def counter(self, name: str, documentation: str, labelnames: Sequence[str] = (),
+                function: Optional[Callable[[], object]] = None) -> Counter:
+        return self.register(Counter(name, documentation, labelnames, function))
+
+    def gauge(self, name: str, documentation: str, labelnames: Sequence[str] = (),
+              function: Optional[Callable[[], object]] = None) -> Gauge:
+        return self.register(Gauge(name, documentation, labelnames, function))
+
+    def histogram(self, name: str, documentation: str, labelnames: Sequence[str] = (),
+                  buckets: Sequence[float] = LATENCY_BUCKETS) -> Histogram:
+        return self.register(Histogram(name, documentation, labelnames, buckets))
+
+    def get(self, name: str) -> Optional[_Metric]:
+        return self._metrics.get(name)
+
+    def render(self) -> str:
+        """All metrics in the Prometheus text exposition format"""
+        lines: List[str] = []
+        for metric in self._metrics.values():
+            lines.append(f"# HELP {metric.name} {metric.documentation}")
+            lines.append(f"# TYPE {metric.name} {metric.kind}")
+            try:
+                samples = list(metric.collect())
+            except Exception as e:
+                lines.append(f"# collection failed: {e}")
+                continue
+            for sample_name, names, values, value in samples:
+                lines.append(f"{sample_name}{_format_labels(names, values)} {_format_value(value)}")
+        return "\n".join(lines) + "\n"
+
+    def sample(self, sample_name: str, **labels) -> Optional[float]:
+        """Current value of one sample, e.g. sample('odoo_rpc_seconds_count', method='read')"""
+        for metric in self._metrics.values():
+            if not sample_name.startswith(metric.name):
+                continue
+            for name, names, values, value in metric.collect():
+                if name == sample_name and dict(zip(names, values)) == labels:
+                    return value
+        return None
+
+REGISTRY = Registry()
+
+# Odoo
+ODOO_RPC_SECONDS = REGISTRY.histogram(
+    "ai_middleware_odoo_rpc_seconds", "Odoo JSON-RPC latency by method", ["method"])
+ODOO_RPC_ERRORS = REGISTRY.counter(
+    "ai_middleware_odoo_rpc_errors", "Odoo JSON-RPC calls that failed or returned an error", ["method"])
+
+# LLM
+LLM_SECONDS = REGISTRY.histogram(
+    "ai_middleware_llm_seconds", "LLM completion latency (streams: until the last token)", ["mode"])
+LLM_TOKENS = REGISTRY.counter(
+    "ai_middleware_llm_tokens", "LLM tokens used; streamed completions count one per chunk", ["kind"])
+LLM_ERRORS = REGISTRY.counter(
+    "ai_middleware_llm_errors", "LLM completions that failed or were refused")
+
+# Knowledge base
+KB_SEARCH_SECONDS = REGISTRY.histogram(
+    "ai_middleware_kb_search_seconds", "Knowledge base search latency")
+KB_SEARCH_CANDIDATES = REGISTRY.histogram(
+    "ai_middleware_kb_search_candidates", "Q&A pairs scored per knowledge base search",
+    buckets=(0, 1, 5, 10, 50, 100, 500, 1000, 5000, 10000, 50000, 100000))
+
+# Handoffs
+HANDOFF_QUEUE_WAIT_SECONDS = REGISTRY.histogram(
+    "ai_middleware_handoff_queue_wait_seconds", "Time handoff tickets waited for a queue worker")
+HANDOFF_CREATE_SECONDS = REGISTRY.histogram(
+    "ai_middleware_handoff_create_seconds", "Time to settle a handoff ticket by outcome", ["status"])
+
+# Chat
+CHAT_DECISIONS = REGISTRY.counter(
+    "ai_middleware_chat_decisions", "How visitor questions were answered", ["route"])
+ERRORS = REGISTRY.counter(
+    "ai_middleware_errors", "Errors by component", ["component"])
@@ -1,23 +1,145 @@
-import requests
-import json
-from typing import Dict, Any, Optional
+import asyncio
+import httpx
+import html
+import logging
+import re
+import time
+from collections import OrderedDict
+from urllib.parse import urlparse
+from typing import Dict, Any, List, Optional
+from .admission import Overloaded
+from .metrics import ODOO_RPC_SECONDS, ODOO_RPC_ERRORS
+from .tracing import span
+
+logger = logging.getLogger(__name__)
+
+VISITOR_EMAIL = 'visitor@livechat.com'
+
+# discuss.channel fields describing the live chat state of a session
+SESSION_STATUS_FIELDS = [
+    "livechat_status",
+    "livechat_end_dt",
+    "livechat_operator_id",
+    "channel_member_ids",
+    "is_member"
+]
+
+# Odoo domain selecting agent messages only: authored by a partner and not
+# posted by us on behalf of the visitor
+AGENT_MESSAGE_DOMAIN = [
+    ["author_id", "!=", False],
+    ["email_from", "not ilike", VISITOR_EMAIL]
+]
+
+class MessageSanitizer:
+    """Strips HTML from message bodies once per message id (LRU cached)"""
+    
+    TAG_RE = re.compile(r'<[^>]+>')
+    
+    def __init__(self, max_entries: int = 5000):
+        self.max_entries = max_entries
+        self._cache: "OrderedDict[int, str]" = OrderedDict()
+    
+    def clean(self, message_id: int, body: Optional[str]) -> str:
+        cached = self._cache.get(message_id)
+        if cached is not None:
+            self._cache.move_to_end(message_id)
+            return cached
+        text = html.unescape(self.TAG_RE.sub('', body or ''))
+        self._cache[message_id] = text
+        if len(self._cache) > self.max_entries:
+            self._cache.popitem(last=False)
+        return text
+
+def is_session_expired(result: dict) -> bool:
+    """True if a JSON-RPC response says our Odoo session cookie is no longer valid"""
+    error = result.get('error')
+    if not error:
+        return False
+    name = (error.get('data') or {}).get('name', '') if isinstance(error, dict) else ''
+    return 'SessionExpired' in name or 'Session Expired' in str(error)
 
 class OdooClient:
-    def __init__(self, url: str, db: str, username: str, password: str):
+    LOGIN_KEY = "odoo:login"
+    
+    def __init__(self, url: str, db: str, username: str, password: str,
+                 pool_size: int = 20, keepalive_size: Optional[int] = None,
+                 timeout: float = 15.0, connect_timeout: float = 5.0,
+                 pool_timeout: float = 10.0, status_ttl: float = 0.3,
+                 liveness_max_age: float = 5.0, session_lifetime: float = 0.0,
+                 livechat_channel_ids: Optional[List[int]] = None,
+                 channel_refresh_interval: float = 30.0, gate=None, store=None):
         self.url = url.rstrip('/')
         self.db = db
         self.username = username
         self.password = password
         self.uid = None
-        self.session = requests.Session()
-        self.operator_states = {}  # Track operator changes
-        # Set proper headers for Odoo Online
-        self.session.headers.update({
-            'Content-Type': 'application/json',
-            'User-Agent': 'Mozilla/5.0 (compatible; AI-Middleware/1.0)'
-        })
-        
-    def authenticate(self) -> bool:
+        # Login state: every successful authenticate() bumps the generation so
+        # callers that saw an expired session can tell whether someone else
+        # already logged in again. session_lifetime > 0 re-authenticates
+        # proactively once the session is that many seconds old.
+        self.session_lifetime = session_lifetime
+        # Optional admission.ConcurrencyGate capping RPCs in flight; when it
+        # is saturated, calls fail fast with admission.Overloaded
+        self.gate = gate
+        self._auth_lock = asyncio.Lock()
+        self._auth_generation = 0
+        self._auth_at = 0.0
+        self.auth_stats = {"logins": 0, "failures": 0, "expired": 0, "replays": 0, "refreshes": 0, "adopted": 0}
+        # Optional state_store.StateStore: a login made by one worker is
+        # published there and reused by the others instead of logging in again
+        self.store = store
+        self.sanitizer = MessageSanitizer()
+        # Short-lived discuss.channel status per session, shared by every
+        # caller; concurrent misses for one session share a single read
+        self.status_ttl = status_ttl
+        self._status_cache: Dict[int, tuple] = {}  # session_id -> (fetched_at, record or None)
+        self._status_inflight: Dict[int, asyncio.Task] = {}
+        self.status_stats = {"reads": 0, "cache_hits": 0, "coalesced": 0, "invalidations": 0}
+        # Sends trust a cached status up to this old (SessionWatcher refreshes
+        # it every poll) instead of reading the channel before each message
+        self.liveness_max_age = liveness_max_age
+        # Fire-and-forget RPCs (agent notifications) still running
+        self._background: set = set()
+        self.notify_stats = {"sent": 0, "failed": 0, "last_error": None}
+        # im_livechat.channel records with their available operators, re-read
+        # every channel_refresh_interval. livechat_channel_ids is the order to
+        # try channels in, and the whole list when channels can't be read.
+        self.livechat_channel_ids = list(livechat_channel_ids or [1, 2])
+        self.channel_refresh_interval = channel_refresh_interval
+        self._channels: Optional[List[dict]] = None
+        self._channels_at: Optional[float] = None  # time of the last read attempt
+        self._channels_refresh: Optional[asyncio.Task] = None
+        # One keep-alive pool shared by every coroutine. Requests beyond
+        # pool_size wait (up to pool_timeout) for a free connection instead
+        # of opening new sockets to Odoo.
+        self.session = httpx.AsyncClient(
+            limits=httpx.Limits(
+                max_connections=pool_size,
+                max_keepalive_connections=keepalive_size if keepalive_size is not None else pool_size
+            ),
+            timeout=httpx.Timeout(timeout, connect=connect_timeout, pool=pool_timeout),
+            # Set proper headers for Odoo Online
+            headers={
+                'Content-Type': 'application/json',
+                'User-Agent': 'Mozilla/5.0 (compatible; AI-Middleware/1.0)'
+            }
+        )
+    
+    async def close(self):
+        """Finish pending notifications and close pooled connections to Odoo"""
+        if self._background:
+            await asyncio.wait(self._background, timeout=5)
+        await self.session.aclose()
+    
+    def _spawn(self, coro):
+        """Run coro without waiting for it; the task is kept until it ends"""
+        task = asyncio.ensure_future(coro)
+        self._background.add(task)
+        task.add_done_callback(self._background.discard)
+        return task
+    
+    async def authenticate(self) -> bool:
         """Authenticate with Odoo and get session"""
         auth_data = {
             "jsonrpc": "2.0",
@@ -30,404 +152,653 @@ class OdooClient:
             "id": 1
         }
         
+        started = time.perf_counter()
         try:
-            response = self.session.post(f"{self.url}/web/session/authenticate", json=auth_data)
+            with span("odoo-authenticate"):
+                response = await self.session.post(f"{self.url}/web/session/authenticate", json=auth_data)
+            ODOO_RPC_SECONDS.labels("authenticate").observe(time.perf_counter() - started)
             result = response.json()
-            print(f"Auth response: {result}")
+            if logger.isEnabledFor(logging.DEBUG):
+                logger.debug("Auth response: %s", result)
             
             if result.get('result') and result['result'].get('uid'):
                 self.uid = result['result']['uid']
+                self._auth_generation += 1
+                self._auth_at = time.monotonic()
+                self.auth_stats["logins"] += 1
+                cookie = self._session_cookie()
+                if self.store is not None and cookie:
+                    self.store.set(self.LOGIN_KEY, {"session_id": cookie, "uid": self.uid, "at": time.time()})
                 return True
         except Exception as e:
-            print(f"Auth error: {e}")
-            
+            logger.warning("Auth error: %s", e)
+        
+        self.uid = None
+        self.auth_stats["failures"] += 1
+        ODOO_RPC_ERRORS.labels("authenticate").inc()
         return False
     
-    def create_live_chat_session(self, visitor_name: str, message: str) -> Optional[int]:
-        """Create a new live chat session in Odoo"""
+    async def _ensure_session(self, expired_generation: Optional[int] = None) -> bool:
+        """Make sure we hold a valid login before a call.
+
+        Logs in when there is none, when it is past session_lifetime, or when
+        the caller saw generation expired_generation expire. Concurrent
+        callers wait on one lock, so only the first of them authenticates.
+        """
+        if self._session_usable(expired_generation):
+            return True
+        async with self._auth_lock:
+            if self._session_usable(expired_generation):
+                return True
+            if self._adopt_shared_login():
+                return True
+            if self.uid and expired_generation is None:
+                self.auth_stats["refreshes"] += 1
+            return await self.authenticate()
+    
+    def _session_cookie(self) -> Optional[str]:
+        for cookie in self.session.cookies.jar:
+            if cookie.name == 'session_id':
+                return cookie.value
+        return None
+    
+    def _adopt_shared_login(self) -> bool:
+        """Switch to a login another worker published, if it is newer than
+        ours (which is missing, expired or too old)"""
+        if self.store is None:
+            return False
+        login = self.store.get(self.LOGIN_KEY)
+        if not login or login['session_id'] == self._session_cookie():
+            return False
+        age = time.time() - login['at']
+        if self.session_lifetime > 0 and age >= self.session_lifetime:
+            return False
+        self.session.cookies.clear()
+        self.session.cookies.set('session_id', login['session_id'], domain=urlparse(self.url).hostname or '')
+        self.uid = login['uid']
+        self._auth_generation += 1
+        self._auth_at = time.monotonic() - age
+        self.auth_stats["adopted"] += 1
+        return True
+    
+    def _session_usable(self, expired_generation: Optional[int]) -> bool:
         if not self.uid:
-            if not self.authenticate():
+            return False
+        if expired_generation is not None:
+            return self._auth_generation != expired_generation
+        if self.session_lifetime > 0:
+            return time.monotonic() - self._auth_at < self.session_lifetime
+        return True
+    
+    async def _rpc(self, path: str, params: dict, rpc_id: int) -> dict:
+        """POST one JSON-RPC call to Odoo and return the decoded response.
+
+        Every call to Odoo except authenticate() goes through here. If Odoo
+        answers "Session Expired", the login is renewed once (see
+        _ensure_session) and the call replayed. HTTP errors and non-JSON
+        bodies come back as {'error': ...} like Odoo's own errors; transport
+        errors (and admission.Overloaded from the gate) are raised.
+        """
+        if not await self._ensure_session():
+            return {"error": {"message": "Odoo authentication failed"}}
+        
+        payload = {"jsonrpc": "2.0", "method": "call", "params": params, "id": rpc_id}
+        generation = self._auth_generation
+        result = await self._post(path, payload)
+        
+        if is_session_expired(result):
+            self.auth_stats["expired"] += 1
+            if self._auth_generation == generation:
+                self.uid = None
+            if not await self._ensure_session(expired_generation=generation):
+                return result
+            self.auth_stats["replays"] += 1
+            result = await self._post(path, payload)
+        return result
+    
+    async def _post(self, path: str, payload: dict) -> dict:
+        # ORM calls are labelled by method (read, message_post...), others by route
+        method = payload['params'].get('method') if 'model' in payload['params'] else path.rsplit('/', 1)[-1]
+        try:
+            if self.gate is None:
+                response = await self._timed_post(path, payload, method)
+            else:
+                async with self.gate.slot():
+                    response = await self._timed_post(path, payload, method)
+        except Exception:
+            ODOO_RPC_ERRORS.labels(method).inc()
+            raise
+        try:
+            result = response.json()
+        except ValueError:
+            result = {"error": {"message": f"HTTP {response.status_code}: non-JSON response",
+                                "data": {"body": response.text[:200]}}}
+        if response.status_code != 200 and 'error' not in result:
+            result = {"error": {"message": f"HTTP {response.status_code}", "data": result}}
+        if 'error' in result:
+            ODOO_RPC_ERRORS.labels(method).inc()
+        return result
+    
+    async def _timed_post(self, path: str, payload: dict, method: str) -> httpx.Response:
+        started = time.perf_counter()
+        with span(f"odoo-{method}"):
+            response = await self.session.post(f"{self.url}{path}", json=payload)
+        ODOO_RPC_SECONDS.labels(method).observe(time.perf_counter() - started)
+        return response
+    
+    async def _call_kw(self, model: str, method: str, args: list, kwargs: Optional[dict] = None,
+                       rpc_id: int = 1) -> dict:
+        """ORM method call through /web/dataset/call_kw"""
+        return await self._rpc("/web/dataset/call_kw", {
+            "model": model,
+            "method": method,
+            "args": args,
+            "kwargs": kwargs or {}
+        }, rpc_id)
+    
+    async def refresh_channels(self) -> Optional[List[dict]]:
+        """Read the live chat channels and their currently available operators"""
+        self._channels_at = time.monotonic()
+        try:
+            result = await self._call_kw("im_livechat.channel", "search_read",
+                                         [[], ["id", "name", "available_operator_ids"]], rpc_id=12)
+            if 'result' in result:
+                preferred = {channel_id: i for i, channel_id in enumerate(self.livechat_channel_ids)}
+                self._channels = sorted(result['result'],
+                                        key=lambda c: (preferred.get(c['id'], len(preferred)), c['id']))
+                return self._channels
+            logger.warning("Live chat channel read failed: %s", result.get('error'))
+        except Exception as e:
+            logger.warning("Error reading live chat channels: %s", e)
+        return None
+    
+    def _start_channel_refresh(self) -> asyncio.Task:
+        if self._channels_refresh is None or self._channels_refresh.done():
+            self._channels_refresh = self._spawn(self.refresh_channels())
+        return self._channels_refresh
+    
+    async def livechat_channels(self) -> Optional[List[dict]]:
+        """Cached live chat channels, preferred ones first.
+
+        Once loaded, an outdated list is still returned while a refresh runs
+        in the background, so handoffs never wait for it. None if the channels
+        have not been read successfully (yet).
+        """
+        due = self._channels_at is None or time.monotonic() - self._channels_at >= self.channel_refresh_interval
+        if due:
+            refresh = self._start_channel_refresh()
+            if self._channels is None:
+                await asyncio.shield(refresh)
+        return self._channels
+    
+    async def agents_online(self) -> Optional[bool]:
+        """Whether any live chat channel has an operator available; None if unknown"""
+        channels = await self.livechat_channels()
+        if channels is None:
+            return None
+        return any(channel.get('available_operator_ids') for channel in channels)
+    
+    def channel_summary(self) -> Optional[List[dict]]:
+        if self._channels is None:
+            return None
+        return [{"id": c['id'], "name": c.get('name'), "operators": len(c.get('available_operator_ids') or [])}
+                for c in self._channels]
+    
+    async def create_live_chat_session(self, visitor_name: str, message: str) -> Optional[int]:
+        """Create a new live chat session in Odoo.
+
+        Goes straight to a channel with operators online according to the
+        cached channel list; without one it returns None at once. If the
+        channels can't be read, livechat_channel_ids are tried in order.
+        """
+        channels = await self.livechat_channels()
+        if channels is None:
+            candidates = self.livechat_channel_ids
+        else:
+            candidates = [c['id'] for c in channels if c.get('available_operator_ids')]
+            if not candidates:
+                logger.info("No live chat operators online")
                 return None
         
-        # Try channel ID 1 first, then 2
-        for channel_id in [1, 2]:
-            print(f"Attempting to create session for channel {channel_id} with visitor {visitor_name}")
+        for channel_id in candidates:
+            logger.debug("Creating session", extra={"channel_id": channel_id, "visitor": visitor_name})
             
             try:
-                rpc_data = {
-                    "jsonrpc": "2.0",
-                    "method": "call",
-                    "params": {
-                        "channel_id": channel_id,
-                        "anonymous_name": visitor_name,
-                        "previous_operator_id": False,
-                        "country_id": False,
-                        "user_id": False,
-                        "persisted": True
-                    },
-                    "id": 2
-                }
+                result = await self._rpc("/im_livechat/get_session", {
+                    "channel_id": channel_id,
+                    "anonymous_name": visitor_name,
+                    "previous_operator_id": False,
+                    "country_id": False,
+                    "user_id": False,
+                    "persisted": True
+                }, 2)
                 
-                response = self.session.post(f"{self.url}/im_livechat/get_session", json=rpc_data)
+                session_id = (result.get('result') or {}).get('channel_id')
+                if session_id:
+                    logger.info("Live chat session created", extra={"session_id": session_id, "channel_id": channel_id})
+                    # Send the initial message as visitor; the
+                    # session was just opened, so skip the check
+                    await self.send_message_to_session(session_id, message, visitor_name, check_active=False)
+                    return session_id
                 
-                if response.status_code == 200:
-                    try:
-                        result = response.json()
-                        print(f"Live chat response: {result}")
-                        
-                        if result.get('result') and result['result'] != False:
-                            session_data = result['result']
-                            session_id = session_data.get('channel_id')
-                            if session_id:
-                                print(f"✅ Live chat session created! ID: {session_id}")
-                                # Send the initial message as visitor
-                                self.send_message_to_session(session_id, message, visitor_name)
-                                return session_id
-                    except json.JSONDecodeError:
-                        print(f"Non-JSON response for channel {channel_id}: {response.text[:200]}")
-                        continue
-                else:
-                    print(f"HTTP {response.status_code} for channel {channel_id}")
-                    
+                logger.info("Channel %s did not open a session: %s", channel_id,
+                            result.get('error') or 'no operator available')
+                if channels is not None:
+                    # Operators changed since the list was read
+                    self._start_channel_refresh()
+            
+            except Overloaded:
+                raise
             except Exception as e:
-                print(f"Error with channel {channel_id}: {e}")
+                logger.warning("Error with channel %s: %s", channel_id, e)
                 continue
         
-        print("❌ All channels failed")
+        logger.warning("All channels failed")
         return None
     
-    def send_message_to_session(self, session_id: int, message: str, author_name: str) -> bool:
-        """Send message as visitor to the live chat session"""
+    async def send_message_to_session(self, session_id: int, message: str, author_name: str,
+                                      check_active: bool = True,
+                                      message_id: Optional[str] = None) -> Optional[bool]:
+        """Send message as visitor to the live chat session.
+
+        Liveness comes from the status cache when it is recent enough, so a
+        message to a watched session costs one round trip (message_post); the
+        agent notification is sent in the background. message_id is stored as
+        the mail.message Message-ID, so a retry can look it up (find_message).
+
+        Returns True once posted, False if the session is no longer active and
+        None if Odoo could not be reached (worth retrying). Raises
+        admission.Overloaded when the Odoo gate refuses the call.
+        """
         try:
-            # First check if session is still active with comprehensive check
-            if not self.is_session_active(session_id):
-                print(f"Session {session_id} is not active, cannot send message")
-                return False
+            if check_active:
+                active = await self.session_liveness(session_id)
+                if active is None:
+                    logger.warning("Session %s status unavailable, message not sent", session_id)
+                    return None
+                if not active:
+                    logger.info("Session %s is not active, cannot send message", session_id)
+                    return False
             
             # Send message as visitor (not as authenticated user)
-            message_data = {
-                "jsonrpc": "2.0",
-                "method": "call",
-                "params": {
-                    "model": "discuss.channel",
-                    "method": "message_post",
-                    "args": [session_id],
-                    "kwargs": {
-                        "body": message,
-                        "message_type": "comment",
-                        "author_id": False,  # No author = visitor message
-                        "email_from": f"{author_name} <visitor@livechat.com>"
-                    }
-                },
-                "id": 3
+            kwargs = {
+                "body": message,
+                "message_type": "comment",
+                "author_id": False,  # No author = visitor message
+                "email_from": f"{author_name} <{VISITOR_EMAIL}>"
             }
+            if message_id:
+                kwargs["message_id"] = message_id
+            result = await self._call_kw("discuss.channel", "message_post", [session_id], kwargs, rpc_id=3)
             
-            response = self.session.post(f"{self.url}/web/dataset/call_kw", json=message_data)
-            
-            if response.status_code == 200:
-                try:
-                    result = response.json()
-                    print(f"Message send result: {result}")
-                    
-                    if result.get('result'):
-                        print(f"✅ Message sent successfully to session {session_id}")
-                        # Trigger notification to agent
-                        self.notify_agent(session_id)
-                        return True
-                    else:
-                        print(f"❌ Failed to send message: {result}")
-                        return False
-                except json.JSONDecodeError:
-                    print(f"Non-JSON response when sending message: {response.text[:200]}")
-                    return False
-            else:
-                print(f"HTTP {response.status_code} when sending message")
-                return False
+            if result.get('result'):
+                logger.debug("Message sent", extra={"session_id": session_id, "odoo_message_id": result['result']})
+                self.invalidate_session(session_id)
+                # Notify the agent without holding up the visitor
+                self._spawn(self.notify_agent(session_id))
+                return True
             
+            logger.warning("Failed to send message to session %s: %s", session_id, result.get('error'))
+            return None
+        
+        except Overloaded:
+            raise
         except Exception as e:
-            print(f"Error sending message: {e}")
-            return False
+            logger.warning("Error sending message: %s", e)
+            return None
+    
+    async def close_session(self, session_id: int) -> bool:
+        """Leave a live chat session as its visitor, which closes it for the
+        operator (im_livechat's visitor_leave_session route)"""
+        try:
+            result = await self._rpc("/im_livechat/visitor_leave_session", {"channel_id": session_id}, 14)
+            if 'error' not in result:
+                self.invalidate_session(session_id)
+                return True
+            logger.warning("Closing session %s failed: %s", session_id, result.get('error'))
+        except Exception as e:
+            logger.warning("Error closing session %s: %s", session_id, e)
+        return False
+    
+    async def find_message(self, message_id: str) -> Optional[int]:
+        """Id of the mail.message posted with this Message-ID, 0 if there is
+        none, None if the lookup failed"""
+        try:
+            result = await self._call_kw("mail.message", "search_read",
+                                         [[["message_id", "=", message_id]], ["id"]], {"limit": 1}, rpc_id=13)
+            if 'result' in result:
+                return result['result'][0]['id'] if result['result'] else 0
+            logger.warning("Message lookup failed: %s", result.get('error'))
+        except Overloaded:
+            raise
+        except Exception as e:
+            logger.warning("Error looking up message: %s", e)
+        return None
     
-    def notify_agent(self, session_id: int):
+    async def notify_agent(self, session_id: int):
         """Send notification to agent about new message"""
         try:
-            notify_data = {
-                "jsonrpc": "2.0",
-                "method": "call",
-                "params": {
-                    "model": "discuss.channel",
-                    "method": "_notify_thread",
-                    "args": [session_id],
-                    "kwargs": {}
-                },
-                "id": 4
-            }
-            
-            response = self.session.post(f"{self.url}/web/dataset/call_kw", json=notify_data)
-            if response.status_code == 200:
-                print(f"✅ Agent notification sent for session {session_id}")
-            
+            result = await self._call_kw("discuss.channel", "_notify_thread", [session_id], rpc_id=4)
+            if 'error' not in result:
+                self.notify_stats["sent"] += 1
+                return
+            error = str(result['error'])[:200]
         except Exception as e:
-            print(f"Error notifying agent: {e}")
+            error = str(e)
+        self.notify_stats["failed"] += 1
+        self.notify_stats["last_error"] = {"session_id": session_id, "error": error, "at": time.time()}
+    
+    def format_agent_message(self, msg: dict) -> dict:
+        """Widget-facing form of an agent mail.message row"""
+        return {
+            'id': msg['id'],
+            'body': self.sanitizer.clean(msg['id'], msg.get('body')),
+            'author': msg['author_id'][1] if isinstance(msg['author_id'], list) else 'Agent',
+            'date': msg['date']
+        }
+    
+    async def _read_channel(self, session_id: int) -> Optional[dict]:
+        """discuss.channel status record of a session (SESSION_STATUS_FIELDS),
+        or None if the channel does not exist or could not be read"""
+        record, _ = await self._read_channel_status(session_id)
+        return record
     
-    def get_session_messages(self, session_id: int):
-        """Get messages from live chat session"""
+    async def _read_channel_status(self, session_id: int):
+        """(record or None, read succeeded) for a session.
+
+        Served from a cache younger than status_ttl when possible; callers
+        missing the cache at the same time share one in-flight read.
+        """
+        cached = self._status_cache.get(session_id)
+        if cached and time.monotonic() - cached[0] < self.status_ttl:
+            self.status_stats["cache_hits"] += 1
+            return cached[1], True
+        
+        task = self._status_inflight.get(session_id)
+        if task is not None:
+            self.status_stats["coalesced"] += 1
+            return await asyncio.shield(task)
+        
+        started = time.monotonic()
+        task = asyncio.ensure_future(self._fetch_channel(session_id))
+        self._status_inflight[session_id] = task
+        try:
+            record, ok = await asyncio.shield(task)
+        finally:
+            # invalidate_session() drops the entry if we posted meanwhile;
+            # such a read may predate our message and is not cached
+            current = self._status_inflight.get(session_id) is task
+            if current:
+                del self._status_inflight[session_id]
+        if ok and current:
+            self._store_status(session_id, record, started)
+        return record, ok
+    
+    def cached_liveness(self, session_id: int) -> Optional[bool]:
+        """Whether a session is active according to a status no older than
+        liveness_max_age; None if there is no such status"""
+        cached = self._status_cache.get(session_id)
+        if cached and time.monotonic() - cached[0] < self.liveness_max_age:
+            return self._channel_active(cached[1])
+        return None
+    
+    async def session_liveness(self, session_id: int) -> Optional[bool]:
+        """cached_liveness, falling back to a status read; None if that failed"""
+        active = self.cached_liveness(session_id)
+        if active is not None:
+            return active
+        record, ok = await self._read_channel_status(session_id)
+        return self._channel_active(record) if ok else None
+    
+    async def _fetch_channel(self, session_id: int):
+        """One discuss.channel read; returns (record or None, read succeeded)"""
+        self.status_stats["reads"] += 1
+        try:
+            result = await self._call_kw("discuss.channel", "read", [[session_id], SESSION_STATUS_FIELDS], rpc_id=8)
+            if 'result' in result:
+                return (result['result'][0] if result['result'] else None), True
+            logger.warning("Session status read failed: %s", result.get('error'))
+            return None, False
+        
+        except Overloaded:
+            raise
+        except Exception as e:
+            logger.warning("Error reading session status: %s", e)
+            return None, False
+    
+    def _store_status(self, session_id: int, record: Optional[dict], fetched_at: float):
+        self._status_cache[session_id] = (fetched_at, record)
+        if len(self._status_cache) > 1000:
+            # Past status_ttl an entry still serves cached_liveness()
+            cutoff = time.monotonic() - max(self.status_ttl, self.liveness_max_age)
+            for key, (at, _) in list(self._status_cache.items()):
+                if at < cutoff:
+                    del self._status_cache[key]
+    
+    @staticmethod
+    def _channel_active(record: Optional[dict]) -> bool:
+        """Session is inactive if:
+        1. Status is closed/ended
+        2. Has end datetime
+        3. No operator assigned (agent left)
+        """
+        if not record:
+            return False
+        return (record.get('livechat_status') not in ['closed', 'ended']
+                and not record.get('livechat_end_dt')
+                and bool(record.get('livechat_operator_id')))
+    
+    def invalidate_session(self, session_id: int):
+        """Make the next status read of a session go to Odoo after we changed it.
+
+        The old record is kept (aged past status_ttl) as a liveness hint for
+        send_message_to_session: posting a message does not end a session.
+        """
+        self.status_stats["invalidations"] += 1
+        cached = self._status_cache.get(session_id)
+        if cached:
+            self._status_cache[session_id] = (cached[0] - self.status_ttl, cached[1])
+        self._status_inflight.pop(session_id, None)
+    
+    def status_cache_stats(self) -> Dict[str, Any]:
+        stats = dict(self.status_stats)
+        stats["reads_saved"] = stats["cache_hits"] + stats["coalesced"]
+        stats["entries"] = len(self._status_cache)
+        return stats
+    
+    async def get_session_messages(self, session_id: int, after_id: int = 0, limit: int = 100):
+        """Get agent messages newer than after_id from a live chat session, oldest first.
+
+        A SESSION_ENDED pseudo-message is appended once the session ended;
+        an agent leaving is reported by SessionWatcher and check_agent_status.
+        """
         try:
             # Check comprehensive session status
-            session_data = {
-                "jsonrpc": "2.0",
-                "method": "call",
-                "params": {
-                    "model": "discuss.channel",
-                    "method": "read",
-                    "args": [[session_id], [
-                        "livechat_status", 
-                        "livechat_end_dt", 
-                        "livechat_operator_id",
-                        "channel_member_ids",
-                        "is_member"
-                    ]],
-                    "kwargs": {}
-                },
-                "id": 6
-            }
-            
-            session_response = self.session.post(f"{self.url}/web/dataset/call_kw", json=session_data)
+            channel_data = await self._read_channel(session_id)
             session_ended = False
+            channel_found = channel_data is not None
+            operator_id = None
             
-            if session_response.status_code == 200:
-                session_result = session_response.json()
-                print(f"Session status check: {session_result}")
-                if session_result.get('result') and len(session_result['result']) > 0:
-                    channel_data = session_result['result'][0]
-                    status = channel_data.get('livechat_status')
-                    end_dt = channel_data.get('livechat_end_dt')
-                    operator_id = channel_data.get('livechat_operator_id')
-                    member_ids = channel_data.get('channel_member_ids', [])
-                    
-                    print(f"Session {session_id} - status: {status}, end_dt: {end_dt}, operator: {operator_id}, members: {len(member_ids)}")
-                    
-                    # Check multiple conditions for session end
-                    if (status in ['closed', 'ended'] or end_dt):
-                        session_ended = True
-                        print(f"Session {session_id} has ended - Reason: status={status}, end_dt={end_dt}")
+            if channel_found:
+                status = channel_data.get('livechat_status')
+                end_dt = channel_data.get('livechat_end_dt')
+                operator_id = channel_data.get('livechat_operator_id')
+                member_ids = channel_data.get('channel_member_ids', [])
+                
+                logger.debug("Session %s - status: %s, end_dt: %s, operator: %s, members: %d",
+                             session_id, status, end_dt, operator_id, len(member_ids))
+                
+                # Check multiple conditions for session end
+                if (status in ['closed', 'ended'] or end_dt):
+                    session_ended = True
+                    logger.debug("Session %s has ended - status=%s, end_dt=%s", session_id, status, end_dt)
             
             # Get messages
-            message_data = {
-                "jsonrpc": "2.0",
-                "method": "call",
-                "params": {
-                    "model": "mail.message",
-                    "method": "search_read",
-                    "args": [[["res_id", "=", session_id], ["model", "=", "discuss.channel"]], ["id", "body", "author_id", "date", "email_from"]],
-                    "kwargs": {
-                        "order": "date desc",
-                        "limit": 10
-                    }
-                },
-                "id": 5
-            }
+            result = await self._call_kw("mail.message", "search_read", [[
+                ["res_id", "=", session_id],
+                ["model", "=", "discuss.channel"],
+                ["id", ">", after_id]
+            ] + AGENT_MESSAGE_DOMAIN, ["id", "body", "author_id", "date"]], {
+                "order": "id asc",
+                "limit": limit
+            }, rpc_id=5)
             
-            response = self.session.post(f"{self.url}/web/dataset/call_kw", json=message_data)
-            
-            if response.status_code == 200:
-                result = response.json()
+            if 'result' in result:
+                # Visitor messages are already filtered out by the domain
+                messages = [self.format_agent_message(msg) for msg in result['result']]
+                
+                # Add session ended indicator if needed
+                if session_ended:
+                    messages.append({
+                        'id': 999999,
+                        'body': 'SESSION_ENDED',
+                        'author': 'System',
+                        'date': ''
+                    })
                 
-                if result.get('result'):
-                    messages = []
-                    for msg in result['result']:
-                        # Only return agent messages (messages with author_id)
-                        if msg.get('author_id') and msg['author_id'] != False:
-                            # Skip visitor messages (check if it's not from visitor email)
-                            if not (msg.get('email_from') and 'visitor@livechat.com' in msg['email_from']):
-                                # Strip HTML tags from body
-                                import re
-                                clean_body = re.sub(r'<[^>]+>', '', msg['body'])
-                                messages.append({
-                                    'id': msg['id'],
-                                    'body': clean_body,
-                                    'author': msg['author_id'][1] if isinstance(msg['author_id'], list) else 'Agent',
-                                    'date': msg['date']
-                                })
-                    
-                    # Add session ended indicator if needed
-                    if session_ended:
-                        print(f"Adding SESSION_ENDED message for session {session_id}")
-                        messages.append({
-                            'id': 999999,
-                            'body': 'SESSION_ENDED',
-                            'author': 'System',
-                            'date': ''
-                        })
-                    else:
-                        # Check if operator was removed (agent left)
-                        previous_operator = self.operator_states.get(session_id)
-                        current_operator = operator_id
-                        
-                        # Only check for disconnect if we have a previous state
-                        if previous_operator is not None:
-                            if previous_operator and not current_operator:
-                                print(f"Agent left session {session_id} - operator removed")
-                                messages.append({
-                                    'id': 999998,
-                                    'body': 'AGENT_DISCONNECTED',
-                                    'author': 'System',
-                                    'date': ''
-                                })
-                        
-                        # Update operator state
-                        self.operator_states[session_id] = current_operator
-                    
-                    return messages
+                return messages
             
             return []
-            
+        
+        except Overloaded:
+            raise
         except Exception as e:
-            print(f"Error getting messages: {e}")
+            logger.warning("Error getting messages: %s", e)
             return []
     
-    def is_session_active(self, session_id: int) -> bool:
+    async def is_session_active(self, session_id: int) -> bool:
         """Check if session is still active with comprehensive checks"""
         try:
-            # Re-authenticate if needed
-            if not self.uid:
-                if not self.authenticate():
-                    return False
-            
-            # Get comprehensive session data
-            session_data = {
-                "jsonrpc": "2.0",
-                "method": "call",
-                "params": {
-                    "model": "discuss.channel",
-                    "method": "read",
-                    "args": [[session_id], [
-                        "livechat_status", 
-                        "livechat_end_dt", 
-                        "livechat_operator_id",
-                        "channel_member_ids",
-                        "is_member"
-                    ]],
-                    "kwargs": {}
-                },
-                "id": 8
-            }
+            channel_data = await self._read_channel(session_id)
             
-            response = self.session.post(f"{self.url}/web/dataset/call_kw", json=session_data)
-            
-            if response.status_code == 200:
-                result = response.json()
+            if channel_data is not None:
+                status = channel_data.get('livechat_status')
+                end_dt = channel_data.get('livechat_end_dt')
+                operator_id = channel_data.get('livechat_operator_id')
+                member_ids = channel_data.get('channel_member_ids', [])
                 
-                # Check for session expired error
-                if result.get('error') and 'Session Expired' in str(result['error']):
-                    # Re-authenticate and try again
-                    if self.authenticate():
-                        response = self.session.post(f"{self.url}/web/dataset/call_kw", json=session_data)
-                        if response.status_code == 200:
-                            result = response.json()
+                logger.debug("Session %s active check - status: %s, end_dt: %s, operator: %s, members: %d",
+                             session_id, status, end_dt, operator_id, len(member_ids))
                 
-                if result.get('result') and len(result['result']) > 0:
-                    channel_data = result['result'][0]
-                    status = channel_data.get('livechat_status')
-                    end_dt = channel_data.get('livechat_end_dt')
-                    operator_id = channel_data.get('livechat_operator_id')
-                    member_ids = channel_data.get('channel_member_ids', [])
-                    
-                    print(f"Session {session_id} active check - status: {status}, end_dt: {end_dt}, operator: {operator_id}, members: {len(member_ids)}")
-                    
-                    # Session is inactive if:
-                    # 1. Status is closed/ended
-                    # 2. Has end datetime  
-                    # 3. No operator assigned (agent left)
-                    if (status in ['closed', 'ended'] or end_dt or not operator_id):
-                        print(f"Session {session_id} is INACTIVE - status={status}, end_dt={end_dt}, operator={operator_id}")
-                        return False
-                    
-                    print(f"Session {session_id} is ACTIVE")
-                    return True
+                return self._channel_active(channel_data)
             
-            print(f"Session {session_id} - Cannot determine status, assuming inactive")
+            logger.debug("Session %s - cannot determine status, assuming inactive", session_id)
             return False  # Be conservative - assume inactive if we can't check
-            
+        
+        except Overloaded:
+            raise
         except Exception as e:
-            print(f"Error checking session status: {e}")
+            logger.warning("Error checking session status: %s", e)
             return False  # Be conservative on error
     
-    def check_agent_status(self, session_id: int) -> dict:
+    async def check_agent_status(self, session_id: int) -> dict:
         """Check if agent is still in the session"""
         try:
-            if not self.uid:
-                if not self.authenticate():
-                    return {"active": False, "reason": "auth_failed"}
+            if not await self._ensure_session():
+                return {"active": False, "reason": "auth_failed"}
             
-            # Get session data to check operator
-            session_data = {
-                "jsonrpc": "2.0",
-                "method": "call",
-                "params": {
-                    "model": "discuss.channel",
-                    "method": "read",
-                    "args": [[session_id], ["livechat_operator_id", "livechat_status", "livechat_end_dt"]],
-                    "kwargs": {}
-                },
-                "id": 9
-            }
+            data = await self._read_channel(session_id)
             
-            response = self.session.post(f"{self.url}/web/dataset/call_kw", json=session_data)
-            
-            if response.status_code == 200:
-                result = response.json()
-                if result.get('result') and len(result['result']) > 0:
-                    data = result['result'][0]
-                    operator_id = data.get('livechat_operator_id')
-                    status = data.get('livechat_status')
-                    end_dt = data.get('livechat_end_dt')
-                    
-                    # Agent is active if operator assigned and session not ended
-                    agent_active = bool(operator_id) and status not in ['closed', 'ended'] and not end_dt
-                    
-                    return {
-                        "active": agent_active,
-                        "reason": "active" if agent_active else "agent_left",
-                        "operator_id": operator_id
-                    }
+            if data is not None:
+                operator_id = data.get('livechat_operator_id')
+                status = data.get('livechat_status')
+                end_dt = data.get('livechat_end_dt')
+                
+                # Agent is active if operator assigned and session not ended
+                agent_active = bool(operator_id) and status not in ['closed', 'ended'] and not end_dt
+                
+                return {
+                    "active": agent_active,
+                    "reason": "active" if agent_active else "agent_left",
+                    "operator_id": operator_id
+                }
             
             return {"active": False, "reason": "no_data"}
-            
+        
+        except Overloaded:
+            raise
         except Exception as e:
-            print(f"Error checking agent status: {e}")
+            logger.warning("Error checking agent status: %s", e)
             return {"active": False, "reason": "error"}
     
-    def store_feedback(self, session_id: int, rating: str, comment: str = "") -> bool:
+    async def read_sessions(self, session_ids: List[int]) -> Optional[Dict[int, dict]]:
+        """Read the live chat state of many sessions in one RPC.
+
+        Returns {session_id: record}; sessions missing from the result no
+        longer exist or are not readable. Returns None if the call failed.
+        """
+        try:
+            started = time.monotonic()
+            result = await self._call_kw("discuss.channel", "read", [list(session_ids), SESSION_STATUS_FIELDS], rpc_id=10)
+            
+            if 'result' in result:
+                records = {record['id']: record for record in result['result']}
+                # The batched read doubles as a refresh of the status cache
+                for session_id in session_ids:
+                    if session_id not in self._status_inflight:
+                        self._store_status(session_id, records.get(session_id), started)
+                return records
+            logger.warning("Batch session read failed: %s", result.get('error'))
+            return None
+        
+        except Exception as e:
+            logger.warning("Error reading sessions: %s", e)
+            return None
+    
+    async def search_session_messages(self, session_ids: List[int], after_id: int = 0,
+                                      new_session_ids: Optional[List[int]] = None,
+                                      limit: int = 500) -> Optional[List[dict]]:
+        """Fetch agent messages of many sessions in one RPC, oldest first.
+
+        Returns messages with id > after_id, plus the full history of
+        new_session_ids (sessions that have not been read yet). Returns None
+        if the call failed.
+        """
+        try:
+            domain = [["model", "=", "discuss.channel"], ["res_id", "in", list(session_ids)]] + AGENT_MESSAGE_DOMAIN
+            if new_session_ids:
+                domain += ["|", ["id", ">", after_id], ["res_id", "in", list(new_session_ids)]]
+            else:
+                domain.append(["id", ">", after_id])
+            
+            result = await self._call_kw("mail.message", "search_read",
+                                         [domain, ["id", "res_id", "body", "author_id", "date"]], {
+                "order": "id asc",
+                "limit": limit
+            }, rpc_id=11)
+            
+            if 'result' in result:
+                return result['result']
+            logger.warning("Batch message read failed: %s", result.get('error'))
+            return None
+        
+        except Exception as e:
+            logger.warning("Error reading session messages: %s", e)
+            return None
+    
+    async def store_feedback(self, session_id: int, rating: str, comment: str = "",
+                             message_id: Optional[str] = None) -> bool:
         """Store feedback for a chat session in Odoo"""
         try:
             # Add note to the channel with feedback
-            feedback_data = {
-                "jsonrpc": "2.0",
-                "method": "call",
-                "params": {
-                    "model": "discuss.channel",
-                    "method": "message_post",
-                    "args": [session_id],
-                    "kwargs": {
-                        "body": f"<p><strong>Customer Feedback:</strong> {rating.upper()}</p><p>{comment}</p>",
-                        "message_type": "comment",
-                        "subtype_xmlid": "mail.mt_note"
-                    }
-                },
-                "id": 9
+            kwargs = {
+                "body": f"<p><strong>Customer Feedback:</strong> {rating.upper()}</p><p>{comment}</p>",
+                "message_type": "comment",
+                "subtype_xmlid": "mail.mt_note"
             }
+            if message_id:
+                kwargs["message_id"] = message_id
+            result = await self._call_kw("discuss.channel", "message_post", [session_id], kwargs, rpc_id=9)
             
-            response = self.session.post(f"{self.url}/web/dataset/call_kw", json=feedback_data)
-            
-            if response.status_code == 200:
-                result = response.json()
-                if result.get('result'):
-                    print(f"✅ Feedback stored for session {session_id}: {rating}")
-                    return True
+            if result.get('result'):
+                logger.info("Feedback stored", extra={"session_id": session_id, "rating": rating})
+                self.invalidate_session(session_id)
+                return True
             
             return False
-            
+        
+        except Overloaded:
+            raise
         except Exception as e:
-            print(f"Error storing feedback: {e}")
-            return False
\ No newline at end of file
+            logger.warning("Error storing feedback: %s", e)
+            return False
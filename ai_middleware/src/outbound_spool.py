@@ -0,0 +1,272 @@
+from typing import Dict, Optional
+import asyncio
+import json
+import logging
+import random
+import sqlite3
+import time
+import uuid
+
+from .admission import Overloaded
+
+logger = logging.getLogger(__name__)
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS outbound (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    uid TEXT NOT NULL UNIQUE,
+    kind TEXT NOT NULL,
+    session_id INTEGER NOT NULL,
+    payload TEXT NOT NULL,
+    status TEXT NOT NULL DEFAULT 'pending',
+    attempts INTEGER NOT NULL DEFAULT 0,
+    next_attempt REAL NOT NULL,
+    created_at REAL NOT NULL,
+    sent_at REAL,
+    odoo_message_id INTEGER,
+    last_error TEXT
+);
+CREATE INDEX IF NOT EXISTS outbound_pending ON outbound (status, session_id, id);
+"""
+
+class OutboundSpool:
+    """Durable queue of visitor messages and feedback on their way to Odoo.
+
+    Writes go to a local SQLite file and return at once; a background
+    drainer posts them. Entries of one session are delivered strictly in
+    order, failed posts are retried with exponential backoff, and every post
+    carries a Message-ID derived from the entry so a retry first checks
+    whether the previous attempt reached Odoo after all.
+
+    Statuses: pending -> sent, or rejected (session no longer active) /
+    failed (max_attempts reached).
+
+    Calls run on the event loop, so a statement waits at most busy_timeout
+    seconds for another worker's write. Past that it gives up: enqueue
+    returns None (the caller delivers directly), status() / stats() return
+    None, and the drainer retries later.
+    """
+
+    # How long a claimed entry is hidden from other drainers while posting
+    CLAIM_TIMEOUT = 60.0
+
+    def __init__(self, odoo_client, path: str, max_attempts: int = 8,
+                 base_delay: float = 1.0, max_delay: float = 60.0,
+                 poll_interval: float = 1.0, batch_size: int = 20,
+                 retention: float = 86400.0, busy_timeout: float = 0.05):
+        self.odoo_client = odoo_client
+        self.path = path
+        self.max_attempts = max_attempts
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.poll_interval = poll_interval
+        self.batch_size = batch_size
+        self.retention = retention
+        # WAL keeps inserts cheap and lets several workers share the file
+        self._db = sqlite3.connect(path, isolation_level=None)
+        self._db.row_factory = sqlite3.Row
+        # Setup may wait for other workers starting at the same time
+        self._db.execute("PRAGMA busy_timeout=5000")
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute("PRAGMA synchronous=NORMAL")
+        self._db.executescript(SCHEMA)
+        self._db.execute(f"PRAGMA busy_timeout={int(busy_timeout * 1000)}")
+        self._wakeup = asyncio.Event()
+        self._task: Optional[asyncio.Task] = None
+        self._last_purge = 0.0
+        self.counts = {"queued": 0, "sent": 0, "retried": 0, "deduplicated": 0, "rejected": 0, "failed": 0, "busy": 0}
+
+    def _execute(self, sql: str, params: tuple = ()) -> Optional[sqlite3.Cursor]:
+        """Run one statement; None if the file stayed locked past busy_timeout"""
+        try:
+            return self._db.execute(sql, params)
+        except sqlite3.OperationalError as e:
+            if "locked" not in str(e):
+                raise
+            self.counts["busy"] += 1
+            logger.debug("Outbound spool busy: %s", e)
+            return None
+
+    @staticmethod
+    def odoo_message_id(uid: str) -> str:
+        """Message-ID stored on the mail.message posted for an entry"""
+        return f"<spool-{uid}@ai-middleware>"
+
+    def enqueue_message(self, session_id: int, body: str, author_name: str) -> Optional[str]:
+        return self._enqueue("message", session_id, {"body": body, "author_name": author_name})
+
+    def enqueue_feedback(self, session_id: int, rating: str, comment: str = "") -> Optional[str]:
+        return self._enqueue("feedback", session_id, {"rating": rating, "comment": comment})
+
+    def _enqueue(self, kind: str, session_id: int, payload: dict) -> Optional[str]:
+        """Spool an entry; returns its uid, or None if the file is locked"""
+        uid = uuid.uuid4().hex
+        now = time.time()
+        cursor = self._execute(
+            "INSERT INTO outbound (uid, kind, session_id, payload, next_attempt, created_at) VALUES (?, ?, ?, ?, ?, ?)",
+            (uid, kind, session_id, json.dumps(payload), now, now)
+        )
+        if cursor is None:
+            return None
+        self.counts["queued"] += 1
+        self._wakeup.set()
+        return uid
+
+    def status(self, uid: str) -> Optional[dict]:
+        cursor = self._execute(
+            "SELECT uid, kind, session_id, status, attempts, created_at, sent_at, odoo_message_id, last_error "
+            "FROM outbound WHERE uid = ?", (uid,)
+        )
+        row = cursor.fetchone() if cursor is not None else None
+        return dict(row) if row else None
+
+    def start(self):
+        if self._task is None:
+            self._task = asyncio.create_task(self.run())
+
+    async def close(self):
+        if self._task:
+            self._task.cancel()
+            self._task = None
+        self._db.close()
+
+    async def run(self):
+        while True:
+            try:
+                delivered = await self.drain_once()
+                self._purge()
+            except Exception as e:
+                logger.exception("Outbound spool error: %s", e)
+                delivered = 0
+            if delivered:
+                continue
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), timeout=self._idle_time())
+            except asyncio.TimeoutError:
+                pass
+            self._wakeup.clear()
+
+    def _idle_time(self) -> float:
+        """Sleep until the next retry is due, but at most poll_interval"""
+        cursor = self._execute("SELECT MIN(next_attempt) FROM outbound WHERE status = 'pending'")
+        due = cursor.fetchone()[0] if cursor is not None else None
+        if due is None:
+            return self.poll_interval
+        return min(self.poll_interval, max(0.01, due - time.time()))
+
+    async def drain_once(self) -> int:
+        """Attempt the oldest due entry of each session; returns entries attempted"""
+        now = time.time()
+        cursor = self._execute(
+            "SELECT * FROM outbound WHERE id IN ("
+            "  SELECT MIN(id) FROM outbound WHERE status = 'pending' GROUP BY session_id"
+            ") AND next_attempt <= ? ORDER BY id LIMIT ?",
+            (now, self.batch_size)
+        )
+        rows = cursor.fetchall() if cursor is not None else []
+        claimed = [row for row in rows if self._claim(row, now)]
+        await asyncio.gather(*[self._deliver(row) for row in claimed])
+        return len(claimed)
+
+    def _claim(self, row: sqlite3.Row, now: float) -> bool:
+        """Take an entry for one attempt; False if another drainer got it first.
+
+        attempts is bumped before posting, so after a crash the retry knows
+        to look for an earlier post.
+        """
+        cursor = self._execute(
+            "UPDATE outbound SET attempts = attempts + 1, next_attempt = ? "
+            "WHERE id = ? AND status = 'pending' AND next_attempt = ?",
+            (now + self.CLAIM_TIMEOUT, row['id'], row['next_attempt'])
+        )
+        return cursor is not None and cursor.rowcount == 1
+
+    async def _deliver(self, row: sqlite3.Row):
+        try:
+            await self._attempt(row)
+        except Overloaded:
+            self._retry(row, "Odoo overloaded")
+
+    async def _attempt(self, row: sqlite3.Row):
+        uid = row['uid']
+        message_id = self.odoo_message_id(uid)
+        payload = json.loads(row['payload'])
+
+        if row['attempts'] > 0:
+            # An earlier attempt may have been posted before we lost the reply
+            existing = await self.odoo_client.find_message(message_id)
+            if existing is None:
+                self._retry(row, "Odoo unreachable (lookup)")
+                return
+            if existing:
+                self.counts["deduplicated"] += 1
+                self._finish(row, "sent", odoo_message_id=existing)
+                return
+
+        if row['kind'] == "message":
+            result = await self.odoo_client.send_message_to_session(
+                row['session_id'], payload['body'], payload['author_name'], message_id=message_id
+            )
+        else:
+            result = await self.odoo_client.store_feedback(
+                row['session_id'], payload['rating'], payload['comment'], message_id=message_id
+            ) or None
+
+        if result:
+            self._finish(row, "sent")
+        elif result is False:
+            self._finish(row, "rejected", error="Session is no longer active")
+        else:
+            self._retry(row, "Odoo unreachable")
+
+    def _retry(self, row: sqlite3.Row, error: str):
+        attempts = row['attempts'] + 1
+        if attempts >= self.max_attempts:
+            self._finish(row, "failed", error=error)
+            return
+        delay = min(self.max_delay, self.base_delay * 2 ** (attempts - 1))
+        delay *= random.uniform(0.5, 1.0)  # jitter spreads retries after an outage
+        # If the file is locked the entry stays claimed and is retried after
+        # CLAIM_TIMEOUT instead
+        if self._execute(
+            "UPDATE outbound SET next_attempt = ?, last_error = ? WHERE id = ?",
+            (time.time() + delay, error, row['id'])
+        ) is not None:
+            self.counts["retried"] += 1
+
+    def _finish(self, row: sqlite3.Row, status: str, odoo_message_id: Optional[int] = None,
+                error: Optional[str] = None):
+        # If the file is locked the entry is attempted again after
+        # CLAIM_TIMEOUT; a post that went through is then found by Message-ID
+        if self._execute(
+            "UPDATE outbound SET status = ?, sent_at = ?, odoo_message_id = ?, last_error = ? WHERE id = ?",
+            (status, time.time() if status == "sent" else None, odoo_message_id, error, row['id'])
+        ) is not None:
+            self.counts[status] += 1
+
+    def _purge(self):
+        """Delete finished entries older than retention, at most once a minute"""
+        now = time.time()
+        if now - self._last_purge < 60:
+            return
+        self._last_purge = now
+        self._execute("DELETE FROM outbound WHERE status != 'pending' AND created_at < ?",
+                      (now - self.retention,))
+
+    def pending(self) -> Optional[int]:
+        """Entries not delivered yet; None if the file is locked"""
+        cursor = self._execute("SELECT COUNT(*) FROM outbound WHERE status = 'pending'")
+        return cursor.fetchone()[0] if cursor is not None else None
+
+    def stats(self) -> Optional[Dict[str, object]]:
+        """Counters and entries by status; None if the file is locked"""
+        by_status = self._execute("SELECT status, COUNT(*) AS n FROM outbound GROUP BY status")
+        oldest = self._execute("SELECT MIN(created_at) FROM outbound WHERE status = 'pending'")
+        if by_status is None or oldest is None:
+            return None
+        oldest = oldest.fetchone()[0]
+        return {
+            **self.counts,
+            "entries": {row['status']: row['n'] for row in by_status.fetchall()},
+            "oldest_pending_age": time.time() - oldest if oldest else 0.0
+        }
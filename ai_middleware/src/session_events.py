@@ -0,0 +1,48 @@
+from typing import Dict, List, Set
+import asyncio
+import logging
+
+logger = logging.getLogger(__name__)
+
+class SessionEventHub:
+    """Fans session events out to push subscribers (open widget tabs).
+
+    Events are dicts {'type': 'message' | 'session_ended' |
+    'agent_disconnected', 'data': {...}} published by SessionWatcher; each
+    subscriber gets its own bounded queue.
+    """
+
+    def __init__(self, queue_size: int = 100):
+        self.queue_size = queue_size
+        self._subscribers: Dict[int, Set[asyncio.Queue]] = {}
+
+    def subscribe(self, session_id: int, backlog: List[dict] = ()) -> asyncio.Queue:
+        """Register a subscriber; backlog events are queued first"""
+        queue: asyncio.Queue = asyncio.Queue(maxsize=self.queue_size)
+        for event in list(backlog)[-self.queue_size:]:
+            queue.put_nowait(event)
+        self._subscribers.setdefault(session_id, set()).add(queue)
+        return queue
+
+    def unsubscribe(self, session_id: int, queue: asyncio.Queue):
+        subscribers = self._subscribers.get(session_id)
+        if subscribers is None:
+            return
+        subscribers.discard(queue)
+        if not subscribers:
+            del self._subscribers[session_id]
+
+    def has_subscribers(self, session_id: int) -> bool:
+        return session_id in self._subscribers
+
+    def subscriber_count(self) -> int:
+        return sum(len(queues) for queues in self._subscribers.values())
+
+    def publish(self, session_id: int, events: List[dict]):
+        for event in events:
+            for queue in self._subscribers.get(session_id, ()):
+                try:
+                    queue.put_nowait(event)
+                except asyncio.QueueFull:
+                    # A stalled client; it can resume from its last id on reconnect
+                    logger.warning("Dropping event for slow subscriber on session %s", session_id)
\ No newline at end of file
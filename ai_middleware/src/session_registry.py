@@ -0,0 +1,158 @@
+from collections import OrderedDict
+from typing import Callable, Dict, Iterator, List, Optional
+import time
+
+class SessionRecord:
+    """What the middleware remembers about one live chat session"""
+
+    __slots__ = ("session_id", "last_activity", "operator_id", "last_message_id", "ended", "ended_at")
+
+    def __init__(self, session_id: int):
+        self.session_id = session_id
+        self.last_activity = time.monotonic()
+        self.operator_id = None
+        self.last_message_id = 0
+        self.ended = False
+        self.ended_at: Optional[float] = None
+
+class TimingWheel:
+    """Hashed timing wheel of expiry deadlines.
+
+    A key lands in the slot of its deadline tick; advance() only visits the
+    slots of the ticks that passed, so expiry work does not grow with the
+    number of keys scheduled further out. Deadlines more than one rotation
+    ahead stay in their slot until their round comes.
+    """
+
+    def __init__(self, tick: float = 1.0, slots: int = 512):
+        self.tick = tick
+        self._slots: List[Dict[int, int]] = [{} for _ in range(slots)]  # key -> deadline tick
+        self._current = int(time.monotonic() / tick)
+
+    def schedule(self, key: int, deadline: float) -> int:
+        """Schedule key at a monotonic deadline; returns its tick for cancel()"""
+        at = max(int(deadline / self.tick) + 1, self._current + 1)
+        self._slots[at % len(self._slots)][key] = at
+        return at
+
+    def cancel(self, key: int, at: int):
+        self._slots[at % len(self._slots)].pop(key, None)
+
+    def advance(self, now: float) -> List[int]:
+        """Keys whose deadline tick has passed, removed from the wheel"""
+        target = int(now / self.tick)
+        expired = []
+        # After a long stall every slot is due once
+        for at in range(max(self._current + 1, target - len(self._slots) + 1), target + 1):
+            slot = self._slots[at % len(self._slots)]
+            due = [key for key, deadline in slot.items() if deadline <= target]
+            for key in due:
+                del slot[key]
+            expired.extend(due)
+        self._current = max(self._current, target)
+        return expired
+
+    def __len__(self) -> int:
+        return sum(len(slot) for slot in self._slots)
+
+class SessionRegistry:
+    """Bounded map of session records with wheel-driven expiry.
+
+    A record expires idle_timeout seconds after its last activity, or
+    ended_ttl seconds after the session ended (or was last asked about, if
+    later). touch() only updates last_activity; a record found still in use
+    when its slot comes up is rescheduled, so activity costs no wheel work.
+    Records are kept in activity order, so beyond max_sessions the least
+    recently active one is evicted in O(1).
+    """
+
+    def __init__(self, idle_timeout: float = 120.0, ended_ttl: float = 30.0,
+                 max_sessions: int = 10000, tick: float = 1.0):
+        self.idle_timeout = idle_timeout
+        self.ended_ttl = ended_ttl
+        self.max_sessions = max_sessions
+        self.wheel = TimingWheel(tick, slots=max(64, int(max(idle_timeout, ended_ttl) / tick) + 2))
+        self.records: "OrderedDict[int, SessionRecord]" = OrderedDict()  # least recently active first
+        self._ticks: Dict[int, int] = {}  # session_id -> scheduled wheel tick
+        self.counts = {"added": 0, "expired_idle": 0, "expired_ended": 0, "evicted": 0}
+
+    def __len__(self) -> int:
+        return len(self.records)
+
+    def __contains__(self, session_id: int) -> bool:
+        return session_id in self.records
+
+    def __iter__(self) -> Iterator[SessionRecord]:
+        return iter(self.records.values())
+
+    def __getitem__(self, session_id: int) -> SessionRecord:
+        return self.records[session_id]
+
+    def get(self, session_id: int) -> Optional[SessionRecord]:
+        return self.records.get(session_id)
+
+    def add(self, record: SessionRecord) -> List[SessionRecord]:
+        """Register a record; returns the records evicted to make room"""
+        evicted = []
+        while self.records and len(self.records) >= self.max_sessions:
+            oldest = self.records[next(iter(self.records))]
+            self._remove(oldest.session_id)
+            self.counts["evicted"] += 1
+            evicted.append(oldest)
+        self.records[record.session_id] = record
+        self._schedule(record)
+        self.counts["added"] += 1
+        return evicted
+
+    def touch(self, record: SessionRecord):
+        record.last_activity = time.monotonic()
+        if record.session_id in self.records:
+            self.records.move_to_end(record.session_id)
+
+    def mark_ended(self, record: SessionRecord):
+        """Expire an ended session after ended_ttl instead of idle_timeout"""
+        if record.ended_at is None:
+            record.ended = True
+            record.ended_at = time.monotonic()
+            self._schedule(record)
+
+    def _deadline(self, record: SessionRecord) -> float:
+        if record.ended_at is not None:
+            return max(record.ended_at, record.last_activity) + self.ended_ttl
+        return record.last_activity + self.idle_timeout
+
+    def _schedule(self, record: SessionRecord, deadline: Optional[float] = None):
+        at = self._ticks.get(record.session_id)
+        if at is not None:
+            self.wheel.cancel(record.session_id, at)
+        self._ticks[record.session_id] = self.wheel.schedule(record.session_id, deadline or self._deadline(record))
+
+    def _remove(self, session_id: int):
+        del self.records[session_id]
+        at = self._ticks.pop(session_id, None)
+        if at is not None:
+            self.wheel.cancel(session_id, at)
+
+    def expire(self, keep: Optional[Callable[[int], bool]] = None) -> List[SessionRecord]:
+        """Remove and return records past their deadline. Records for which
+        keep(session_id) is true get another idle_timeout instead."""
+        now = time.monotonic()
+        expired = []
+        for session_id in self.wheel.advance(now):
+            self._ticks.pop(session_id, None)
+            record = self.records.get(session_id)
+            if record is None:
+                continue
+            deadline = self._deadline(record)
+            if deadline > now:
+                self._schedule(record, deadline)
+            elif keep is not None and keep(session_id):
+                self._schedule(record, now + self.idle_timeout)
+            else:
+                del self.records[session_id]
+                self.counts["expired_ended" if record.ended else "expired_idle"] += 1
+                expired.append(record)
+        return expired
+
+    def stats(self) -> Dict[str, int]:
+        return {"tracked": len(self.records), "max_sessions": self.max_sessions, **self.counts}
@@ -1,20 +1,42 @@
 class SessionTracker:
-    def __init__(self):
-        self.session_states = {}  # session_id -> {operator_id, last_check}
-    
+    """Last known operator of each live chat session, kept in the state
+    store so that a worker picking up a session after its agent left still
+    reports the disconnect"""
+
+    def __init__(self, store, ttl: float = 86400.0):
+        self.store = store
+        self.ttl = ttl
+
     def track_operator_change(self, session_id: int, current_operator_id) -> bool:
-        """Returns True if operator was removed (agent left)"""
-        previous_state = self.session_states.get(session_id, {})
-        previous_operator = previous_state.get('operator_id')
-        
+        """Returns True if operator was removed (agent left).
+
+        Stays True until an operator is assigned again, so every worker
+        polling the session sees it, not only the first one.
+        """
+        key = f"operator:{session_id}"
+        previous_state = self.store.get(key) or {}
+        agent_left = not current_operator_id and bool(
+            previous_state.get('operator_id') or previous_state.get('agent_left'))
+
         # Update current state
-        self.session_states[session_id] = {
-            'operator_id': current_operator_id,
-            'last_check': True
-        }
-        
-        # Detect if operator was removed
-        if previous_operator and not current_operator_id:
-            return True  # Agent left
-        
-        return False
\ No newline at end of file
+        state = {'operator_id': current_operator_id, 'agent_left': agent_left}
+        if agent_left and previous_state.get('notified'):
+            state['notified'] = True
+        if state != previous_state:
+            self.store.set(key, state, self.ttl)
+
+        return agent_left
+
+    def claim_disconnect_notice(self, session_id: int) -> bool:
+        """True once per departure of the agent: the first caller after the
+        agent left gets to report it, until an operator is assigned again"""
+        key = f"operator:{session_id}"
+        state = self.store.get(key) or {}
+        if not state.get('agent_left') or state.get('notified'):
+            return False
+        self.store.set(key, {**state, 'notified': True}, self.ttl)
+        return True
+
+    def forget(self, session_id: int):
+        """Drop the state of a session that ended"""
+        self.store.delete(f"operator:{session_id}")
@@ -0,0 +1,344 @@
+from collections import deque
+from typing import Deque, Dict, List, Optional
+import asyncio
+import logging
+import time
+
+from .session_events import SessionEventHub
+from .session_registry import SessionRecord, SessionRegistry
+from .session_tracker import SessionTracker
+from .state_store import MemoryStore, StateStore, worker_id
+
+logger = logging.getLogger(__name__)
+
+class SessionState(SessionRecord):
+    """Last known Odoo state of one live chat session"""
+
+    __slots__ = ("status", "end_dt", "member_count", "agent_disconnected", "messages", "ready",
+                 "activity_published")
+
+    # Fields shared with other workers through the state store
+    SHARED = ("status", "end_dt", "operator_id", "member_count", "ended", "agent_disconnected")
+
+    def __init__(self, session_id: int, history_size: int):
+        super().__init__(session_id)
+        self.status = None
+        self.end_dt = None
+        self.member_count = 0
+        self.agent_disconnected = False
+        self.messages: Deque[dict] = deque(maxlen=history_size)
+        self.ready = asyncio.Event()  # set after the first poll covering this session
+        self.activity_published = 0.0  # when last_activity was last written to the store
+
+    @property
+    def active(self) -> bool:
+        return not self.ended and bool(self.operator_id)
+
+    @property
+    def reason(self) -> str:
+        if self.ended:
+            return "session_closed"
+        if not self.operator_id:
+            return "agent_left"
+        return "active"
+
+    def fields(self) -> tuple:
+        return tuple(getattr(self, name) for name in self.SHARED)
+
+    def snapshot(self) -> dict:
+        return {**dict(zip(self.SHARED, self.fields())), "messages": list(self.messages)}
+
+class SessionWatcher:
+    """Background poller for every active live chat session.
+
+    Each tick issues one batched discuss.channel read and one batched
+    mail.message search_read for all tracked sessions, then updates the
+    per-session state the endpoints read and publishes changes to the event
+    hub. Odoo load therefore depends on the interval, not on how many
+    visitors poll or how often.
+
+    With several workers sharing a state store, each session is polled by
+    the worker holding its lease ("watch:<id>"), which writes a snapshot
+    ("session:<id>") that the other workers follow instead of asking Odoo.
+
+    Sessions live in a bounded SessionRegistry: they are forgotten
+    idle_timeout seconds after anyone last asked about them, ended_ttl
+    seconds after they ended, or when max_sessions are tracked. With
+    close_abandoned, an open session whose visitor went away (no request on
+    any worker for idle_timeout) is also closed in Odoo by its lease holder.
+    """
+
+    def __init__(self, odoo_client, hub: SessionEventHub, interval: float = 2.0,
+                 min_interval: float = 0.25, idle_timeout: float = 120.0,
+                 history_size: int = 50, batch_limit: int = 500,
+                 store: Optional[StateStore] = None, ended_ttl: float = 30.0,
+                 max_sessions: int = 10000, close_abandoned: bool = False):
+        self.odoo_client = odoo_client
+        self.hub = hub
+        self.interval = interval
+        self.min_interval = min_interval
+        self.idle_timeout = idle_timeout
+        self.history_size = history_size
+        self.batch_limit = batch_limit
+        self.sessions = SessionRegistry(idle_timeout, ended_ttl, max_sessions)
+        self.close_abandoned = close_abandoned
+        self.closed_abandoned = 0
+        self._active = set()  # sessions still polled (not ended)
+        self._high_water = 0  # highest mail.message id seen
+        self._wakeup = asyncio.Event()
+        self._task: Optional[asyncio.Task] = None
+        self.polls = 0
+        self.store = store or MemoryStore()
+        self.tracker = SessionTracker(self.store)
+        self.worker_id = worker_id()
+        # A lease outlives a few missed polls, so only a dead worker loses it
+        self.lease = max(3 * interval, 10.0)
+        self.snapshot_ttl = max(2 * idle_timeout, 600.0)
+        self._owned = set()  # sessions this worker polled last tick
+        self._published: Dict[int, float] = {}  # session_id -> when its snapshot was written
+
+    def track(self, session_id: int) -> SessionState:
+        """Start watching a session (idempotent) and mark it as in use"""
+        state = self.sessions.get(session_id)
+        if state is None:
+            state = SessionState(session_id, self.history_size)
+            for evicted in self.sessions.add(state):
+                self._forget(evicted)
+            self._active.add(session_id)
+            # Poll soon so the first request for it doesn't wait a full interval
+            self._wakeup.set()
+        self.sessions.touch(state)
+        if self.close_abandoned and state.last_activity - state.activity_published >= self.idle_timeout / 4:
+            # Lets the lease holder tell an abandoned session from one
+            # whose visitor polls another worker
+            state.activity_published = state.last_activity
+            self.store.set(f"active:{session_id}", time.time(), 2 * self.idle_timeout)
+        return state
+
+    async def get_state(self, session_id: int, timeout: float = 10.0) -> SessionState:
+        """State of a session, waiting for its first poll if needed"""
+        state = self.track(session_id)
+        if not state.ready.is_set():
+            try:
+                await asyncio.wait_for(state.ready.wait(), timeout)
+            except asyncio.TimeoutError:
+                pass
+        return state
+
+    def start(self):
+        if self._task is None:
+            self._task = asyncio.create_task(self.run())
+
+    async def close(self):
+        if self._task:
+            self._task.cancel()
+            self._task = None
+        # Let another worker take over our sessions right away
+        for session_id in self._owned:
+            self.store.release(f"watch:{session_id}", self.worker_id)
+        self._owned = set()
+
+    async def run(self):
+        while True:
+            started = time.monotonic()
+            try:
+                await self.poll_once()
+            except Exception as e:
+                logger.warning("Session watcher error: %s", e)
+            abandoned = self._expire()
+            if abandoned:
+                await self._close_abandoned(abandoned)
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), timeout=self.interval)
+            except asyncio.TimeoutError:
+                pass
+            self._wakeup.clear()
+            # Coalesce bursts of newly tracked sessions into one poll
+            elapsed = time.monotonic() - started
+            if elapsed < self.min_interval:
+                await asyncio.sleep(self.min_interval - elapsed)
+
+    async def poll_once(self):
+        ids = sorted(self._active)
+        if not ids:
+            return
+        if self.store.shared:
+            owned = [i for i in ids if self.store.claim(f"watch:{i}", self.worker_id, self.lease)]
+        else:
+            owned = ids
+        events: Dict[int, List[dict]] = {}
+
+        # Sessions leased by another worker follow its snapshot
+        owned_set = set(owned)
+        for session_id in ids:
+            if session_id not in owned_set:
+                self._apply_snapshot(session_id, self.store.get(f"session:{session_id}"), events)
+
+        if owned:
+            await self._poll_owned(owned, events)
+        # Sessions evicted while the poll was in flight are no longer ours
+        self._owned = {i for i in owned_set if i in self.sessions}
+
+        for session_id, session_events in events.items():
+            self.hub.publish(session_id, session_events)
+
+    async def _poll_owned(self, ids: List[int], events: Dict[int, List[dict]]):
+        # Sessions just taken over from another worker get their full history
+        new_ids = [i for i in ids if not self.sessions[i].ready.is_set() or i not in self._owned]
+        before = {i: (self.sessions[i].fields(), self.sessions[i].ready.is_set()) for i in ids}
+
+        channels, rows = await asyncio.gather(
+            self.odoo_client.read_sessions(ids),
+            self.odoo_client.search_session_messages(ids, self._high_water, new_ids, self.batch_limit)
+        )
+        self.polls += 1
+
+        if rows is not None:
+            if len(rows) >= self.batch_limit:
+                # More rows pending above the new high-water mark; fetch them next
+                self._wakeup.set()
+            for row in rows:
+                self._high_water = max(self._high_water, row['id'])
+                state = self.sessions.get(row['res_id'])
+                if state is None or row['id'] <= state.last_message_id:
+                    continue
+                state.last_message_id = row['id']
+                msg = self.odoo_client.format_agent_message(row)
+                state.messages.append(msg)
+                events.setdefault(row['res_id'], []).append({'type': 'message', 'data': msg})
+
+        if channels is not None:
+            for session_id in ids:
+                # track() may have evicted it while the RPCs were in flight
+                state = self.sessions.get(session_id)
+                if state is None:
+                    continue
+                record = channels.get(session_id)
+                if record is None:
+                    # Deleted or no longer readable: treat as ended
+                    state.ended = True
+                else:
+                    state.status = record.get('livechat_status')
+                    state.end_dt = record.get('livechat_end_dt')
+                    state.operator_id = record.get('livechat_operator_id')
+                    state.member_count = len(record.get('channel_member_ids') or [])
+                    state.ended = state.status in ['closed', 'ended'] or bool(state.end_dt)
+                    agent_left = self.tracker.track_operator_change(session_id, state.operator_id)
+                    if agent_left and not state.ended and not state.agent_disconnected:
+                        logger.info("Agent left session", extra={"session_id": session_id})
+                        state.agent_disconnected = True
+                        events.setdefault(session_id, []).append({'type': 'agent_disconnected', 'data': {}})
+                    elif not agent_left and state.agent_disconnected:
+                        logger.info("Operator reassigned to session", extra={"session_id": session_id})
+                        state.agent_disconnected = False
+
+                if state.ended:
+                    self.sessions.mark_ended(state)
+                    logger.info("Session ended", extra={"session_id": session_id, "status": state.status})
+                    self._active.discard(session_id)
+                    events.setdefault(session_id, []).append({'type': 'session_ended', 'data': {}})
+                # Only mark ready once messages for it were fetched too
+                if rows is not None:
+                    state.ready.set()
+
+        if not self.store.shared:
+            return
+        now = time.time()
+        for session_id in ids:
+            state = self.sessions.get(session_id)
+            if state is None or not state.ready.is_set():
+                continue
+            changed = session_id in events or before[session_id] != (state.fields(), True)
+            # Rewritten before it expires even if nothing changed
+            if changed or now - self._published.get(session_id, 0.0) > self.snapshot_ttl / 2:
+                self.store.set(f"session:{session_id}", state.snapshot(), self.snapshot_ttl)
+                self._published[session_id] = now
+
+    def _apply_snapshot(self, session_id: int, snapshot: Optional[dict], events: Dict[int, List[dict]]):
+        """Bring a session polled by another worker up to date with its snapshot"""
+        if snapshot is None:
+            return  # not polled yet
+        state = self.sessions[session_id]
+        for msg in snapshot['messages']:
+            if msg['id'] > state.last_message_id:
+                state.last_message_id = msg['id']
+                state.messages.append(msg)
+                events.setdefault(session_id, []).append({'type': 'message', 'data': msg})
+        if snapshot['agent_disconnected'] and not state.agent_disconnected and not snapshot['ended']:
+            events.setdefault(session_id, []).append({'type': 'agent_disconnected', 'data': {}})
+        if snapshot['ended'] and not state.ended:
+            self._active.discard(session_id)
+            events.setdefault(session_id, []).append({'type': 'session_ended', 'data': {}})
+        for name in SessionState.SHARED:
+            setattr(state, name, snapshot[name])
+        if state.ended:
+            self.sessions.mark_ended(state)
+        state.ready.set()
+
+    def _expire(self) -> List[int]:
+        """Forget idle and ended sessions whose time is up; returns the
+        abandoned ones to close in Odoo"""
+        abandoned = []
+        for state in self.sessions.expire(keep=self.hub.has_subscribers):
+            if self.close_abandoned and not state.ended and state.session_id in self._owned:
+                abandoned.append(state.session_id)
+            self._forget(state)
+        return abandoned
+
+    def _forget(self, state: SessionState):
+        session_id = state.session_id
+        self._active.discard(session_id)
+        self._published.pop(session_id, None)
+        self._owned.discard(session_id)
+        if self.store.shared:
+            self.store.release(f"watch:{session_id}", self.worker_id)
+        if state.ended:
+            # Nothing left to share about it
+            self.tracker.forget(session_id)
+            self.store.delete(f"session:{session_id}")
+            self.store.delete(f"active:{session_id}")
+
+    async def _close_abandoned(self, session_ids: List[int]):
+        cutoff = time.time() - self.idle_timeout
+        for session_id in session_ids:
+            seen = self.store.get(f"active:{session_id}")
+            if seen is not None and seen > cutoff:
+                continue  # still in use through another worker
+            if await self.odoo_client.close_session(session_id):
+                logger.info("Closed abandoned session", extra={"session_id": session_id})
+                self.closed_abandoned += 1
+                self.store.delete(f"active:{session_id}")
+                self.tracker.forget(session_id)
+
+    def stats(self) -> dict:
+        return {
+            **self.sessions.stats(),
+            "active": sum(1 for state in self.sessions if state.active),
+            "polled": len(self._active),
+            "owned": len(self._owned),
+            "closed_abandoned": self.closed_abandoned,
+            "polls": self.polls
+        }
+
+    def backlog(self, session_id: int, after_id: int = 0) -> List[dict]:
+        """Events a new subscriber should see first"""
+        state = self.sessions.get(session_id)
+        if state is None:
+            return []
+        events = [{'type': 'message', 'data': msg} for msg in state.messages if msg['id'] > after_id]
+        if state.ended:
+            events.append({'type': 'session_ended', 'data': {}})
+        elif state.agent_disconnected:
+            events.append({'type': 'agent_disconnected', 'data': {}})
+        return events
+
+    def legacy_messages(self, state: SessionState, after_id: int = 0) -> List[dict]:
+        """Messages newer than after_id in the /messages response format, with
+        a SESSION_ENDED pseudo-message appended while the session is ended,
+        and AGENT_DISCONNECTED in the first response after the agent left"""
+        messages = [msg for msg in state.messages if msg['id'] > after_id]
+        if state.ended:
+            messages.append({'id': 999999, 'body': 'SESSION_ENDED', 'author': 'System', 'date': ''})
+        elif state.agent_disconnected and self.tracker.claim_disconnect_notice(state.session_id):
+            messages.append({'id': 999998, 'body': 'AGENT_DISCONNECTED', 'author': 'System', 'date': ''})
+        return messages
\ No newline at end of file
@@ -0,0 +1,205 @@
+from abc import ABC, abstractmethod
+from typing import Any, Dict, Optional, Tuple
+import json
+import logging
+import os
+import socket
+import sqlite3
+import time
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS state (
+    key TEXT PRIMARY KEY,
+    value TEXT NOT NULL,
+    expires_at REAL
+);
+CREATE INDEX IF NOT EXISTS state_expiry ON state (expires_at);
+"""
+
+logger = logging.getLogger(__name__)
+
+def worker_id() -> str:
+    """Identifies this process to other workers sharing a store"""
+    return f"{socket.gethostname()}:{os.getpid()}"
+
+class StateStore(ABC):
+    """Key/value state shared by the workers serving the widget.
+
+    Values must be JSON-serializable and are treated as read-only by
+    callers. Expiry is on the wall clock (time.time()), which every worker
+    on a host agrees on. claim() is an atomic lease: the key is taken if it
+    is free, expired or already held by owner.
+
+    shared is False for stores only this process can see.
+    """
+
+    shared = False
+
+    @abstractmethod
+    def get(self, key: str) -> Optional[Any]:
+        pass
+
+    @abstractmethod
+    def set(self, key: str, value: Any, ttl: Optional[float] = None):
+        pass
+
+    @abstractmethod
+    def delete(self, key: str):
+        pass
+
+    @abstractmethod
+    def claim(self, key: str, owner: str, ttl: float) -> bool:
+        pass
+
+    @abstractmethod
+    def release(self, key: str, owner: str):
+        """Drop a lease if owner still holds it"""
+
+    def close(self):
+        pass
+
+    @abstractmethod
+    def stats(self) -> Dict[str, Any]:
+        pass
+
+class MemoryStore(StateStore):
+    """Process-local store: the default for a single worker"""
+
+    PURGE_INTERVAL = 60.0
+
+    def __init__(self):
+        self._data: Dict[str, Tuple[Optional[float], Any]] = {}  # key -> (expires_at, value)
+        self._last_purge = time.time()
+
+    def get(self, key: str) -> Optional[Any]:
+        entry = self._data.get(key)
+        if entry is None:
+            return None
+        if entry[0] is not None and entry[0] <= time.time():
+            del self._data[key]
+            return None
+        return entry[1]
+
+    def set(self, key: str, value: Any, ttl: Optional[float] = None):
+        now = time.time()
+        self._data[key] = (now + ttl if ttl is not None else None, value)
+        self._purge(now)
+
+    def delete(self, key: str):
+        self._data.pop(key, None)
+
+    def claim(self, key: str, owner: str, ttl: float) -> bool:
+        current = self.get(key)
+        if current is not None and current != owner:
+            return False
+        self.set(key, owner, ttl)
+        return True
+
+    def release(self, key: str, owner: str):
+        if self.get(key) == owner:
+            del self._data[key]
+
+    def _purge(self, now: float):
+        """Drop expired entries nobody read again, at most once a minute"""
+        if now - self._last_purge < self.PURGE_INTERVAL:
+            return
+        self._last_purge = now
+        for key, (expires_at, _) in list(self._data.items()):
+            if expires_at is not None and expires_at <= now:
+                del self._data[key]
+
+    def stats(self) -> Dict[str, Any]:
+        return {"backend": "memory", "entries": len(self._data)}
+
+class SQLiteStore(StateStore):
+    """Store in a local SQLite file, shared by every worker process on the host.
+
+    Each call is one short statement in autocommit mode; WAL lets readers
+    and the single writer proceed concurrently. Calls run on the event loop,
+    so a statement waits at most busy_timeout seconds for another worker's
+    write. If the file is still locked the call gives up: get() misses,
+    set() / delete() / release() are dropped (the entry expires on its own)
+    and claim() fails, which every caller already handles.
+    """
+
+    shared = True
+    PURGE_INTERVAL = 60.0
+
+    def __init__(self, path: str, busy_timeout: float = 0.05):
+        self.path = path
+        self._db = sqlite3.connect(path, isolation_level=None, check_same_thread=False)
+        # Setup may wait for other workers starting at the same time
+        self._db.execute("PRAGMA busy_timeout=5000")
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute("PRAGMA synchronous=NORMAL")
+        self._db.executescript(SCHEMA)
+        self._db.execute(f"PRAGMA busy_timeout={int(busy_timeout * 1000)}")
+        self._last_purge = 0.0
+        self.busy = 0
+
+    def _execute(self, sql: str, params: tuple = ()) -> Optional[sqlite3.Cursor]:
+        """Run one statement; None if the file stayed locked past busy_timeout"""
+        try:
+            return self._db.execute(sql, params)
+        except sqlite3.OperationalError as e:
+            if "locked" not in str(e):
+                raise
+            self.busy += 1
+            logger.debug("State store busy: %s", e)
+            return None
+
+    def get(self, key: str) -> Optional[Any]:
+        cursor = self._execute(
+            "SELECT value FROM state WHERE key = ? AND (expires_at IS NULL OR expires_at > ?)",
+            (key, time.time())
+        )
+        row = cursor.fetchone() if cursor is not None else None
+        return json.loads(row[0]) if row else None
+
+    def set(self, key: str, value: Any, ttl: Optional[float] = None):
+        now = time.time()
+        self._execute(
+            "INSERT INTO state (key, value, expires_at) VALUES (?, ?, ?) "
+            "ON CONFLICT(key) DO UPDATE SET value = excluded.value, expires_at = excluded.expires_at",
+            (key, json.dumps(value), now + ttl if ttl is not None else None)
+        )
+        self._purge(now)
+
+    def delete(self, key: str):
+        self._execute("DELETE FROM state WHERE key = ?", (key,))
+
+    def claim(self, key: str, owner: str, ttl: float) -> bool:
+        now = time.time()
+        cursor = self._execute(
+            "INSERT INTO state (key, value, expires_at) VALUES (?, ?, ?) "
+            "ON CONFLICT(key) DO UPDATE SET value = excluded.value, expires_at = excluded.expires_at "
+            "WHERE state.expires_at <= ? OR state.value = excluded.value",
+            (key, json.dumps(owner), now + ttl, now)
+        )
+        return cursor is not None and cursor.rowcount == 1
+
+    def release(self, key: str, owner: str):
+        self._execute("DELETE FROM state WHERE key = ? AND value = ?", (key, json.dumps(owner)))
+
+    def _purge(self, now: float):
+        """Delete expired entries, at most once a minute"""
+        if now - self._last_purge < self.PURGE_INTERVAL:
+            return
+        self._last_purge = now
+        self._execute("DELETE FROM state WHERE expires_at <= ?", (now,))
+
+    def close(self):
+        self._db.close()
+
+    def stats(self) -> Dict[str, Any]:
+        cursor = self._execute("SELECT COUNT(*) FROM state")
+        entries = cursor.fetchone()[0] if cursor is not None else None
+        return {"backend": "sqlite", "path": self.path, "entries": entries, "busy": self.busy}
+
+def open_store(url: str) -> StateStore:
+    """Store for a STATE_STORE setting: empty or "memory", or "sqlite:<path>" """
+    if not url or url == "memory":
+        return MemoryStore()
+    if url.startswith("sqlite:"):
+        return SQLiteStore(url[len("sqlite:"):])
+    raise ValueError(f"Unsupported state store: {url}")
@@ -0,0 +1,145 @@
+"""Structured logging and per-request timing spans.
+
+configure_logging() sets up the stdlib logging tree: records are written as
+one line of text or JSON, carry their `extra={...}` fields, and below
+WARNING can be sampled. Modules log through logging.getLogger(__name__).
+
+span() times one Odoo RPC, KB search or LLM call. Inside a request served
+through ServerTimingMiddleware the durations are collected per request and
+returned in a Server-Timing header; elsewhere span() only costs two clock
+reads.
+"""
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Dict, List, Optional, Tuple
+import json
+import logging
+import random
+import sys
+import time
+import uuid
+
+# (name, seconds) spans of the request being served, None outside requests
+_spans: ContextVar[Optional[List[Tuple[str, float]]]] = ContextVar("spans", default=None)
+_request_id: ContextVar[Optional[str]] = ContextVar("request_id", default=None)
+
+# Attributes every LogRecord has; anything else came from extra={...}
+_RECORD_ATTRS = set(vars(logging.LogRecord("", 0, "", 0, "", (), None))) | {"message", "asctime"}
+
+@contextmanager
+def span(name: str):
+    """Record how long the block takes under name (e.g. "odoo-read", "llm")"""
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        spans = _spans.get()
+        if spans is not None:
+            spans.append((name, time.perf_counter() - started))
+
+def server_timing(spans: List[Tuple[str, float]], total: float) -> str:
+    """Server-Timing header value; repeated spans are summed with a count"""
+    totals: Dict[str, List[float]] = {}
+    for name, seconds in spans:
+        entry = totals.setdefault(name, [0.0, 0])
+        entry[0] += seconds
+        entry[1] += 1
+    parts = []
+    for name, (seconds, count) in totals.items():
+        part = f"{name};dur={seconds * 1000:.1f}"
+        if count > 1:
+            part += f';desc="{count} calls"'
+        parts.append(part)
+    parts.append(f"total;dur={total * 1000:.1f}")
+    return ", ".join(parts)
+
+class ServerTimingMiddleware:
+    """ASGI middleware collecting the spans of each HTTP request.
+
+    The header lists spans finished before the response starts, so for
+    streamed responses (SSE) it covers the work done up to the first byte.
+    Each request also gets an id, included in its log records and returned
+    as X-Request-ID. timing_allow_origin lets cross-origin pages (the widget)
+    see the timings in the browser's resource timing data.
+    """
+
+    def __init__(self, app, timing_allow_origin: Optional[str] = "*"):
+        self.app = app
+        self.timing_allow_origin = timing_allow_origin
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        started = time.perf_counter()
+        spans: List[Tuple[str, float]] = []
+        request_id = uuid.uuid4().hex[:16]
+        spans_token = _spans.set(spans)
+        id_token = _request_id.set(request_id)
+
+        async def send_with_timing(message):
+            if message["type"] == "http.response.start":
+                headers = list(message.get("headers", []))
+                headers.append((b"server-timing", server_timing(spans, time.perf_counter() - started).encode()))
+                headers.append((b"x-request-id", request_id.encode()))
+                if self.timing_allow_origin:
+                    headers.append((b"timing-allow-origin", self.timing_allow_origin.encode()))
+                message = {**message, "headers": headers}
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_timing)
+        finally:
+            _spans.reset(spans_token)
+            _request_id.reset(id_token)
+
+class SamplingFilter(logging.Filter):
+    """Passes WARNING and above, and a sample_rate fraction of the rest"""
+
+    def __init__(self, sample_rate: float = 1.0):
+        super().__init__()
+        self.sample_rate = sample_rate
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        if record.levelno >= logging.WARNING or self.sample_rate >= 1.0:
+            return True
+        return random.random() < self.sample_rate
+
+class StructuredFormatter(logging.Formatter):
+    """One line per record: `time level logger message key=value ...` or JSON"""
+
+    def __init__(self, json_output: bool = False):
+        super().__init__()
+        self.json_output = json_output
+
+    def format(self, record: logging.LogRecord) -> str:
+        fields = {k: v for k, v in vars(record).items() if k not in _RECORD_ATTRS}
+        request_id = _request_id.get()
+        if request_id:
+            fields["request_id"] = request_id
+        if record.exc_info:
+            fields["exc"] = self.formatException(record.exc_info)
+
+        if self.json_output:
+            return json.dumps({
+                "ts": round(record.created, 3),
+                "level": record.levelname,
+                "logger": record.name,
+                "msg": record.getMessage(),
+                **fields
+            }, default=str)
+        line = f"{self.formatTime(record)} {record.levelname} {record.name}: {record.getMessage()}"
+        if fields:
+            line += " " + " ".join(f"{k}={v}" for k, v in fields.items())
+        return line
+
+def configure_logging(level: str = "INFO", json_output: bool = False, sample_rate: float = 1.0):
+    """Route this service's loggers (the `src` package) to stderr"""
+    handler = logging.StreamHandler(sys.stderr)
+    handler.setFormatter(StructuredFormatter(json_output))
+    handler.addFilter(SamplingFilter(sample_rate))
+    logger = logging.getLogger(__package__)
+    logger.handlers = [handler]
+    logger.setLevel(level.upper())
+    logger.propagate = False
@@ -1,12 +1,12 @@
 #!/usr/bin/env python3
 import os
-import time
+import asyncio
 from dotenv import load_dotenv
 from src.odoo_client import OdooClient
 
 load_dotenv()
 
-def test_agent_disconnect_detection():
+async def test_agent_disconnect_detection():
     client = OdooClient(
         url=os.getenv('ODOO_URL'),
         db=os.getenv('ODOO_DB'), 
@@ -17,14 +17,14 @@ def test_agent_disconnect_detection():
     print("Testing agent disconnect detection...")
     
     # Test authentication
-    if not client.authenticate():
+    if not await client.authenticate():
         print("❌ Authentication failed")
         return
     
     print(f"✅ Authentication successful! UID: {client.uid}")
     
     # Create a test session
-    session_id = client.create_live_chat_session("Test User", "Hello, testing agent disconnect detection")
+    session_id = await client.create_live_chat_session("Test User", "Hello, testing agent disconnect detection")
     if not session_id:
         print("❌ Failed to create live chat session")
         return
@@ -37,13 +37,13 @@ def test_agent_disconnect_detection():
     try:
         while True:
             # Check basic session status
-            is_active = client.is_session_active(session_id)
+            is_active = await client.is_session_active(session_id)
             
             # Check detailed agent status
-            agent_status = client.check_agent_status(session_id)
+            agent_status = await client.check_agent_status(session_id)
             
-            # Get messages (which also checks for disconnection)
-            messages = client.get_session_messages(session_id)
+            # Get messages (which also reports a session that ended)
+            messages = await client.get_session_messages(session_id)
             
             print(f"Session {session_id}:")
             print(f"  - Session Active: {is_active}")
@@ -65,10 +65,10 @@ def test_agent_disconnect_detection():
                 break
             
             print("---")
-            time.sleep(3)
+            await asyncio.sleep(3)
             
     except KeyboardInterrupt:
         print("\n⏹️ Monitoring stopped by user")
 
 if __name__ == "__main__":
-    test_agent_disconnect_detection()
\ No newline at end of file
+    asyncio.run(test_agent_disconnect_detection())
\ No newline at end of file
@@ -1,12 +1,12 @@
 #!/usr/bin/env python3
 import os
-import time
+import asyncio
 from dotenv import load_dotenv
 from src.odoo_client import OdooClient
 
 load_dotenv()
 
-def monitor_session_disconnect():
+async def monitor_session_disconnect():
     client = OdooClient(
         url=os.getenv('ODOO_URL'),
         db=os.getenv('ODOO_DB'), 
@@ -14,7 +14,7 @@ def monitor_session_disconnect():
         password=os.getenv('ODOO_PASSWORD')
     )
     
-    if not client.authenticate():
+    if not await client.authenticate():
         print("❌ Auth failed")
         return
     
@@ -41,7 +41,7 @@ def monitor_session_disconnect():
                 "id": 1
             }
             
-            response = client.session.post(f"{client.url}/web/dataset/call_kw", json=session_data)
+            response = await client.session.post(f"{client.url}/web/dataset/call_kw", json=session_data)
             
             if response.status_code == 200:
                 result = response.json()
@@ -66,10 +66,10 @@ def monitor_session_disconnect():
                     
                     last_operator_status = current_status
             
-            time.sleep(2)
+            await asyncio.sleep(2)
             
     except KeyboardInterrupt:
         print("\nStopped monitoring")
 
 if __name__ == "__main__":
-    monitor_session_disconnect()
\ No newline at end of file
+    asyncio.run(monitor_session_disconnect())
\ No newline at end of file
@@ -1,12 +1,12 @@
 #!/usr/bin/env python3
 import os
-import time
+import asyncio
 from dotenv import load_dotenv
 from src.odoo_client import OdooClient
 
 load_dotenv()
 
-def test_new_session():
+async def test_new_session():
     client = OdooClient(
         url=os.getenv('ODOO_URL'),
         db=os.getenv('ODOO_DB'), 
@@ -14,12 +14,12 @@ def test_new_session():
         password=os.getenv('ODOO_PASSWORD')
     )
     
-    if not client.authenticate():
+    if not await client.authenticate():
         print("❌ Auth failed")
         return
     
     # Create new session
-    session_id = client.create_live_chat_session("Test User", "Hello, I need help")
+    session_id = await client.create_live_chat_session("Test User", "Hello, I need help")
     if not session_id:
         print("❌ Failed to create session")
         return
@@ -31,8 +31,8 @@ def test_new_session():
     
     try:
         while True:
-            # Get messages (this will detect operator changes)
-            messages = client.get_session_messages(session_id)
+            # Get messages (this will detect the session ending)
+            messages = await client.get_session_messages(session_id)
             
             # Check current operator
             session_data = {
@@ -47,7 +47,7 @@ def test_new_session():
                 "id": 1
             }
             
-            response = client.session.post(f"{client.url}/web/dataset/call_kw", json=session_data)
+            response = await client.session.post(f"{client.url}/web/dataset/call_kw", json=session_data)
             if response.status_code == 200:
                 result = response.json()
                 if result.get('result'):
@@ -55,19 +55,22 @@ def test_new_session():
                     
                     if current_operator != last_operator:
                         print(f"Operator changed: {last_operator} -> {current_operator}")
+                        if last_operator and not current_operator:
+                            print("🚨 DETECTED: AGENT_DISCONNECTED")
+                            return
                         last_operator = current_operator
             
             # Check for disconnect messages
             for msg in messages:
-                if msg['body'] in ['SESSION_ENDED', 'AGENT_DISCONNECTED']:
+                if msg['body'] == 'SESSION_ENDED':
                     print(f"🚨 DETECTED: {msg['body']}")
                     return
             
             print(f"Messages: {len(messages)}, Operator: {last_operator}")
-            time.sleep(2)
+            await asyncio.sleep(2)
             
     except KeyboardInterrupt:
         print("\nStopped")
 
 if __name__ == "__main__":
-    test_new_session()
\ No newline at end of file
+    asyncio.run(test_new_session())
\ No newline at end of file
@@ -1,11 +1,12 @@
 #!/usr/bin/env python3
 import os
+import asyncio
 from dotenv import load_dotenv
 from src.odoo_client import OdooClient
 
 load_dotenv()
 
-def test_odoo_connection():
+async def test_odoo_connection():
     client = OdooClient(
         url=os.getenv('ODOO_URL'),
         db=os.getenv('ODOO_DB'), 
@@ -19,11 +20,11 @@ def test_odoo_connection():
     print(f"Username: {client.username}")
     
     # Test authentication
-    if client.authenticate():
+    if await client.authenticate():
         print(f"✅ Authentication successful! UID: {client.uid}")
         
         # Test creating live chat session
-        session_id = client.create_live_chat_session("Test User", "Hello from API test")
+        session_id = await client.create_live_chat_session("Test User", "Hello from API test")
         if session_id:
             print(f"✅ Live chat session created! ID: {session_id}")
         else:
@@ -32,4 +33,4 @@ def test_odoo_connection():
         print("❌ Authentication failed")
 
 if __name__ == "__main__":
-    test_odoo_connection()
\ No newline at end of file
+    asyncio.run(test_odoo_connection())
\ No newline at end of file
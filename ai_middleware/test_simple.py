@@ -22,8 +22,17 @@ def test_chat_flow():
         data = response.json()
         print(f"Response: {data}")
         
-        if data.get('handoff_needed') and data.get('odoo_session_id'):
-            session_id = data['odoo_session_id']
+        session_id = None
+        if data.get('handoff_needed') and data.get('handoff_ticket'):
+            # The session is created in the background; wait for it
+            ticket = data['handoff_ticket']
+            handoff_response = requests.get(f'{API_BASE}/handoff/{ticket}', params={'wait': 25})
+            if handoff_response.status_code == 200:
+                handoff = handoff_response.json()
+                print(f"Handoff: {handoff}")
+                session_id = handoff.get('odoo_session_id')
+        
+        if session_id:
             print(f"✅ Session created: {session_id}")
             
             # Test 2: Send follow-up message
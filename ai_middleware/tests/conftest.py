@@ -0,0 +1,36 @@
+import asyncio
+import os
+
+import httpx
+import pytest
+
+@pytest.fixture(scope="session")
+def main_module():
+    """src.main configured for tests: no Odoo, LLM, spool file or snapshot"""
+    os.environ.update({
+        "ODOO_URL": "http://odoo.invalid",
+        "ODOO_DB": "test",
+        "ODOO_USERNAME": "test",
+        "ODOO_PASSWORD": "test",
+        "OPENAI_API_KEY": "test",
+        "OUTBOUND_SPOOL_PATH": "",
+        "KB_SNAPSHOT_PATH": "",
+        "KB_RELOAD_INTERVAL": "0",
+        "STATE_STORE": "memory",
+        "RATE_LIMIT_IP_RATE": "0",
+        "RATE_LIMIT_VISITOR_RATE": "0",
+        "RATE_LIMIT_SESSION_RATE": "0"
+    })
+    from src import main
+    return main
+
+@pytest.fixture
+def call_app(main_module):
+    """Send one request to the app in-process: call_app(method, path, **kwargs)"""
+    def call(method: str, path: str, **kwargs) -> httpx.Response:
+        async def run():
+            transport = httpx.ASGITransport(app=main_module.app)
+            async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+                return await client.request(method, path, **kwargs)
+        return asyncio.run(run())
+    return call
@@ -0,0 +1,83 @@
+import asyncio
+
+import pytest
+
+from src.admission import ConcurrencyGate, Overloaded, RateLimited, RateLimiter
+from src.odoo_client import OdooClient
+
+def test_rate_limiter_allows_burst_then_limits():
+    limiter = RateLimiter("visitor", rate=1, burst=2)
+    limiter.check("a")
+    limiter.check("a")
+    with pytest.raises(RateLimited) as exc:
+        limiter.check("a")
+    assert exc.value.status_code == 429
+    assert 0 < exc.value.retry_after <= 1
+    limiter.check("b")  # other keys have their own bucket
+    assert limiter.limited == 1
+
+def test_rate_limiter_disabled_by_zero_rate():
+    limiter = RateLimiter("ip", rate=0, burst=1)
+    for _ in range(10):
+        limiter.check("a")
+
+def test_gate_rejects_when_wait_queue_is_full():
+    async def run():
+        gate = ConcurrencyGate("Odoo", limit=1, max_waiting=0)
+        async with gate.slot():
+            with pytest.raises(Overloaded) as exc:
+                async with gate.slot():
+                    pass
+        assert exc.value.status_code == 503
+        assert gate.rejected == 1 and gate.in_flight == 0
+
+    asyncio.run(run())
+
+def test_gate_times_out_waiting_callers():
+    async def run():
+        gate = ConcurrencyGate("LLM", limit=1, max_waiting=1, timeout=0.01)
+        async with gate.slot():
+            with pytest.raises(Overloaded):
+                async with gate.slot():
+                    pass
+        assert gate.timed_out == 1 and gate.waiting == 0
+
+    asyncio.run(run())
+
+def test_odoo_client_lets_overloaded_through():
+    async def run():
+        gate = ConcurrencyGate("Odoo", limit=1, max_waiting=0)
+        client = OdooClient("http://odoo.invalid", "db", "user", "password", gate=gate)
+        client.uid = 2  # logged in; every call goes straight to the gate
+        calls = [
+            lambda: client.send_message_to_session(1, "hi", "Visitor", check_active=False),
+            lambda: client.send_message_to_session(1, "hi", "Visitor"),
+            lambda: client.find_message("<id@test>"),
+            lambda: client.get_session_messages(1),
+            lambda: client.create_live_chat_session("Visitor", "hi"),
+            lambda: client.store_feedback(1, "good"),
+            lambda: client.is_session_active(1),
+        ]
+        async with gate.slot():
+            for call in calls:
+                with pytest.raises(Overloaded):
+                    await call()
+        await client.close()
+
+    asyncio.run(run())
+
+def test_saturated_odoo_gate_returns_503_with_retry_after(main_module, call_app, monkeypatch):
+    async def overloaded(*args, **kwargs):
+        raise Overloaded("Odoo is overloaded", 5)
+    monkeypatch.setattr(main_module.odoo_client, "send_message_to_session", overloaded)
+    response = call_app("POST", "/chat", json={"message": "hello", "session_id": "7"})
+    assert response.status_code == 503
+    assert response.headers["retry-after"] == "5"
+
+def test_unreachable_odoo_returns_503_with_retry_after(main_module, call_app, monkeypatch):
+    async def unreachable(*args, **kwargs):
+        return None
+    monkeypatch.setattr(main_module.odoo_client, "send_message_to_session", unreachable)
+    response = call_app("POST", "/chat", json={"message": "hello", "session_id": "7"})
+    assert response.status_code == 503
+    assert response.headers["retry-after"] == str(main_module.ODOO_UNAVAILABLE_RETRY_AFTER)
@@ -0,0 +1,60 @@
+import asyncio
+from types import SimpleNamespace
+
+from src import answer_cache
+from src.ai_agent import AIAgent
+from src.answer_cache import AnswerCache, make_key, normalize_message
+from src.metrics import REGISTRY
+
+def test_key_ignores_case_punctuation_and_spacing():
+    docs = [("Open 9 to 5", 0.4)]
+    assert normalize_message("  What are your HOURS?! ") == "what are your hours"
+    assert make_key("What are your hours?", docs) == make_key("what are  your hours", docs)
+    assert make_key("What are your hours?", docs) != make_key("What are your hours?", [("Open 24/7", 0.4)])
+
+def test_least_recently_used_entry_is_evicted():
+    cache = AnswerCache(max_entries=2)
+    cache.put("a", (False, "A", 0.8))
+    cache.put("b", (False, "B", 0.8))
+    assert cache.get("a") == (False, "A", 0.8)
+    cache.put("c", (False, "C", 0.8))
+    assert cache.get("b") is None
+    assert cache.get("a") and cache.get("c")
+    assert cache.stats()["evictions"] == 1
+
+def test_entries_expire_and_memory_is_bounded(monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr(answer_cache.time, "monotonic", lambda: now[0])
+    cache = AnswerCache(ttl=10.0, max_bytes=2 * (AnswerCache.ENTRY_OVERHEAD + 10))
+    cache.put("a", (False, "A", 0.8))
+    now[0] += 11
+    assert cache.get("a") is None and cache.stats()["expirations"] == 1
+
+    for key in ("k1", "k2", "k3"):
+        cache.put(key, (False, "x" * 8, 0.8))
+    assert len(cache) == 2 and cache.bytes <= cache.max_bytes
+    cache.put("big", (False, "x" * 1000, 0.8))  # larger than the whole budget
+    assert cache.get("big") is None
+
+def test_disabled_cache_stores_nothing():
+    cache = AnswerCache(max_entries=0)
+    cache.put("a", (False, "A", 0.8))
+    assert len(cache) == 0
+
+def test_warm_cache_stays_out_of_traffic_counters(monkeypatch):
+    agent = AIAgent(api_key="test")
+
+    async def create(**kwargs):
+        return SimpleNamespace(choices=[SimpleNamespace(message=SimpleNamespace(content="Answer"))], usage=None)
+
+    agent._llm_client = SimpleNamespace(chat=SimpleNamespace(completions=SimpleNamespace(create=create)))
+    monkeypatch.setattr(agent.kb, "search", lambda message, top_k=3: [("KB answer", 0.3)])
+    decisions = {route: REGISTRY.sample("ai_middleware_chat_decisions_total", route=route)
+                 for route in ("llm", "greeting")}
+
+    assert asyncio.run(agent.warm_cache(["What is the price?", "hello", " "])) == 1
+    assert agent.intent_router.stats() == {"handoff": 0, "greeting": 0, "faq": 0, "none": 0}
+    for route, value in decisions.items():
+        assert REGISTRY.sample("ai_middleware_chat_decisions_total", route=route) == value
+    assert asyncio.run(agent.should_handoff("what is the price")) == (False, "Answer", 0.8)
+    assert agent.intent_router.stats()["none"] == 1
@@ -0,0 +1,86 @@
+import asyncio
+import json
+
+import httpx
+
+from src.odoo_client import OdooClient
+
+class ChannelOdoo:
+    """Live chat channels over httpx.MockTransport; get_session opens a
+    session on any channel with an operator online"""
+
+    def __init__(self, channels):
+        self.channels = channels
+        self.channel_reads = 0
+        self.fail_channel_read = False
+        self.session_requests = []
+
+    def handler(self, request: httpx.Request) -> httpx.Response:
+        def reply(result):
+            return httpx.Response(200, json={"jsonrpc": "2.0", "id": 1, "result": result},
+                                  headers={"Set-Cookie": "session_id=s1; Path=/"})
+
+        params = json.loads(request.content)["params"]
+        if request.url.path == "/web/session/authenticate":
+            return reply({"uid": 2})
+        if request.url.path == "/im_livechat/get_session":
+            channel_id = params["channel_id"]
+            self.session_requests.append(channel_id)
+            channel = next((c for c in self.channels if c['id'] == channel_id), None)
+            if channel and channel['available_operator_ids']:
+                return reply({"channel_id": 1000 + channel_id})
+            return reply(False)
+        if params["model"] == "im_livechat.channel":
+            self.channel_reads += 1
+            if self.fail_channel_read:
+                return httpx.Response(200, json={"jsonrpc": "2.0", "id": 1, "error": {"message": "Access denied"}})
+            return reply(self.channels)
+        return reply(True)  # message_post, _notify_thread
+
+def make_client(odoo, **kwargs):
+    client = OdooClient("http://odoo.invalid", "db", "user", "password", **kwargs)
+    client.session = httpx.AsyncClient(transport=httpx.MockTransport(odoo.handler))
+    return client
+
+def handoff(client):
+    async def run():
+        online = await client.agents_online()
+        session_id = await client.create_live_chat_session("Visitor", "Hello")
+        return online, session_id
+    return asyncio.run(run())
+
+def test_handoff_skips_channels_without_operators():
+    odoo = ChannelOdoo([
+        {'id': 1, 'name': 'Sales', 'available_operator_ids': []},
+        {'id': 2, 'name': 'Support', 'available_operator_ids': [7]},
+        {'id': 3, 'name': 'Billing', 'available_operator_ids': [8, 9]},
+    ])
+    client = make_client(odoo, livechat_channel_ids=[1, 3])
+    assert handoff(client) == (True, 1003)
+    # Preferred channel 1 has nobody online, so it is never asked
+    assert odoo.session_requests == [3]
+    assert odoo.channel_reads == 1
+    assert client.channel_summary() == [
+        {"id": 1, "name": "Sales", "operators": 0},
+        {"id": 3, "name": "Billing", "operators": 2},
+        {"id": 2, "name": "Support", "operators": 1},
+    ]
+
+def test_no_operators_online_returns_without_asking_any_channel():
+    odoo = ChannelOdoo([
+        {'id': 1, 'name': 'Sales', 'available_operator_ids': []},
+        {'id': 2, 'name': 'Support', 'available_operator_ids': []},
+    ])
+    client = make_client(odoo, livechat_channel_ids=[1, 2])
+    assert handoff(client) == (False, None)
+    assert odoo.session_requests == []
+
+def test_unreadable_channels_fall_back_to_the_configured_order():
+    odoo = ChannelOdoo([
+        {'id': 1, 'name': 'Sales', 'available_operator_ids': []},
+        {'id': 2, 'name': 'Support', 'available_operator_ids': [7]},
+    ])
+    odoo.fail_channel_read = True
+    client = make_client(odoo, livechat_channel_ids=[1, 2])
+    assert handoff(client) == (None, 1002)
+    assert odoo.session_requests == [1, 2]
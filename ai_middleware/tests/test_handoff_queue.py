@@ -0,0 +1,112 @@
+import asyncio
+
+import pytest
+
+from src.handoff_queue import HandoffQueue, HandoffQueueFull
+from src.metrics import REGISTRY
+from src.state_store import MemoryStore
+
+class FakeOdoo:
+    """Odoo client stand-in for session creation"""
+
+    def __init__(self, agents=True, session_id=42, error=None):
+        self.agents = agents
+        self.session_id = session_id
+        self.error = error
+        self.release = asyncio.Event()
+        self.release.set()
+
+    async def agents_online(self):
+        return self.agents
+
+    async def create_live_chat_session(self, visitor_name, message):
+        await self.release.wait()
+        if self.error:
+            raise self.error
+        return self.session_id
+
+def run_ticket(odoo, **kwargs):
+    async def run():
+        queue = HandoffQueue(odoo, workers=1, **kwargs)
+        queue.start()
+        ticket = queue.submit("Visitor", "Hello")
+        await queue.wait(ticket, 1.0)
+        await queue.close()
+        return queue, ticket
+    return asyncio.run(run())
+
+def test_connected_ticket_reports_the_session():
+    connected = []
+    queue, ticket = run_ticket(FakeOdoo(), on_connected=connected.append)
+    assert ticket.status == "connected"
+    assert ticket.odoo_session_id == 42
+    assert connected == [42]
+    assert queue.counts["connected"] == 1
+
+def test_queue_wait_and_create_time_are_exported():
+    def count(name, **labels):
+        return REGISTRY.sample(name, **labels) or 0
+
+    waits = count("ai_middleware_handoff_queue_wait_seconds_count")
+    connected = count("ai_middleware_handoff_create_seconds_count", status="connected")
+    no_agents = count("ai_middleware_handoff_create_seconds_count", status="no_agents")
+    run_ticket(FakeOdoo())
+    run_ticket(FakeOdoo(agents=False))
+    assert count("ai_middleware_handoff_queue_wait_seconds_count") == waits + 2
+    assert count("ai_middleware_handoff_create_seconds_count", status="connected") == connected + 1
+    assert count("ai_middleware_handoff_create_seconds_count", status="no_agents") == no_agents + 1
+    assert "ai_middleware_handoff_queue_wait_seconds_bucket" in REGISTRY.render()
+
+def test_no_agents_and_failures_finish_the_ticket():
+    queue, ticket = run_ticket(FakeOdoo(agents=False))
+    assert ticket.status == "no_agents" and queue.counts["no_agents"] == 1
+
+    queue, ticket = run_ticket(FakeOdoo(session_id=None))
+    assert ticket.status == "failed" and queue.counts["failed"] == 1
+
+    queue, ticket = run_ticket(FakeOdoo(error=RuntimeError("boom")))
+    assert ticket.status == "failed" and ticket.error == "boom"
+
+def test_submit_rejects_beyond_max_depth():
+    async def run():
+        queue = HandoffQueue(FakeOdoo(), max_depth=1)
+        queue.submit("Visitor", "Hello")
+        with pytest.raises(HandoffQueueFull):
+            queue.submit("Visitor", "Hello again")
+        assert queue.counts == {"submitted": 1, "rejected": 1, "connected": 0, "no_agents": 0, "failed": 0}
+
+    asyncio.run(run())
+
+def test_close_during_creation_fails_the_ticket():
+    async def run():
+        odoo = FakeOdoo()
+        odoo.release.clear()
+        queue = HandoffQueue(odoo, workers=1)
+        queue.start()
+        ticket = queue.submit("Visitor", "Hello")
+        await asyncio.sleep(0.01)
+        assert ticket.status == "creating"
+        task = queue._tasks[0]
+        await queue.close()
+        with pytest.raises(asyncio.CancelledError):
+            await task
+        assert ticket.status == "failed" and ticket.done.is_set()
+        assert queue.counts["failed"] == 1
+
+    asyncio.run(run())
+
+def test_other_worker_follows_a_ticket_through_the_store():
+    async def run():
+        store = MemoryStore()
+        owner = HandoffQueue(FakeOdoo(), workers=1, store=store)
+        other = HandoffQueue(FakeOdoo(), store=store)
+        other.REMOTE_POLL_INTERVAL = 0.01
+        ticket = owner.submit("Visitor", "Hello")
+        remote = other.get(ticket.id)
+        assert remote.remote and remote.status == "queued"
+        owner.start()
+        await other.wait(remote, 1.0)
+        await owner.close()
+        assert remote.status == "connected" and remote.odoo_session_id == 42
+
+    asyncio.run(run())
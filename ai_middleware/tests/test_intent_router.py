@@ -0,0 +1,41 @@
+import json
+
+import pytest
+
+from src.intent_router import IntentRouter
+
+@pytest.fixture
+def router():
+    return IntentRouter()
+
+@pytest.mark.parametrize("message, route", [
+    ("I need help with my order", "handoff"),
+    ("Can I TALK   TO\nsomeone please", "handoff"),
+    ("Hello, I need a human", "handoff"),  # handoff wins over greeting
+    ("Hi!", "greeting"),
+    ("Good morning, thank you", "greeting"),
+    ("Hi, what is your return policy?", "faq"),  # not only a greeting
+    ("What are your business hours", "faq"),
+    ("That was helpful", None),  # whole words only
+    ("This is a hint", None),
+    ("", None),
+])
+def test_route(router, message, route):
+    assert router.route(message) == route
+
+def test_counts(router):
+    router.route("hello")
+    router.route("what is the price")
+    router.route("hello again", count=False)
+    assert router.stats() == {"handoff": 0, "greeting": 1, "faq": 0, "none": 1}
+
+def test_custom_lexicons(tmp_path):
+    path = tmp_path / "intents.json"
+    path.write_text(json.dumps({"handoff": ["operator"], "faq": []}))
+    router = IntentRouter.from_file(str(path))
+    assert router.route("operator please") == "handoff"
+    assert router.route("I need help") is None
+    assert router.route("What are your business hours") is None
+    assert router.route("hello") == "greeting"  # default kept
+    with pytest.raises(ValueError):
+        IntentRouter({"smalltalk": ["weather"]})
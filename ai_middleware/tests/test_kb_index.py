@@ -0,0 +1,57 @@
+import numpy as np
+import pytest
+
+from src.kb_index import PairStore, TermIndex, tokenize
+
+PAIRS = [
+    "Q: What are your opening hours? A: We are open from 9 to 5.",
+    "Q: How do I reset my password? A: Use the reset link on the login page.",
+    "Q: Do you ship abroad? A: We ship to most countries.",
+    "Q: How long does shipping take? A: Shipping takes three days.",
+]
+QUERIES = ["opening hours", "reset password", "shipping abroad", "unknown words only", "a"]
+
+def as_lists(results):
+    return [[(doc, round(score, 9)) for doc, score in result] for result in results]
+
+def test_tokenize_drops_short_words():
+    assert tokenize("Do I need an ID? Yes, 100%") == ["need", "yes", "100"]
+
+def test_search_ranks_and_normalizes():
+    index = TermIndex.build(PAIRS)
+    stats = {}
+    results = index.search("how long does shipping take", top_k=2, stats=stats)
+    assert [doc for doc, _ in results] == [PAIRS[3], PAIRS[1]]  # "how" also matches PAIRS[1]
+    assert 0 < results[1][1] < results[0][1] <= 1.0
+    assert stats["candidates"] == 2
+    assert index.search("unknown words only") == []
+    assert TermIndex.build([]).search("opening hours") == []
+
+def test_search_batch_matches_search():
+    index = TermIndex.build(PAIRS)
+    index.BATCH_CELLS = 2 * index.n_docs  # several chunks
+    assert as_lists(index.search_batch(QUERIES)) == as_lists([index.search(q) for q in QUERIES])
+
+def test_replace_sources_matches_a_fresh_build():
+    index = TermIndex.build(PAIRS[:3], sources=[0, 0, 1])
+    updated = index.replace_sources({0}, [PAIRS[3], PAIRS[0]], [2, 2])
+    fresh = TermIndex.build([PAIRS[2], PAIRS[3], PAIRS[0]], sources=[1, 2, 2])
+    assert list(updated.pairs) == list(fresh.pairs)
+    assert as_lists(updated.search_batch(QUERIES)) == as_lists(fresh.search_batch(QUERIES))
+    assert index.n_docs == 3  # the old index is left as it was
+
+def test_snapshot_round_trip(tmp_path):
+    index = TermIndex.build(PAIRS, sources=[0, 0, 1, 1])
+    path = str(tmp_path / "kb.snapshot")
+    index.save(path, {"version": "abc"})
+    loaded, meta = TermIndex.load(path)
+    assert meta == {"version": "abc"}
+    assert isinstance(loaded.pairs, PairStore) and list(loaded.pairs) == PAIRS
+    assert np.array_equal(loaded.sources, index.sources)
+    assert as_lists(loaded.search_batch(QUERIES)) == as_lists(index.search_batch(QUERIES))
+
+def test_load_rejects_other_files(tmp_path):
+    path = tmp_path / "not-a-snapshot"
+    path.write_bytes(b"x" * 64)
+    with pytest.raises(ValueError):
+        TermIndex.load(str(path))
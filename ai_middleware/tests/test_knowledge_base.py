@@ -0,0 +1,81 @@
+import os
+
+from src.knowledge_base import KnowledgeBase
+
+FILES = {
+    "hours.txt": "Q: What are your opening hours?\nA: We are open from 9 to 5.\n",
+    "shipping.txt": "Q: Do you ship abroad?\nA: We ship to most countries.\n",
+    "returns.txt": "Q: Can I return an item?\nA: Within 30 days of delivery.\n",
+}
+
+def write(directory, name, content, mtime_ns=None):
+    path = os.path.join(directory, name)
+    with open(path, "w") as f:
+        f.write(content)
+    if mtime_ns is not None:
+        os.utime(path, ns=(mtime_ns, mtime_ns))
+    return path
+
+def load(tmp_path, snapshot_path=None):
+    for name, content in FILES.items():
+        write(tmp_path, name, content, mtime_ns=1_000_000_000)
+    kb = KnowledgeBase(snapshot_path=snapshot_path)
+    kb.load_from_directory(str(tmp_path))
+    return kb
+
+def source_ids(kb):
+    return {os.path.basename(key): src['id'] for key, src in kb._sources.items()}
+
+def test_refresh_without_changes_keeps_the_index(tmp_path):
+    kb = load(tmp_path)
+    index, version = kb.index, kb.version
+    assert len(kb.qa_pairs) == 3
+    assert kb.refresh() is False
+    assert kb.index is index and kb.version == version
+
+def test_refresh_reparses_only_edited_and_removed_files(tmp_path):
+    kb = load(tmp_path)
+    before = source_ids(kb)
+
+    write(tmp_path, "hours.txt", "Q: What are your opening hours?\nA: We are open from 8 to 6.\n",
+          mtime_ns=2_000_000_000)
+    os.remove(os.path.join(tmp_path, "returns.txt"))
+    write(tmp_path, "payment.txt", "Q: Which cards do you accept?\nA: Visa and Mastercard.\n")
+    assert kb.refresh() is True
+
+    after = source_ids(kb)
+    assert set(after) == {"hours.txt", "shipping.txt", "payment.txt"}
+    assert after["shipping.txt"] == before["shipping.txt"]  # untouched, not re-parsed
+    assert after["hours.txt"] != before["hours.txt"]
+    assert sorted(kb.qa_pairs) == sorted([
+        "Q: What are your opening hours?\nA: We are open from 8 to 6.",
+        "Q: Do you ship abroad?\nA: We ship to most countries.",
+        "Q: Which cards do you accept?\nA: Visa and Mastercard.",
+    ])
+    assert kb.search("opening hours")[0][0].endswith("8 to 6.")
+    assert kb.search("return an item") == []
+
+def test_touched_file_with_the_same_content_is_not_reindexed(tmp_path):
+    kb = load(tmp_path)
+    before, version = source_ids(kb), kb.version
+    write(tmp_path, "shipping.txt", FILES["shipping.txt"], mtime_ns=3_000_000_000)
+    assert kb.refresh() is False
+    assert kb.version == version and source_ids(kb) == before
+    assert kb._sources[os.path.join(tmp_path, "shipping.txt")]['mtime_ns'] == 3_000_000_000
+
+def test_restart_from_snapshot_reparses_only_changed_files(tmp_path):
+    directory = tmp_path / "kb"
+    directory.mkdir()
+    snapshot = str(tmp_path / "kb.snapshot")
+    kb = load(directory, snapshot_path=snapshot)
+    before = source_ids(kb)
+
+    write(directory, "returns.txt", "Q: Can I return an item?\nA: Within 60 days of delivery.\n",
+          mtime_ns=2_000_000_000)
+    restarted = KnowledgeBase(snapshot_path=snapshot)
+    restarted.load_from_directory(str(directory))
+    after = source_ids(restarted)
+    assert after["hours.txt"] == before["hours.txt"]
+    assert after["shipping.txt"] == before["shipping.txt"]
+    assert after["returns.txt"] != before["returns.txt"]
+    assert restarted.search("return an item")[0][0].endswith("60 days of delivery.")
@@ -0,0 +1,87 @@
+import asyncio
+import json
+
+import httpx
+
+from src.odoo_client import VISITOR_EMAIL, OdooClient
+
+SESSION = 9201
+
+MESSAGES = [
+    {'id': 10, 'res_id': SESSION, 'body': '<p>Hi, how can I help?</p>', 'author_id': [3, 'Operator'],
+     'email_from': 'operator@example.com', 'date': '2026-01-01 10:00:00'},
+    {'id': 11, 'res_id': SESSION, 'body': '<p>My order is late</p>', 'author_id': [7, 'Visitor'],
+     'email_from': VISITOR_EMAIL, 'date': '2026-01-01 10:00:05'},
+    {'id': 12, 'res_id': SESSION, 'body': '<p>Let me check</p>', 'author_id': [3, 'Operator'],
+     'email_from': 'operator@example.com', 'date': '2026-01-01 10:00:10'},
+    {'id': 13, 'res_id': SESSION + 1, 'body': '<p>Other chat</p>', 'author_id': [3, 'Operator'],
+     'email_from': 'operator@example.com', 'date': '2026-01-01 10:00:15'},
+    {'id': 14, 'res_id': SESSION, 'body': '<p>It ships today</p>', 'author_id': [3, 'Operator'],
+     'email_from': 'operator@example.com', 'date': '2026-01-01 10:00:20'},
+]
+
+def matches(record: dict, domain: list) -> bool:
+    """Enough of Odoo's domain evaluation for the message searches"""
+    for field, op, value in domain:
+        actual = record.get(field, False)
+        if isinstance(actual, list):
+            actual = actual[0]
+        if op == "=" and actual != value:
+            return False
+        if op == "!=" and actual == value:
+            return False
+        if op == ">" and not actual > value:
+            return False
+        if op == "in" and actual not in value:
+            return False
+        if op == "not ilike" and str(value).lower() in str(actual).lower():
+            return False
+    return True
+
+async def handler(request: httpx.Request) -> httpx.Response:
+    if request.url.path == "/web/session/authenticate":
+        return httpx.Response(200, json={"jsonrpc": "2.0", "id": 1, "result": {"uid": 2}},
+                              headers={"Set-Cookie": "session_id=s1; Path=/"})
+    params = json.loads(request.content)["params"]
+    if params["model"] == "discuss.channel":
+        return httpx.Response(200, json={"jsonrpc": "2.0", "id": 1, "result": [{
+            'id': SESSION, 'livechat_status': 'in_progress', 'livechat_end_dt': False,
+            'livechat_operator_id': [3, 'Operator'], 'channel_member_ids': [1, 2]}]})
+    domain = [term for term in params["args"][0] if term[0] != "model"]
+    rows = [m for m in MESSAGES if matches(m, domain)]
+    return httpx.Response(200, json={"jsonrpc": "2.0", "id": 1, "result": rows})
+
+def get_messages(after_id: int):
+    client = OdooClient("http://odoo.invalid", "db", "user", "password")
+    client.session = httpx.AsyncClient(transport=httpx.MockTransport(handler))
+    return asyncio.run(client.get_session_messages(SESSION, after_id))
+
+def test_cursor_returns_only_newer_agent_messages():
+    assert [m['id'] for m in get_messages(0)] == [10, 12, 14]
+    assert [m['id'] for m in get_messages(10)] == [12, 14]
+    assert [m['id'] for m in get_messages(12)] == [14]
+    assert get_messages(14) == []
+
+def test_messages_endpoint_applies_the_cursor(main_module, call_app, monkeypatch):
+    async def read_sessions(ids):
+        return {i: {'id': i, 'livechat_status': 'in_progress', 'livechat_end_dt': False,
+                    'livechat_operator_id': [3, 'Operator'], 'channel_member_ids': [1, 2]} for i in ids}
+
+    async def search_session_messages(ids, after_id, new_ids, limit):
+        return [m for m in MESSAGES if m['res_id'] in ids and m['email_from'] != VISITOR_EMAIL
+                and (m['id'] > after_id or m['res_id'] in (new_ids or []))]
+
+    monkeypatch.setattr(main_module.odoo_client, "read_sessions", read_sessions)
+    monkeypatch.setattr(main_module.odoo_client, "search_session_messages", search_session_messages)
+    watcher = main_module.session_watcher
+    watcher.track(SESSION)
+    asyncio.run(watcher.poll_once())  # the background poller does not run in tests
+
+    def poll(after_id):
+        response = call_app("GET", f"/messages/{SESSION}", params={"after_id": after_id})
+        assert response.status_code == 200
+        return [m['id'] for m in response.json()["messages"]]
+
+    assert poll(0) == [10, 12, 14]
+    assert poll(12) == [14]
+    assert poll(14) == []
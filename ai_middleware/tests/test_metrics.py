@@ -0,0 +1,141 @@
+import asyncio
+import json
+from types import SimpleNamespace
+
+import httpx
+import pytest
+
+from src.ai_agent import AIAgent
+from src.metrics import REGISTRY, Registry, _Metric
+from src.odoo_client import OdooClient
+
+def sample(name, **labels):
+    return REGISTRY.sample(name, **labels) or 0
+
+class FakeCompletions:
+    """chat.completions stand-in answering "fine" or raising error"""
+
+    def __init__(self):
+        self.error = None
+
+    async def create(self, stream=False, **kwargs):
+        if self.error:
+            raise self.error
+        if stream:
+            return self._stream()
+        return SimpleNamespace(
+            choices=[SimpleNamespace(message=SimpleNamespace(content=" fine "))],
+            usage=SimpleNamespace(prompt_tokens=7, completion_tokens=2))
+
+    async def _stream(self):
+        for text in ("fi", "ne"):
+            yield SimpleNamespace(choices=[SimpleNamespace(delta=SimpleNamespace(content=text))])
+
+def make_agent(monkeypatch):
+    agent = AIAgent(api_key="test")
+    completions = FakeCompletions()
+    agent._llm_client = SimpleNamespace(chat=SimpleNamespace(completions=completions))
+    # A weak KB match: answered by the LLM
+    monkeypatch.setattr(agent.kb, "search", lambda message, top_k=3: [("KB answer", 0.3)])
+    return agent, completions
+
+def test_render_text_format():
+    registry = Registry()
+    requests = registry.counter("app_requests", "Requests", ["path"])
+    registry.gauge("app_depth", "Queue depth", function=lambda: 3)
+    latency = registry.histogram("app_seconds", "Latency", buckets=(0.1, 1.0))
+    requests.labels('/a"b').inc()
+    requests.labels('/a"b').inc(2)
+    latency.observe(0.5)
+
+    assert registry.render().splitlines() == [
+        "# HELP app_requests Requests",
+        "# TYPE app_requests counter",
+        'app_requests_total{path="/a\\"b"} 3',
+        "# HELP app_depth Queue depth",
+        "# TYPE app_depth gauge",
+        "app_depth 3",
+        "# HELP app_seconds Latency",
+        "# TYPE app_seconds histogram",
+        'app_seconds_bucket{le="0.1"} 0',
+        'app_seconds_bucket{le="1"} 1',
+        'app_seconds_bucket{le="+Inf"} 1',
+        "app_seconds_sum 0.5",
+        "app_seconds_count 1",
+    ]
+    assert registry.sample("app_requests_total", path='/a"b') == 3
+    assert registry.sample("app_seconds_bucket", le="1") == 1
+    assert registry.sample("app_requests_total", path="/other") is None
+
+def test_metric_kinds_must_implement_collect():
+    class Incomplete(_Metric):
+        kind = "counter"
+
+        def _new_child(self):
+            return None
+
+    with pytest.raises(TypeError):
+        Incomplete("app_incomplete", "Missing collect()")
+
+def test_chat_decisions_and_llm_metrics(monkeypatch):
+    agent, completions = make_agent(monkeypatch)
+    decisions = {route: sample("ai_middleware_chat_decisions_total", route=route)
+                 for route in ("handoff", "llm", "cache", "kb_fallback")}
+    completed = sample("ai_middleware_llm_seconds_count", mode="complete")
+    prompt_tokens = sample("ai_middleware_llm_tokens_total", kind="prompt")
+    errors = sample("ai_middleware_llm_errors_total")
+
+    async def run():
+        assert (await agent.should_handoff("I want a human agent"))[0] is True
+        assert await agent.should_handoff("what is the price") == (False, "fine", 0.8)
+        assert await agent.should_handoff("what is the price") == (False, "fine", 0.8)
+        completions.error = RuntimeError("LLM down")
+        assert await agent.should_handoff("what is the size") == (False, "KB answer", 0.3)
+
+    asyncio.run(run())
+    for route in decisions:
+        assert sample("ai_middleware_chat_decisions_total", route=route) == decisions[route] + 1
+    assert sample("ai_middleware_llm_seconds_count", mode="complete") == completed + 1
+    assert sample("ai_middleware_llm_tokens_total", kind="prompt") == prompt_tokens + 7
+    assert sample("ai_middleware_llm_errors_total") == errors + 1
+
+def test_streamed_answer_metrics(monkeypatch):
+    agent, _ = make_agent(monkeypatch)
+    llm = sample("ai_middleware_chat_decisions_total", route="llm")
+    streams = sample("ai_middleware_llm_seconds_count", mode="stream")
+    completion_tokens = sample("ai_middleware_llm_tokens_total", kind="completion")
+
+    async def run():
+        return [event async for event in agent.stream_handoff("what is the colour")]
+
+    assert asyncio.run(run())[-1] == ("done", (False, "fine", 0.8))
+    assert sample("ai_middleware_chat_decisions_total", route="llm") == llm + 1
+    assert sample("ai_middleware_llm_seconds_count", mode="stream") == streams + 1
+    assert sample("ai_middleware_llm_tokens_total", kind="completion") == completion_tokens + 2
+
+def test_odoo_rpc_metrics():
+    replies = {
+        "ok": httpx.Response(200, json={"result": []}),
+        "refused": httpx.Response(200, json={"error": {"message": "Access denied"}}),
+        "broken": httpx.Response(502, text="Bad gateway"),
+    }
+
+    async def run():
+        client = OdooClient("http://odoo.invalid", "db", "user", "password")
+        await client.session.aclose()
+        client.session = httpx.AsyncClient(transport=httpx.MockTransport(
+            lambda request: replies[json.loads(request.content)["params"]["method"]]))
+        client.uid = 2
+        results = [await client._call_kw("res.partner", method, []) for method in replies]
+        await client.close()
+        return results
+
+    before = {method: (sample("ai_middleware_odoo_rpc_seconds_count", method=method),
+                       sample("ai_middleware_odoo_rpc_errors_total", method=method)) for method in replies}
+    ok, refused, broken = asyncio.run(run())
+    assert ok == {"result": []}
+    assert refused["error"]["message"] == "Access denied"
+    assert broken["error"]["message"] == "HTTP 502: non-JSON response"
+    for method, errors in (("ok", 0), ("refused", 1), ("broken", 1)):
+        assert sample("ai_middleware_odoo_rpc_seconds_count", method=method) == before[method][0] + 1
+        assert sample("ai_middleware_odoo_rpc_errors_total", method=method) == before[method][1] + errors
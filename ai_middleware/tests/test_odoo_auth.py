@@ -0,0 +1,105 @@
+import asyncio
+import json
+
+import httpx
+
+from src.odoo_client import OdooClient
+from src.state_store import MemoryStore
+
+class FakeOdoo:
+    """Odoo login and call_kw over httpx.MockTransport, with cookie sessions"""
+
+    def __init__(self):
+        self.sessions = set()
+        self.logins = 0
+        self.calls = 0
+        self.accept_logins = True
+
+    def expire_all(self):
+        self.sessions.clear()
+
+    async def handler(self, request: httpx.Request) -> httpx.Response:
+        await asyncio.sleep(0.01)  # let concurrent calls overlap
+        if request.url.path == "/web/session/authenticate":
+            self.logins += 1
+            if not self.accept_logins:
+                return httpx.Response(200, json={"jsonrpc": "2.0", "id": 1, "result": {"uid": False}})
+            session = f"s{self.logins}"
+            self.sessions.add(session)
+            return httpx.Response(200, json={"jsonrpc": "2.0", "id": 1, "result": {"uid": 2}},
+                                  headers={"Set-Cookie": f"session_id={session}; Path=/"})
+        self.calls += 1
+        cookie = request.headers.get("cookie", "")
+        if not any(f"session_id={s}" == c.strip() for s in self.sessions for c in cookie.split(";")):
+            return httpx.Response(200, json={"jsonrpc": "2.0", "id": 1, "error": {
+                "message": "Odoo Session Expired", "data": {"name": "odoo.http.SessionExpiredException"}}})
+        params = json.loads(request.content)["params"]
+        return httpx.Response(200, json={"jsonrpc": "2.0", "id": 1, "result": params["method"]})
+
+def make_client(odoo, **kwargs):
+    client = OdooClient("http://odoo.invalid", "db", "user", "password", **kwargs)
+    client.session = httpx.AsyncClient(transport=httpx.MockTransport(odoo.handler))
+    return client
+
+def call(client, n=1):
+    async def run():
+        results = await asyncio.gather(*[client._call_kw("res.partner", "read", [[1]]) for _ in range(n)])
+        return results
+    return asyncio.run(run())
+
+def test_concurrent_first_calls_log_in_once():
+    odoo = FakeOdoo()
+    client = make_client(odoo)
+    assert call(client, 10) == [{"jsonrpc": "2.0", "id": 1, "result": "read"}] * 10
+    assert odoo.logins == 1 and client.auth_stats["logins"] == 1
+
+def test_expired_session_is_renewed_once_and_calls_replayed():
+    odoo = FakeOdoo()
+    client = make_client(odoo)
+    call(client)
+    odoo.expire_all()
+    results = call(client, 10)
+    assert all(r.get("result") == "read" for r in results)
+    assert odoo.logins == 2
+    stats = client.auth_stats
+    assert stats["expired"] == 10 and stats["replays"] == 10 and stats["logins"] == 2
+
+def test_failed_login_is_not_retried_forever():
+    odoo = FakeOdoo()
+    odoo.accept_logins = False
+    client = make_client(odoo)
+    assert call(client) == [{"error": {"message": "Odoo authentication failed"}}]
+    assert odoo.logins == 1 and odoo.calls == 0
+
+    odoo.accept_logins = True
+    call(client)
+    odoo.expire_all()
+    odoo.accept_logins = False
+    result, = call(client)
+    assert "Session Expired" in result["error"]["message"]
+    assert odoo.logins == 3 and client.auth_stats["replays"] == 0
+    assert client.auth_stats["failures"] == 2
+
+def test_session_past_its_lifetime_is_refreshed():
+    odoo = FakeOdoo()
+    client = make_client(odoo, session_lifetime=60)
+    call(client)
+    client._auth_at -= 61
+    assert call(client)[0]["result"] == "read"
+    assert odoo.logins == 2 and client.auth_stats["refreshes"] == 1
+
+def test_worker_adopts_a_login_published_to_the_store():
+    odoo = FakeOdoo()
+    store = MemoryStore()
+    first = make_client(odoo, store=store)
+    second = make_client(odoo, store=store)
+    call(first)
+    assert call(second)[0]["result"] == "read"
+    assert odoo.logins == 1 and second.auth_stats["adopted"] == 1
+
+    # Expired for both: whoever notices first logs in, the other adopts it
+    odoo.expire_all()
+    call(second)
+    call(first)
+    assert odoo.logins == 2
+    assert first.auth_stats["adopted"] == 1 and second.auth_stats["logins"] == 1
@@ -0,0 +1,105 @@
+import asyncio
+import sqlite3
+import time
+
+from src.admission import Overloaded
+from src.outbound_spool import OutboundSpool
+
+class FakeOdoo:
+    """Odoo client stand-in; replies are popped per call, then "ok"."""
+
+    def __init__(self, *replies):
+        self.replies = list(replies)
+        self.posted = []  # (session_id, body, message_id)
+        self.found = {}  # message_id -> mail.message id
+
+    async def send_message_to_session(self, session_id, body, author_name, message_id=None):
+        reply = self.replies.pop(0) if self.replies else True
+        if isinstance(reply, Exception):
+            raise reply
+        if reply:
+            self.posted.append((session_id, body, message_id))
+        return reply
+
+    async def store_feedback(self, session_id, rating, comment, message_id=None):
+        self.posted.append((session_id, rating, message_id))
+        return True
+
+    async def find_message(self, message_id):
+        return self.found.get(message_id, 0)
+
+def drain(spool, rounds=10):
+    async def run():
+        for _ in range(rounds):
+            await spool.drain_once()
+    asyncio.run(run())
+
+def make_spool(tmp_path, odoo, **kwargs):
+    return OutboundSpool(odoo, str(tmp_path / "outbound.db"), base_delay=0, **kwargs)
+
+def test_entries_of_a_session_are_delivered_in_order(tmp_path):
+    odoo = FakeOdoo(None)  # first post fails once
+    spool = make_spool(tmp_path, odoo)
+    uids = [spool.enqueue_message(1, f"m{i}", "Visitor") for i in range(3)]
+    spool.enqueue_feedback(2, "good")
+    drain(spool)
+    assert [body for session_id, body, _ in odoo.posted if session_id == 1] == ["m0", "m1", "m2"]
+    assert [spool.status(uid)["status"] for uid in uids] == ["sent"] * 3
+    assert spool.status(uids[0])["attempts"] == 2
+    assert spool.counts["retried"] == 1 and spool.counts["sent"] == 4
+
+def test_retry_finds_an_earlier_post_instead_of_posting_again(tmp_path):
+    odoo = FakeOdoo(None)
+    spool = make_spool(tmp_path, odoo)
+    uid = spool.enqueue_message(1, "hello", "Visitor")
+    drain(spool, rounds=1)
+    odoo.found[OutboundSpool.odoo_message_id(uid)] = 77  # it reached Odoo after all
+    drain(spool, rounds=1)
+    status = spool.status(uid)
+    assert status["status"] == "sent" and status["odoo_message_id"] == 77
+    assert odoo.posted == [] and spool.counts["deduplicated"] == 1
+
+def test_inactive_session_rejects_and_retries_are_bounded(tmp_path):
+    odoo = FakeOdoo(False, None, Overloaded("Odoo", 1.0), None)
+    spool = make_spool(tmp_path, odoo, max_attempts=3)
+    rejected = spool.enqueue_message(1, "too late", "Visitor")
+    failed = spool.enqueue_message(2, "unlucky", "Visitor")
+    drain(spool)
+    assert spool.status(rejected)["status"] == "rejected"
+    status = spool.status(failed)
+    assert status["status"] == "failed" and status["attempts"] == 3
+    assert status["last_error"] == "Odoo unreachable"
+    assert spool.stats()["entries"] == {"rejected": 1, "failed": 1}
+
+def test_spool_gives_up_on_a_locked_file(tmp_path):
+    path = str(tmp_path / "outbound.db")
+    spool = OutboundSpool(FakeOdoo(), path, base_delay=0, busy_timeout=0.01)
+    uid = spool.enqueue_message(1, "before", "Visitor")
+    other = sqlite3.connect(path, isolation_level=None)
+    other.execute("BEGIN IMMEDIATE")  # another worker holds the write lock
+    started = time.monotonic()
+    assert spool.enqueue_message(1, "during", "Visitor") is None
+    assert spool.enqueue_feedback(1, "good") is None
+    drain(spool, rounds=1)  # claims fail: nothing is posted
+    assert time.monotonic() - started < 1.0
+    assert spool.status(uid)["status"] == "pending"  # WAL readers are not blocked
+    assert spool.counts["busy"] == 3
+    other.execute("ROLLBACK")
+    other.close()
+    drain(spool)
+    assert spool.status(uid)["status"] == "sent"
+    assert spool.stats()["entries"] == {"sent": 1} and spool.pending() == 0
+
+def test_chat_posts_inline_while_the_spool_is_locked(main_module, call_app, monkeypatch, tmp_path):
+    path = str(tmp_path / "outbound.db")
+    odoo = FakeOdoo()
+    monkeypatch.setattr(main_module, "outbound_spool", OutboundSpool(odoo, path, busy_timeout=0.01))
+    monkeypatch.setattr(main_module.odoo_client, "send_message_to_session", odoo.send_message_to_session)
+    other = sqlite3.connect(path, isolation_level=None)
+    other.execute("BEGIN IMMEDIATE")
+    response = call_app("POST", "/chat", json={"message": "hello", "session_id": "7"})
+    other.execute("ROLLBACK")
+    other.close()
+    assert response.status_code == 200
+    assert response.json()["message_id"] is None and response.json()["odoo_session_id"] == 7
+    assert odoo.posted == [(7, "hello", None)]
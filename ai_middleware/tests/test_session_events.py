@@ -0,0 +1,58 @@
+import asyncio
+import json
+
+import httpx
+
+class ScriptedSession:
+    """Odoo reads of one session: an agent reply, then the session closes"""
+
+    def __init__(self, session_id: int):
+        self.session_id = session_id
+        self.status = 'in_progress'
+        self.messages = []
+
+    async def read_sessions(self, ids):
+        return {i: {'id': i, 'livechat_status': self.status, 'livechat_end_dt': False,
+                    'livechat_operator_id': [3, 'Operator'], 'channel_member_ids': [1, 2]} for i in ids}
+
+    async def search_session_messages(self, ids, after_id, new_ids, limit):
+        return [m for m in self.messages if m['id'] > after_id or m['res_id'] in (new_ids or [])]
+
+def parse_sse(body: str):
+    """(event, data) pairs of an SSE body, comments and retry hints skipped"""
+    events = []
+    for block in body.strip().split("\n\n"):
+        fields = dict(line.split(": ", 1) for line in block.splitlines() if not line.startswith(":"))
+        if 'event' in fields:
+            events.append((fields['event'], json.loads(fields['data'])))
+    return events
+
+def test_event_stream_pushes_agent_messages_and_session_end(main_module, monkeypatch):
+    odoo = ScriptedSession(9101)
+    monkeypatch.setattr(main_module.odoo_client, "read_sessions", odoo.read_sessions)
+    monkeypatch.setattr(main_module.odoo_client, "search_session_messages", odoo.search_session_messages)
+    watcher = main_module.session_watcher
+
+    async def run():
+        transport = httpx.ASGITransport(app=main_module.app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+            stream = asyncio.create_task(client.get(f"/session/{odoo.session_id}/events"))
+            await asyncio.sleep(0.05)  # subscribed, nothing to push yet
+            await watcher.poll_once()
+            assert not stream.done()
+
+            odoo.messages.append({'id': 501, 'res_id': odoo.session_id, 'body': '<p>Hello</p>',
+                                  'author_id': [3, 'Operator'], 'date': '2026-01-01 10:00:00'})
+            await watcher.poll_once()
+            odoo.status = 'closed'
+            await watcher.poll_once()
+            return await asyncio.wait_for(stream, timeout=5)
+
+    response = asyncio.run(run())
+    assert response.status_code == 200
+    assert response.headers['content-type'].startswith('text/event-stream')
+    events = parse_sse(response.text)
+    assert [name for name, _ in events] == ['message', 'session_ended']
+    assert events[0][1]['id'] == 501
+    assert events[0][1]['author'] == 'Operator'
+    assert 'id: 501\n' in response.text
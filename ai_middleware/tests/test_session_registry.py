@@ -0,0 +1,94 @@
+import pytest
+
+from src import session_registry
+from src.session_registry import SessionRecord, SessionRegistry, TimingWheel
+
+class Clock:
+    def __init__(self, now: float = 1000.0):
+        self.now = now
+
+    def __call__(self) -> float:
+        return self.now
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = Clock()
+    monkeypatch.setattr(session_registry.time, "monotonic", clock)
+    return clock
+
+def test_wheel_returns_keys_once_their_tick_passed(clock):
+    wheel = TimingWheel(tick=1.0, slots=8)
+    wheel.schedule(1, clock.now + 2)
+    wheel.schedule(2, clock.now + 5)
+    assert wheel.advance(clock.now + 1) == []
+    assert wheel.advance(clock.now + 3) == [1]
+    assert wheel.advance(clock.now + 6) == [2]
+    assert len(wheel) == 0
+
+def test_wheel_keeps_deadlines_beyond_one_rotation(clock):
+    wheel = TimingWheel(tick=1.0, slots=4)
+    wheel.schedule(1, clock.now + 10)
+    for step in range(1, 10):
+        assert wheel.advance(clock.now + step) == []
+    assert wheel.advance(clock.now + 11) == [1]
+
+def test_wheel_cancel(clock):
+    wheel = TimingWheel(tick=1.0, slots=8)
+    at = wheel.schedule(1, clock.now + 2)
+    wheel.cancel(1, at)
+    assert wheel.advance(clock.now + 5) == []
+
+def test_idle_record_expires_after_idle_timeout(clock):
+    registry = SessionRegistry(idle_timeout=10, ended_ttl=2)
+    record = SessionRecord(1)
+    registry.add(record)
+    clock.now += 5
+    assert registry.expire() == []
+    clock.now += 6
+    assert registry.expire() == [record]
+    assert 1 not in registry
+    assert registry.counts["expired_idle"] == 1
+
+def test_touch_postpones_expiry(clock):
+    registry = SessionRegistry(idle_timeout=10)
+    record = SessionRecord(1)
+    registry.add(record)
+    clock.now += 8
+    registry.touch(record)
+    clock.now += 4
+    assert registry.expire() == []
+    clock.now += 8
+    assert registry.expire() == [record]
+
+def test_keep_reschedules_instead_of_expiring(clock):
+    registry = SessionRegistry(idle_timeout=10)
+    registry.add(SessionRecord(1))
+    clock.now += 12
+    assert registry.expire(keep=lambda session_id: True) == []
+    assert 1 in registry
+
+def test_ended_record_expires_after_ended_ttl(clock):
+    registry = SessionRegistry(idle_timeout=100, ended_ttl=5)
+    record = SessionRecord(1)
+    registry.add(record)
+    clock.now += 1
+    registry.mark_ended(record)
+    clock.now += 3
+    assert registry.expire() == []
+    clock.now += 4
+    assert registry.expire() == [record]
+    assert registry.counts["expired_ended"] == 1
+
+def test_capacity_evicts_least_recently_active(clock):
+    registry = SessionRegistry(max_sessions=2)
+    first, second = SessionRecord(1), SessionRecord(2)
+    registry.add(first)
+    registry.add(second)
+    clock.now += 1
+    registry.touch(first)
+    assert registry.add(SessionRecord(3)) == [second]
+    assert set(registry.records) == {1, 3}
+    assert registry.counts["evicted"] == 1
+    # The evicted record no longer expires from the wheel
+    clock.now += 1000
+    assert {r.session_id for r in registry.expire()} == {1, 3}
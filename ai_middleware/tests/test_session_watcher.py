@@ -0,0 +1,96 @@
+import asyncio
+
+from src.session_events import SessionEventHub
+from src.session_watcher import SessionWatcher
+
+class SlowOdoo:
+    """Odoo client stand-in whose reads wait until released"""
+
+    def __init__(self):
+        self.release = asyncio.Event()
+
+    async def read_sessions(self, ids):
+        await self.release.wait()
+        return {i: {'id': i, 'livechat_status': 'in_progress', 'livechat_end_dt': False,
+                    'livechat_operator_id': [3, 'Operator'], 'channel_member_ids': [1, 2]} for i in ids}
+
+    async def search_session_messages(self, ids, after_id, new_ids, limit):
+        await self.release.wait()
+        return []
+
+def test_poll_survives_eviction_during_the_rpc():
+    async def run():
+        odoo = SlowOdoo()
+        watcher = SessionWatcher(odoo, SessionEventHub(), max_sessions=2)
+        watcher.track(1)
+        kept = watcher.track(2)
+        poll = asyncio.create_task(watcher.poll_once())
+        await asyncio.sleep(0)
+        watcher.sessions.touch(kept)
+        watcher.track(3)  # evicts session 1 while the poll waits
+        odoo.release.set()
+        await poll
+        assert 1 not in watcher.sessions
+        assert kept.ready.is_set() and kept.active
+        assert 1 not in watcher._owned
+
+    asyncio.run(run())
+
+class ScriptedOdoo:
+    """Odoo client stand-in reporting whichever operator is set"""
+
+    def __init__(self):
+        self.operator = [3, 'Operator']
+
+    async def read_sessions(self, ids):
+        return {i: {'id': i, 'livechat_status': 'in_progress', 'livechat_end_dt': False,
+                    'livechat_operator_id': self.operator, 'channel_member_ids': [1, 2]} for i in ids}
+
+    async def search_session_messages(self, ids, after_id, new_ids, limit):
+        return []
+
+def test_reassigned_operator_clears_agent_disconnected():
+    async def run():
+        odoo = ScriptedOdoo()
+        watcher = SessionWatcher(odoo, SessionEventHub())
+        state = watcher.track(1)
+        await watcher.poll_once()
+        assert not state.agent_disconnected
+
+        odoo.operator = False
+        await watcher.poll_once()
+        assert state.agent_disconnected
+        assert watcher.legacy_messages(state)[-1]['body'] == 'AGENT_DISCONNECTED'
+
+        odoo.operator = [4, 'Other operator']
+        await watcher.poll_once()
+        assert not state.agent_disconnected
+        assert watcher.legacy_messages(state) == []
+        assert watcher.backlog(1) == []
+
+    asyncio.run(run())
+
+def test_agent_disconnected_is_reported_once_per_departure():
+    async def run():
+        odoo = ScriptedOdoo()
+        watcher = SessionWatcher(odoo, SessionEventHub())
+        state = watcher.track(1)
+        await watcher.poll_once()
+
+        def notices():
+            return [m for m in watcher.legacy_messages(state) if m['body'] == 'AGENT_DISCONNECTED']
+
+        odoo.operator = False
+        await watcher.poll_once()
+        assert len(notices()) == 1
+        await watcher.poll_once()
+        assert notices() == []
+
+        odoo.operator = [4, 'Other operator']
+        await watcher.poll_once()
+        odoo.operator = False
+        await watcher.poll_once()
+        assert len(notices()) == 1  # the new operator left too
+        assert notices() == []
+
+    asyncio.run(run())
@@ -0,0 +1,62 @@
+import sqlite3
+import time
+
+import pytest
+
+from src.state_store import MemoryStore, SQLiteStore, StateStore, open_store
+
+@pytest.fixture(params=["memory", "sqlite"])
+def store(request, tmp_path):
+    store = MemoryStore() if request.param == "memory" else SQLiteStore(str(tmp_path / "state.db"))
+    yield store
+    store.close()
+
+def test_state_store_is_abstract():
+    with pytest.raises(TypeError):
+        StateStore()
+
+def test_set_get_delete(store):
+    assert store.get("missing") is None
+    store.set("key", {"a": [1, 2]})
+    assert store.get("key") == {"a": [1, 2]}
+    store.delete("key")
+    assert store.get("key") is None
+
+def test_entries_expire(store):
+    store.set("key", 1, ttl=0.01)
+    time.sleep(0.02)
+    assert store.get("key") is None
+
+def test_claim_is_a_lease(store):
+    assert store.claim("watch:1", "a", ttl=10)
+    assert store.claim("watch:1", "a", ttl=10)  # renewed by its holder
+    assert not store.claim("watch:1", "b", ttl=10)
+    store.release("watch:1", "b")  # not the holder: no effect
+    assert not store.claim("watch:1", "b", ttl=10)
+    store.release("watch:1", "a")
+    assert store.claim("watch:1", "b", ttl=0.01)
+    time.sleep(0.02)
+    assert store.claim("watch:1", "a", ttl=10)  # expired lease is free
+
+def test_sqlite_store_gives_up_on_a_locked_file(tmp_path):
+    path = str(tmp_path / "state.db")
+    store = SQLiteStore(path, busy_timeout=0.01)
+    store.set("key", 1)
+    other = sqlite3.connect(path, isolation_level=None)
+    other.execute("BEGIN IMMEDIATE")  # another worker holds the write lock
+    started = time.monotonic()
+    store.set("key", 2)
+    assert not store.claim("watch:1", "a", ttl=10)
+    assert time.monotonic() - started < 1.0
+    assert store.get("key") == 1  # WAL readers are not blocked
+    assert store.stats()["busy"] == 2
+    other.execute("ROLLBACK")
+    other.close()
+    assert store.claim("watch:1", "a", ttl=10)
+    store.close()
+
+def test_open_store(tmp_path):
+    assert isinstance(open_store(""), MemoryStore)
+    assert isinstance(open_store(f"sqlite:{tmp_path / 'state.db'}"), SQLiteStore)
+    with pytest.raises(ValueError):
+        open_store("redis://localhost")
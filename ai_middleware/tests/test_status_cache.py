@@ -0,0 +1,74 @@
+import asyncio
+import time
+
+from src.odoo_client import OdooClient
+
+ACTIVE = {'id': 1, 'livechat_status': 'in_progress', 'livechat_end_dt': False,
+          'livechat_operator_id': [3, 'Operator'], 'channel_member_ids': [1, 2]}
+
+def make_client(monkeypatch, **kwargs):
+    """Client whose discuss.channel reads take 10 ms and return ACTIVE"""
+    client = OdooClient("http://odoo.invalid", "db", "user", "password", **kwargs)
+
+    async def call_kw(model, method, args, kwargs=None, rpc_id=1):
+        await asyncio.sleep(0.01)
+        return {"result": [ACTIVE]}
+
+    monkeypatch.setattr(client, "_call_kw", call_kw)
+    return client
+
+def test_concurrent_reads_share_one_rpc(monkeypatch):
+    client = make_client(monkeypatch, status_ttl=10)
+
+    async def run():
+        records = await asyncio.gather(*[client._read_channel(1) for _ in range(5)])
+        assert records == [ACTIVE] * 5
+        assert await client._read_channel(1) == ACTIVE
+
+    asyncio.run(run())
+    stats = client.status_cache_stats()
+    assert stats["reads"] == 1 and stats["coalesced"] == 4 and stats["cache_hits"] == 1
+    assert stats["reads_saved"] == 5
+
+def test_status_expires_after_ttl(monkeypatch):
+    client = make_client(monkeypatch, status_ttl=0.05)
+
+    async def run():
+        await client._read_channel(1)
+        await client._read_channel(1)
+        await asyncio.sleep(0.06)
+        await client._read_channel(1)
+
+    asyncio.run(run())
+    assert client.status_cache_stats()["reads"] == 2
+
+def test_invalidate_forces_a_read_but_keeps_the_liveness_hint(monkeypatch):
+    client = make_client(monkeypatch, status_ttl=10, liveness_max_age=60)
+
+    async def run():
+        await client._read_channel(1)
+        client.invalidate_session(1)
+        assert client.cached_liveness(1) is True
+        await client._read_channel(1)
+
+        # A read in flight when we post may predate the post: not cached
+        read = asyncio.ensure_future(client._read_channel(2))
+        await asyncio.sleep(0)
+        client.invalidate_session(2)
+        await read
+        await client._read_channel(2)
+
+    asyncio.run(run())
+    stats = client.status_cache_stats()
+    assert stats["reads"] == 4 and stats["invalidations"] == 2
+
+def test_pruning_keeps_entries_still_used_for_liveness(monkeypatch):
+    client = make_client(monkeypatch, status_ttl=0.3, liveness_max_age=5)
+    past_ttl = time.monotonic() - 1
+    for session_id in range(1001):
+        client._store_status(session_id, ACTIVE, past_ttl)
+    client._store_status(5000, ACTIVE, time.monotonic())
+    assert client.cached_liveness(0) is True
+
+    client._store_status(5001, ACTIVE, time.monotonic() - 10)  # past both
+    assert client.cached_liveness(5001) is None and 5001 not in client._status_cache
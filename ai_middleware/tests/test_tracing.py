@@ -0,0 +1,49 @@
+import asyncio
+import re
+
+import httpx
+from fastapi import FastAPI
+
+from src.tracing import ServerTimingMiddleware, server_timing, span
+
+def timings(header: str) -> dict:
+    """{name: milliseconds} of a Server-Timing header"""
+    return {m.group(1): float(m.group(2)) for m in re.finditer(r"([\w-]+);dur=([\d.]+)", header)}
+
+def test_server_timing_lists_spans_and_total():
+    app = FastAPI()
+    app.add_middleware(ServerTimingMiddleware)
+
+    @app.get("/work")
+    async def work():
+        for _ in range(2):
+            with span("odoo-read"):
+                await asyncio.sleep(0.01)
+        with span("llm"):
+            await asyncio.sleep(0.02)
+        return {"ok": True}
+
+    async def run():
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+            return await client.get("/work")
+
+    response = asyncio.run(run())
+    header = response.headers["server-timing"]
+    assert 'odoo-read;dur=' in header and 'desc="2 calls"' in header
+    durations = timings(header)
+    assert list(durations) == ["odoo-read", "llm", "total"]
+    assert durations["odoo-read"] >= 20 and durations["llm"] >= 20
+    assert durations["total"] >= durations["odoo-read"] + durations["llm"]
+    assert response.headers["timing-allow-origin"] == "*"
+    assert len(response.headers["x-request-id"]) == 16
+
+def test_app_responses_carry_a_total_span(call_app):
+    response = call_app("GET", "/health")
+    assert response.status_code == 200
+    assert "total" in timings(response.headers["server-timing"])
+
+def test_span_outside_a_request_is_harmless():
+    with span("kb-search"):
+        pass
+    assert server_timing([], 0.0015) == "total;dur=1.5"